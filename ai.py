@@ -0,0 +1,335 @@
+"""
+Computer players.
+
+A computer player is an ordinary :class:`Player` whose user is a made-up bot
+account, so it sits in the linked list and is journaled like anyone else.
+On its turn :func:`observe` takes what that seat may know: every other hand,
+its own owls, the used stones and the sizes of everything hidden. It does
+not see its own hand, just like the humans.
+
+:func:`search` picks a move with single-observer information set Monte Carlo
+tree search: every iteration deals the unseen stones at random, walks the
+tree of moves with UCB1 among the moves legal in that deal, plays the round
+out at random and backs the score gains up. It stops when its time budget is
+spent. :class:`Brain` runs it in a process pool so searches never hold a
+thread that serves updates.
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from math import log, sqrt
+from multiprocessing import get_context
+from time import perf_counter, time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from card import STONES, TOTAL
+from engine import MAX_HP
+
+if TYPE_CHECKING:
+    from telegram import User
+
+    from game import Game
+    from player import Player
+
+HAND_SIZE = 5
+WINNING_SCORE = 8
+PASS = 0
+# UCB1 exploration, rewards are in [0, 1]
+EXPLORATION = 0.7
+# Seconds a move may take beyond the budget, for pickling and process hops
+MARGIN = 0.2
+
+
+def make_user(chat_id: int, seat: int) -> User:
+    """The account of the ``seat``-th computer player of a chat"""
+    # Kept out of the module imports, the search workers never need it
+    from telegram import User
+
+    # Telegram ids are positive, so these never clash with people
+    return User(-(abs(chat_id) * 10 + seat), f"電腦 {seat}", True)
+
+
+def is_computer(player: Player) -> bool:
+    return player.user.id < 0 and player.user.is_bot
+
+
+@dataclass(frozen=True)
+class View:
+    """What the current player knows, seats in turn order starting with it"""
+
+    sizes: Tuple[int, ...]
+    # Hands of the other seats as stone counts, None for the own one
+    hands: Tuple[Optional[Tuple[int, ...]], ...]
+    hp: Tuple[int, ...]
+    score: Tuple[int, ...]
+    owls: Tuple[int, ...]
+    secret: Tuple[int, ...]
+    used: Tuple[int, ...]
+    secret_left: int
+    deck_left: int
+    last: int
+
+
+def observe(game: Game, player: Player) -> View:
+    players = game.players
+    if players[0] is not player:
+        raise ValueError("Only the current player can be observed")
+    return View(
+        sizes=tuple(len(p.cards) for p in players),
+        hands=tuple(None if p is player else tuple(p.cards.counts) for p in players),
+        hp=tuple(p.hp for p in players),
+        score=tuple(p.score for p in players),
+        owls=tuple(len(p.secret_cards) for p in players),
+        secret=tuple(player.secret_cards.count(stone) for stone in STONES),
+        used=tuple(game.used_cards.counts),
+        secret_left=len(game.secret_cards),
+        deck_left=len(game.deck.cards),
+        last=player.last_played.rank if player.last_played else 0,
+    )
+
+
+class State:
+    """One deal of a :class:`View`, played on with the rules of ``engine``"""
+
+    __slots__ = (
+        "hands",
+        "sizes",
+        "hp",
+        "score",
+        "owls",
+        "deck",
+        "secret",
+        "current",
+        "last",
+        "over",
+        "rng",
+    )
+
+    def __init__(self, view: View, rng: random.Random):
+        unseen = [t - u - s for t, u, s in zip(TOTAL, view.used, view.secret)]
+        for hand in view.hands:
+            if hand is not None:
+                unseen = [n - h for n, h in zip(unseen, hand)]
+        pool = [rank for rank, n in enumerate(unseen, 1) for _ in range(n)]
+        rng.shuffle(pool)
+
+        own = [0] * 8
+        for rank in pool[: view.sizes[0]]:
+            own[rank - 1] += 1
+        # The owls of the others are known to be gone, but not which
+        hidden = view.sizes[0] + sum(view.owls[1:])
+        start = hidden + view.secret_left
+        self.secret = pool[hidden:start]
+        # Stones of players who left are gone as well
+        self.deck = pool[start : start + view.deck_left]
+
+        self.hands = [own] + [list(hand) for hand in view.hands[1:]]
+        self.sizes = list(view.sizes)
+        self.hp = list(view.hp)
+        self.score = list(view.score)
+        self.owls = list(view.owls)
+        self.current = 0
+        self.last = view.last
+        self.over = False
+        self.rng = rng
+
+    def legal(self) -> List[int]:
+        moves = list(range(max(self.last, 1), 9))
+        if self.sizes[self.current] < HAND_SIZE:
+            moves.append(PASS)
+        return moves
+
+    def play(self, move: int):
+        if move == PASS:
+            self.turn()
+            return
+        seat = self.current
+        hand = self.hands[seat]
+        hp = self.hp
+        if hand[move - 1]:
+            hand[move - 1] -= 1
+            self.sizes[seat] -= 1
+            self.last = move
+            self.effect(seat, move)
+            self.clamp()
+        else:
+            hp[seat] -= self.rng.randint(1, 3) if move == 1 else 1
+            self.clamp()
+            if hp[seat]:
+                self.turn()
+        self.settle()
+
+    def effect(self, seat: int, rank: int):
+        hp = self.hp
+        seats = len(hp)
+        left, right = (seat - 1) % seats, (seat + 1) % seats
+        if rank == 1:
+            value = self.rng.randint(1, 3)
+            for other in range(seats):
+                if other != seat:
+                    hp[other] -= value
+        elif rank == 2 or rank == 8:
+            hp[seat] += 1
+        elif rank == 3:
+            hp[seat] += self.rng.randint(1, 3)
+        elif rank == 4:
+            self.secret.pop()
+            self.owls[seat] += 1
+        elif rank == 5:
+            if left != right:
+                hp[right] -= 1
+            hp[left] -= 1
+        elif rank == 6:
+            hp[left] -= 1
+        elif rank == 7:
+            hp[right] -= 1
+
+    def clamp(self):
+        hp = self.hp
+        for seat in range(len(hp)):
+            hp[seat] = min(max(hp[seat], 0), MAX_HP)
+
+    def turn(self):
+        seat = self.current
+        self.last = 0
+        hand = self.hands[seat]
+        while self.sizes[seat] < HAND_SIZE and self.deck:
+            hand[self.deck.pop() - 1] += 1
+            self.sizes[seat] += 1
+        self.current = (seat + 1) % len(self.hands)
+
+    def settle(self):
+        """Game.has_end and Game.scoring, the search ends with the round"""
+        seat = self.current
+        if self.sizes[seat] and self.deck and all(self.hp):
+            return
+        self.over = True
+        hp, score = self.hp, self.score
+        if not self.sizes[seat] or hp[seat]:
+            score[seat] += 3
+        if self.sizes[seat]:
+            for other in range(len(hp)):
+                if other != seat and hp[other]:
+                    score[other] += 1
+        for other in range(len(hp)):
+            if hp[other]:
+                score[other] += self.owls[other]
+        self.score = [min(s, WINNING_SCORE) for s in score]
+
+
+class Node:
+    __slots__ = ("seat", "visits", "total", "children")
+
+    def __init__(self, seat: int):
+        # The seat that moved into this node
+        self.seat = seat
+        self.visits = 0
+        self.total = 0.0
+        self.children: Dict[int, Node] = {}
+
+    def select(self, moves: List[int]) -> int:
+        scale = EXPLORATION * sqrt(log(self.visits))
+        best, best_value = moves[0], -1.0
+        for move in moves:
+            child = self.children[move]
+            value = child.total / child.visits + scale / sqrt(child.visits)
+            if value > best_value:
+                best, best_value = move, value
+        return best
+
+
+def rollout(state: State, rng: random.Random, pass_prob: float = 0.5):
+    while not state.over:
+        seat = state.current
+        if state.last and state.sizes[seat] < HAND_SIZE and rng.random() < pass_prob:
+            state.play(PASS)
+        else:
+            state.play(rng.randint(max(state.last, 1), 8))
+
+
+def search(
+    view: View,
+    budget: float,
+    seed: Optional[int] = None,
+    iterations: Optional[int] = None,
+    asked: Optional[float] = None,
+) -> int:
+    """
+    The move with the most visits after ``budget`` seconds of search, counted
+    from the wall clock time ``asked`` when given
+    """
+    if asked is not None:
+        # Time spent waiting for a worker counts against the budget
+        budget -= time() - asked
+    deadline = perf_counter() + budget
+    rng = random.Random(seed)
+    root = Node(-1)
+    before = view.score
+    done = 0
+    while perf_counter() < deadline and (iterations is None or done < iterations):
+        done += 1
+        state = State(view, rng)
+        node, path = root, [root]
+        while not state.over:
+            moves = state.legal()
+            untried = [move for move in moves if move not in node.children]
+            if untried:
+                move = rng.choice(untried)
+                child = node.children[move] = Node(state.current)
+                state.play(move)
+                path.append(child)
+                break
+            move = node.select(moves)
+            node = node.children[move]
+            state.play(move)
+            path.append(node)
+        rollout(state, rng)
+        gains = [(a - b) / WINNING_SCORE for a, b in zip(state.score, before)]
+        root.visits += 1
+        for node in path[1:]:
+            node.visits += 1
+            node.total += gains[node.seat]
+    if not root.children:
+        return fallback(view)
+    return max(root.children.items(), key=lambda item: item[1].visits)[0]
+
+
+def fallback(view: View) -> int:
+    """
+    Cheap move for when there is no time to search: cast the legal stone with
+    the most unseen copies, pass once holding it looks unlikely.
+    """
+    unseen = [t - u - s for t, u, s in zip(TOTAL, view.used, view.secret)]
+    for hand in view.hands[1:]:
+        unseen = [n - h for n, h in zip(unseen, hand)]
+    low = max(view.last, 1)
+    rank = max(range(low, 9), key=lambda rank: unseen[rank - 1])
+    pool = max(sum(unseen), 1)
+    if view.sizes[0] < HAND_SIZE and unseen[rank - 1] * view.sizes[0] / pool < 0.5:
+        return PASS
+    return rank
+
+
+class Brain:
+    """Searches the moves of computer players in worker processes"""
+
+    def __init__(self, workers: int = 1, budget: float = 1.0):
+        self.budget = budget
+        # Forked workers would inherit the threads and locks of the bot
+        self.pool = ProcessPoolExecutor(workers, mp_context=get_context("spawn"))
+
+    async def think(self, view: View) -> int:
+        future = self.pool.submit(search, view, self.budget, asked=time())
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future), self.budget + MARGIN
+            )
+        except asyncio.TimeoutError:
+            future.cancel()
+            return fallback(view)
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
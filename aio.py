@@ -0,0 +1,200 @@
+"""
+asyncio runtime for :class:`bot.Room`.
+
+Updates are fetched with long polling, received by a
+:class:`webhook.WebhookServer` or, in a shard process, read from the queue
+fed by :class:`shard.Router`, and every update is handled by a
+coroutine on one event loop, so thousands of chats can be served with the
+bounded thread pool of :class:`api.ExecutorApi` instead of one dispatcher
+thread per in-flight update. Updates of one chat are handled in order by
+:class:`scheduler.AsyncChatScheduler`.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+from logging import getLogger
+from threading import local
+from typing import (
+    TYPE_CHECKING,
+    Awaitable,
+    Callable,
+    Hashable,
+    List,
+    Optional,
+    TypeVar,
+)
+
+from telegram import Update
+
+from scheduler import AsyncChatScheduler
+
+if TYPE_CHECKING:
+    from multiprocessing import Queue
+
+    from telegram.ext import Handler
+
+    from api import Api
+    from webhook import WebhookServer
+
+Callback = Callable[["Update", object], Awaitable[None]]
+T = TypeVar("T")
+
+# The event loop of every thread that ran a coroutine through run
+_threads = local()
+
+
+def run(coroutine: Awaitable[T]) -> T:
+    """
+    Run ``coroutine`` to completion on the calling thread. The loop is kept
+    for the next call, instead of a new one per update like asyncio.run.
+    """
+    loop = getattr(_threads, "loop", None)
+    if loop is None:
+        loop = _threads.loop = asyncio.new_event_loop()
+    return loop.run_until_complete(coroutine)
+
+
+def blocking(callback: Callback) -> Callable[[Update, object], None]:
+    """Run a coroutine handler to completion on the calling thread"""
+
+    @wraps(callback)
+    def wrapper(update, context):
+        return run(callback(update, context))
+
+    return wrapper
+
+
+class AsyncRuntime:
+    def __init__(
+        self,
+        api: Api,
+        handlers: List[Handler],
+        key: Callable[[Update], Hashable],
+        poll_timeout: int = 10,
+        max_in_flight: int = 10000,
+    ):
+        self.api = api
+        self.handlers = handlers
+        self.key = key
+        self.poll_timeout = poll_timeout
+        self.max_in_flight = max_in_flight
+
+        # Long polling parks a thread for poll_timeout seconds, keep it away
+        # from the pool that sends replies
+        self.poller = ThreadPoolExecutor(1, thread_name_prefix="poll")
+        self.scheduler = AsyncChatScheduler()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.running = False
+        # Called on the loop once it runs, before the first update
+        self.on_start: List[Callable[[], None]] = []
+
+        self.logger = getLogger(__name__)
+
+    def match(self, update: Update) -> Optional[Handler]:
+        for handler in self.handlers:
+            check = handler.check_update(update)
+            if check is not None and check is not False:
+                return handler
+        return None
+
+    async def dispatch(self, update: Update):
+        handler = self.match(update)
+        if handler is None:
+            return
+        try:
+            await handler.callback(update, None)
+        except Exception:
+            self.logger.exception(f"Update {update.update_id} caused an error")
+
+    def submit(self, key: Hashable, job: Callable[[], Awaitable[None]]):
+        """Schedule ``job`` under ``key`` from any thread"""
+        if self.loop is None:
+            raise RuntimeError("The runtime is not running")
+        self.loop.call_soon_threadsafe(self.scheduler.submit, key, job)
+
+    def spawn(self, job: Callable[[], Awaitable[None]]):
+        """Run ``job`` outside of the chat lanes, from any thread"""
+        if self.loop is None:
+            raise RuntimeError("The runtime is not running")
+        self.loop.call_soon_threadsafe(self._spawn, job)
+
+    def _spawn(self, job: Callable[[], Awaitable[None]]):
+        task = self.loop.create_task(job())
+        # The loop only keeps weak references to its tasks
+        self.scheduler.tasks.add(task)
+        task.add_done_callback(self.scheduler.tasks.discard)
+
+    def _started(self) -> asyncio.AbstractEventLoop:
+        loop = self.loop = asyncio.get_running_loop()
+        for callback in self.on_start:
+            callback()
+        return loop
+
+    def feed(self, update: Update):
+        """Schedule ``update`` on the running loop"""
+        self.scheduler.submit(self.key(update), partial(self.dispatch, update))
+
+    async def poll(self):
+        loop = self._started()
+        bot = self.api.bot
+        offset = None
+        self.running = True
+        while self.running:
+            if self.scheduler.pending >= self.max_in_flight:
+                await asyncio.sleep(0.05)
+                continue
+            try:
+                updates = await loop.run_in_executor(
+                    self.poller,
+                    partial(bot.get_updates, offset=offset, timeout=self.poll_timeout),
+                )
+            except Exception:
+                self.logger.exception("Failed to get updates")
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                offset = update.update_id + 1
+                self.feed(update)
+
+    async def listen(self, server: WebhookServer):
+        loop = self._started()
+        server.sink = lambda update: loop.call_soon_threadsafe(self.feed, update)
+        server.start()
+        self.running = True
+        try:
+            while self.running:
+                await asyncio.sleep(1)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    async def consume(self, queue: Queue):
+        """Handle JSON updates put on ``queue`` until a ``None`` arrives"""
+        loop = self._started()
+        bot = self.api.bot
+        self.running = True
+        while self.running:
+            if self.scheduler.pending >= self.max_in_flight:
+                await asyncio.sleep(0.05)
+                continue
+            data = await loop.run_in_executor(self.poller, queue.get)
+            if data is None:
+                break
+            self.feed(Update.de_json(json.loads(data), bot))
+        await self.scheduler.join()
+
+    def stop(self):
+        self.running = False
+
+    def run(self, server: Optional[WebhookServer] = None):
+        """Poll for updates, or receive them from ``server``"""
+        self.logger.info("Starting asyncio runtime")
+        if server is None:
+            self.api.bot.delete_webhook()
+        try:
+            asyncio.run(self.listen(server) if server else self.poll())
+        except KeyboardInterrupt:
+            pass
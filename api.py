@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Union
+
+from telegram.error import RetryAfter
+
+from metrics import API_ERRORS, API_LATENCY, API_THROTTLED
+
+if TYPE_CHECKING:
+    from telegram import Bot, InlineQueryResult, Message, ReplyMarkup
+
+
+def timed_call(method: str, call: Callable[[], Any]) -> Any:
+    """Run a blocking Bot API request and record how it went"""
+    began = perf_counter()
+    try:
+        return call()
+    except RetryAfter:
+        API_THROTTLED.inc(method)
+        raise
+    except Exception as e:
+        API_ERRORS.inc(method, type(e).__name__)
+        raise
+    finally:
+        API_LATENCY.observe(perf_counter() - began, method)
+
+
+class Api:
+    """
+    Bot API calls awaited by the handlers.
+    The calls run inline on the calling thread, which is what the threaded
+    runtime wants: every update already owns a dispatcher worker.
+    """
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+
+    async def call(self, method: str, *args, **kwargs) -> Any:
+        return timed_call(method, partial(getattr(self.bot, method), *args, **kwargs))
+
+    async def send_message(
+        self,
+        chat_id: int,
+        text: str,
+        reply_to_message_id: Optional[int] = None,
+        reply_markup: Optional[ReplyMarkup] = None,
+    ) -> Message:
+        return await self.call(
+            "send_message",
+            chat_id,
+            text=text,
+            reply_to_message_id=reply_to_message_id,
+            reply_markup=reply_markup,
+        )
+
+    async def post_message(
+        self,
+        chat_id: int,
+        text: str,
+        reply_to_message_id: Optional[int] = None,
+        reply_markup: Optional[ReplyMarkup] = None,
+    ):
+        """Send a message whose result is not needed"""
+        await self.send_message(chat_id, text, reply_to_message_id, reply_markup)
+
+    async def send_dice(
+        self, chat_id: int, reply_to_message_id: Optional[int] = None
+    ) -> Message:
+        return await self.call(
+            "send_dice", chat_id, reply_to_message_id=reply_to_message_id
+        )
+
+    async def answer_inline_query(
+        self, inline_query_id: str, results: List[InlineQueryResult], **kwargs
+    ) -> bool:
+        return await self.call(
+            "answer_inline_query", inline_query_id, results, **kwargs
+        )
+
+    async def delete_message(self, chat_id: int, message_id: int) -> bool:
+        return await self.call("delete_message", chat_id, message_id)
+
+    async def edit_message_text(
+        self,
+        chat_id: int,
+        message_id: int,
+        text: str,
+        reply_markup: Optional[ReplyMarkup] = None,
+    ) -> Union[Message, bool]:
+        return await self.call(
+            "edit_message_text",
+            chat_id=chat_id,
+            message_id=message_id,
+            text=text,
+            reply_markup=reply_markup,
+        )
+
+
+class ExecutorApi(Api):
+    """
+    Bot API calls for the asyncio runtime.
+    python-telegram-bot 13 only ships a blocking client, so the HTTP requests
+    run on a small bounded thread pool and the coroutines await them.
+    """
+
+    def __init__(self, bot: Bot, workers: int):
+        super().__init__(bot)
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="api")
+
+    async def call(self, method: str, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        call = partial(getattr(self.bot, method), *args, **kwargs)
+        return await loop.run_in_executor(
+            self.executor, partial(timed_call, method, call)
+        )
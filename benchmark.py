@@ -0,0 +1,223 @@
+"""
+Microbenchmarks of the per-update game paths.
+
+    python benchmark.py                 # run and compare with the baseline
+    python benchmark.py --save          # run and store a new baseline
+    python benchmark.py --check         # exit 1 when something regressed
+    python benchmark.py -k deck -k game # only benchmarks containing a word
+
+Every benchmark reports the best of several repeats in nanoseconds per call.
+Baselines are machine specific, store one before comparing on a new host.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from timeit import Timer
+from typing import Callable, Dict, List, Optional
+
+from telegram import User
+
+import utils
+from card import CARDS, STONES
+from deck import Deck
+from game import Game
+from player import Player
+from results import add_cards
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks.json")
+
+# name -> setup returning the callable to time
+BENCHMARKS: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+def benchmark(name: str):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+def make_game(players: int, start: bool = True) -> Game:
+    game = Game(None, seed=0)
+    for i in range(players):
+        Player(game, User(i + 1, f"user{i + 1}", False, username=f"user{i + 1}"))
+    game.starter = game.current_player.user
+    if start:
+        game.start()
+    return game
+
+
+@benchmark("deck.init")
+def deck_init():
+    deck = Deck()
+    return lambda: deck.init(CARDS)
+
+
+@benchmark("deck.draw[36]")
+def deck_draw():
+    deck = Deck()
+
+    def run():
+        deck.init(CARDS)
+        for _ in range(36):
+            deck.draw()
+
+    return run
+
+
+def game_start(players: int):
+    game = make_game(players, start=False)
+    return game.start
+
+
+for count in (2, 3, 5):
+    benchmark(f"game.start[{count}p]")(lambda count=count: game_start(count))
+
+
+@benchmark("player.play")
+def player_play():
+    game = make_game(4)
+    player = game.current_player
+    card = STONES[0]
+
+    def run():
+        player.cards.add(card)
+        player.play(card)
+        game.used_cards.remove(card)
+
+    return run
+
+
+@benchmark("game.players")
+def game_players():
+    game = make_game(5)
+    return lambda: game.players
+
+
+@benchmark("game.players[reseat]")
+def game_players_reseat():
+    game = make_game(5)
+
+    def run():
+        game.reseat()
+        return game.players
+
+    return run
+
+
+@benchmark("game.scoring")
+def game_scoring():
+    game = make_game(5)
+    game.current_player.cards.counts[:] = bytes(8)
+    game.current_player.cards.size = 0
+    players = game.players
+
+    def run():
+        game.scoring()
+        for player in players:
+            player.score = 0
+
+    return run
+
+
+@benchmark("results.add_cards")
+def results_add_cards():
+    game = make_game(5)
+    player = game.current_player
+    player.last_played = STONES[2]
+    player.secret_cards = [STONES[3]]
+    return lambda: add_cards([], player)
+
+
+for renderer in (
+    "make_round_settlement",
+    "make_current_settlement",
+    "make_settlement",
+    "make_game_start",
+    "make_room_info",
+    "make_used_cards",
+):
+
+    def render_setup(renderer=renderer):
+        game = make_game(5)
+        function = getattr(utils, renderer)
+        return lambda: function(game)
+
+    benchmark(f"utils.{renderer}")(render_setup)
+
+
+def measure(setup: Callable[[], Callable[[], object]], repeat: int = 5) -> float:
+    """Best time of ``repeat`` runs, in nanoseconds per call"""
+    timer = Timer(setup())
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number * 1e9
+
+
+def run(names: List[str], repeat: int) -> Dict[str, float]:
+    return {name: measure(BENCHMARKS[name], repeat) for name in names}
+
+
+def load(path: str) -> Dict[str, float]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def report(
+    current: Dict[str, float], baseline: Dict[str, float], threshold: float
+) -> List[str]:
+    """Print a comparison table and return the benchmarks that regressed"""
+    regressed = []
+    width = max(map(len, current))
+    print(f"{'benchmark':{width}}  {'baseline':>12}  {'current':>12}  change")
+    for name, value in current.items():
+        base: Optional[float] = baseline.get(name)
+        if base is None:
+            print(f"{name:{width}}  {'-':>12}  {value:10.0f}ns")
+            continue
+        change = value / base - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressed.append(name)
+        print(f"{name:{width}}  {base:10.0f}ns  {value:10.0f}ns  {change:+7.1%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-k", action="append", default=[], help="name filter")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="store as baseline")
+    parser.add_argument("--check", action="store_true", help="fail on regression")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="slowdown counted as regression"
+    )
+    args = parser.parse_args()
+
+    names = [
+        name for name in BENCHMARKS if not args.k or any(k in name for k in args.k)
+    ]
+    if not names:
+        parser.error("no benchmark matches")
+    current = run(names, args.repeat)
+    baseline = load(args.baseline)
+    regressed = report(current, baseline, args.threshold)
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            saved = {name: round(value, 1) for name, value in current.items()}
+            json.dump({**baseline, **saved}, f, indent=2, sort_keys=True)
+            f.write("\n")
+    if args.check and regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
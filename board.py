@@ -0,0 +1,111 @@
+"""
+Live board: one message per game showing its state, edited in place.
+
+Instead of posting the hit points, scores and used stones after every move,
+the game keeps a single board message up to date. The last sent text is
+remembered so edits that would not change anything are skipped, and edits
+closer together than ``debounce`` seconds are folded into one trailing edit
+that runs on the chat's lane through ``defer``.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import partial
+from logging import getLogger
+from time import monotonic
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Hashable, Optional
+
+from telegram.error import BadRequest
+
+from utils import make_board
+
+if TYPE_CHECKING:
+    from telegram import ReplyMarkup
+
+    from api import Api
+    from game import Game
+
+logger = getLogger(__name__)
+
+# Runs a job on the lane of a chat after a delay in seconds
+Defer = Callable[[float, Hashable, Callable[[], Awaitable[None]]], None]
+
+
+@dataclass
+class Board:
+    game: Game
+    message_id: int
+    text: str
+    edited: float
+    # A trailing edit is waiting for the debounce to pass
+    deferred: bool = False
+
+
+class LiveBoard:
+    def __init__(
+        self,
+        api: Api,
+        reply_markup: Optional[ReplyMarkup] = None,
+        debounce: float = 1.0,
+        defer: Optional[Defer] = None,
+    ):
+        self.api = api
+        self.reply_markup = reply_markup
+        self.debounce = debounce
+        # Without a way to run a trailing edit every refresh edits at once
+        self.defer = defer
+        self.boards: Dict[int, Board] = {}
+        self.edits = 0
+        self.skipped = 0
+
+    async def show(self, game: Game, reply_to_message_id: Optional[int] = None):
+        """Post a new board for ``game``, replacing the previous one"""
+        text = make_board(game)
+        message = await self.api.send_message(
+            game.chat.id,
+            text,
+            reply_to_message_id=reply_to_message_id,
+            reply_markup=self.reply_markup,
+        )
+        self.boards[game.chat.id] = Board(game, message.message_id, text, monotonic())
+
+    async def refresh(self, game: Game):
+        """Bring the board up to date, now or once the debounce passed"""
+        board = self.boards.get(game.chat.id)
+        if board is None or board.game is not game:
+            await self.show(game)
+            return
+        if board.deferred:
+            return
+        wait = board.edited + self.debounce - monotonic()
+        if wait > 0 and self.defer is not None:
+            board.deferred = True
+            self.defer(wait, game.chat.id, partial(self.flush, game))
+            return
+        await self.flush(game)
+
+    async def flush(self, game: Game):
+        """Edit the board right away if its text changed"""
+        board = self.boards.get(game.chat.id)
+        if board is None or board.game is not game:
+            return
+        board.deferred = False
+        text = make_board(game)
+        if text == board.text:
+            self.skipped += 1
+            return
+        board.text = text
+        board.edited = monotonic()
+        try:
+            await self.api.edit_message_text(
+                game.chat.id, board.message_id, text, reply_markup=self.reply_markup
+            )
+        except BadRequest as e:
+            # Deleted by an admin or too old to edit
+            logger.info(f"Board of chat {game.chat.id} is gone ({e}), posting anew")
+            await self.show(game)
+            return
+        self.edits += 1
+
+    def forget(self, chat_id: int):
+        self.boards.pop(chat_id, None)
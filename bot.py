@@ -1,21 +1,38 @@
-import logging
-from typing import TYPE_CHECKING, Callable
+from __future__ import annotations
 
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from threading import Timer
+from typing import TYPE_CHECKING, Awaitable, Callable, Hashable, List, Optional
+from urllib.parse import urlparse
+
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, Unauthorized
 from telegram.ext import (
     CallbackQueryHandler,
     ChosenInlineResultHandler,
     CommandHandler,
+    Dispatcher,
     Filters,
+    Handler,
     InlineQueryHandler,
     MessageHandler,
     Updater,
 )
 from telegram.ext.callbackcontext import CallbackContext
 from telegram.update import Update
-
-from card import Card
-from config import MIN_PLAYERS, TOKEN, WORKERS
+from telegram.utils.request import Request
+
+import ai
+import config
+import engine
+from aio import AsyncRuntime, blocking, run
+from api import Api, ExecutorApi
+from board import LiveBoard
+from card import STONES, Card
 from constants import INVALID_INPUT_TEXT
 from errors import (
     AlreadyJoinedError,
@@ -25,121 +42,215 @@ from errors import (
     NoGameInChatError,
     NotEnoughPlayersError,
 )
+from eventlog import EventLog
 from game_manager import GameManager
-from results import add_cards, add_no_game, add_not_started
+from journal import Store
+from metrics import (
+    GAMES,
+    OUTBOX_DEPTH,
+    PLAYERS,
+    QUEUED_UPDATES,
+    MetricsServer,
+    instrument,
+)
+from odds import odds
+from outbox import Outbox, OutboxApi
+from results import add_no_game, add_not_started, card_results, is_info_id
+from scheduler import ChatScheduler, serialized
+from shard import CurrentStore, SharedCurrent, serve
+from sweeper import Sweeper
 from utils import (
     display_name,
     make_current_settlement,
     make_game_start,
+    make_odds,
     make_room_info,
     make_round_settlement,
     make_settlement,
     make_used_cards,
 )
+from webhook import WebhookServer
 
 if TYPE_CHECKING:
+    from multiprocessing import Queue
+
+    from telegram import ReplyMarkup, User
     from telegram.message import Message
 
+    from game import Game
+
 
-logging.basicConfig(
-    format="%(asctime)s - %(filename)s:%(lineno)d - %(levelname)s - %(message)s",
-    level=logging.INFO,
-)
 logger = logging.getLogger(__name__)
 
+Job = Callable[[], Awaitable[None]]
+# Runs a job on the lane of a chat
+Submit = Callable[[Hashable, Job], None]
+
 
 class Room:
-    def __init__(self, updater: Updater):
-        self.updater = updater
-        self.handlers = [
-            InlineQueryHandler(self.reply_query, run_async=True),
-            ChosenInlineResultHandler(self.process_result, run_async=True),
-            CallbackQueryHandler(self.reply_callback, run_async=True),
-            MessageHandler(
-                Filters.via_bot(self.updater.bot.id),
-                self.delete_invalid,
-                run_async=True,
-            ),
-            CommandHandler("new", self.new, run_async=True),
-            CommandHandler("kill", self.kill, run_async=True),
-            CommandHandler("join", self.join, run_async=True),
-            CommandHandler("leave", self.leave, run_async=True),
-            CommandHandler("start", self.start, run_async=True),
-            CommandHandler("info", self.info, run_async=True),
+    def __init__(
+        self,
+        bot: Bot,
+        gm: GameManager,
+        api: Optional[Api] = None,
+        store: Optional[Store] = None,
+        board: Optional[LiveBoard] = None,
+        brain: Optional[ai.Brain] = None,
+        event_log: Optional[EventLog] = None,
+    ):
+        self.bot = bot
+        self.gm = gm
+        self.api = api or Api(bot)
+        self.store = store
+        self.board = board
+        self.brain = brain
+        self.event_log = event_log
+        # Run a coroutine function off the chat lanes, and on the lane of a
+        # chat; set by the runtime, without them dice are awaited in place
+        self.spawn: Optional[Callable[[Job], None]] = None
+        self.submit: Optional[Submit] = None
+
+    def make_handlers(self, wrap=lambda callback: callback) -> List[Handler]:
+        def add(callback):
+            return wrap(instrument(callback))
+
+        return [
+            InlineQueryHandler(add(self.reply_query)),
+            ChosenInlineResultHandler(add(self.process_result)),
+            CallbackQueryHandler(add(self.reply_callback)),
+            MessageHandler(Filters.via_bot(self.bot.id), add(self.delete_invalid)),
+            CommandHandler("new", add(self.new)),
+            CommandHandler("kill", add(self.kill)),
+            CommandHandler("join", add(self.join)),
+            CommandHandler("leave", add(self.leave)),
+            CommandHandler("start", add(self.start)),
+            CommandHandler("info", add(self.info)),
+            CommandHandler("ai", add(self.add_computer)),
+            CommandHandler("odds", add(self.show_odds)),
             MessageHandler(
-                Filters.status_update.left_chat_member, self.leave_group, run_async=True
+                Filters.status_update.left_chat_member, add(self.leave_group)
             ),
         ]
-        self.register()
 
-    def register(self):
-        for handler in self.handlers:
-            self.updater.dispatcher.add_handler(handler)
-        self.updater.dispatcher.add_error_handler(self.error)
+    def register(self, dispatcher: Dispatcher, scheduler: ChatScheduler):
+        def wrap(callback):
+            return serialized(scheduler, self.chat_key, blocking(callback))
+
+        for handler in self.make_handlers(wrap):
+            dispatcher.add_handler(handler)
+        dispatcher.add_error_handler(self.error)
+
+    def chat_key(self, update: Update) -> int:
+        """Updates with the same key are handled one after another"""
+        if update.effective_chat:
+            return update.effective_chat.id
+        user = update.effective_user
+        if user is None:
+            return 0
+        # Inline queries and chosen results belong to the chat of the game
+        player = self.gm.userid_current.get(user.id)
+        if player is not None and player.game.chat is not None:
+            return player.game.chat.id
+        return user.id
+
+    def save(self, op: str, chat_id: int, user: Optional[User] = None, **args):
+        """Journal a change to the games of a chat"""
+        if self.store is not None:
+            self.store.record(self.gm, op, chat_id, user, **args)
+        # Moves are logged with their engine events by play
+        if self.event_log is not None and op not in MOVES:
+            fields = {}
+            game = self.gm.active_game(chat_id)
+            if op == "start" and game is not None:
+                # Games draw from the start of their stream, with the logged
+                # moves and dice the seed replays the whole game
+                fields["seed"] = game.rng.getstate()[0]
+            self.event_log.emit(chat_id, op, user and user.id, **fields)
+
+    async def refresh(self, game: Game):
+        """Update the live board of a running game"""
+        if self.board is not None and game.started and not game.ended:
+            await self.board.refresh(game)
+
+    def forget(self, chat_id: int):
+        if self.board is not None:
+            self.board.forget(chat_id)
+
+    async def reply(
+        self, message: Message, text: str, reply_markup: Optional[ReplyMarkup] = None
+    ):
+        """Message.reply_text through ``self.api``"""
+        reply_to = None if message.chat.type == "private" else message.message_id
+        await self.api.post_message(
+            message.chat_id,
+            text,
+            reply_to_message_id=reply_to,
+            reply_markup=reply_markup,
+        )
 
-    def info(self, update: Update, context: CallbackContext):
+    async def info(self, update: Update, context: CallbackContext):
         chat = update.message.chat
         if chat.type == "private":
             return
 
-        games = gm.chatid_games.get(chat.id)
-        if games:
-            game = games[-1]
+        game = self.gm.active_game(chat.id)
+        if game:
             if game.ended:
-                update.message.reply_text("遊戲已結束！")
+                await self.reply(update.message, "遊戲已結束！")
             else:
-                update.message.reply_text(make_room_info(game))
+                await self.reply(update.message, make_room_info(game))
         else:
-            update.message.reply_text("目前沒有房間！請用 /new 開房！")
+            await self.reply(update.message, "目前沒有房間！請用 /new 開房！")
 
-    def new(self, update: Update, context: CallbackContext):
+    async def new(self, update: Update, context: CallbackContext):
         chat = update.message.chat
         if chat.type == "private":
             return
 
-        games = gm.chatid_games.get(chat.id)
-        if games:
-            game = games[-1]
-            if game.started and len(game.players) >= MIN_PLAYERS:
+        game = self.gm.active_game(chat.id)
+        if game:
+            if game.started and len(game.players) >= config.MIN_PLAYERS:
                 text = "已經開始ㄌ 下次請早ㄡ"
             else:
                 text = "房間早就開ㄌ，用 /info 查看資訊，用 /join 加入"
-            update.message.reply_text(text)
+            await self.reply(update.message, text)
             return
 
-        game = gm.new_game(update.message.chat)
+        game = self.gm.new_game(update.message.chat)
         game.starter = update.message.from_user
-        update.message.reply_text("幫你開ㄌ，其他人可以用 /join 加入")
+        self.save("new", chat.id, game.starter)
+        await self.reply(update.message, "幫你開ㄌ，其他人可以用 /join 加入")
         # NOTE: auto join
-        self.join(update, context)
+        await self.join(update, context)
 
-    def kill(self, update: Update, context: CallbackContext):
+    async def kill(self, update: Update, context: CallbackContext):
         chat = update.message.chat
         if chat.type == "private":
             return
 
-        games = gm.chatid_games.get(chat.id)
-        if not games:
+        if not self.gm.active_game(chat.id):
             return
 
         user = update.message.from_user
         if user.username == "sheiun":
             try:
-                gm.end_game(chat, user)
+                self.gm.end_game(chat, user)
                 text = "遊戲終了！"
             except NoGameInChatError:
                 return
+            self.save("kill", chat.id, user)
+            self.forget(chat.id)
         else:
             text = "你沒有權限"
-        update.message.reply_text(text)
+        await self.reply(update.message, text)
 
-    def join(self, update: Update, context: CallbackContext):
+    async def join(self, update: Update, context: CallbackContext):
         chat = update.message.chat
         if chat.type == "private":
             return
 
         try:
-            gm.join_game(update.message.from_user, chat)
+            self.gm.join_game(update.message.from_user, chat)
         except LobbyClosedError:
             text = "關房了"
         except NoGameInChatError:
@@ -152,223 +263,643 @@ class Room:
             text = "已經開始ㄌ"
         else:
             text = "加入成功ㄌ"
-        update.message.reply_text(text)
+            self.save("join", chat.id, update.message.from_user)
+        await self.reply(update.message, text)
+
+    async def add_computer(self, update: Update, context: CallbackContext):
+        chat = update.message.chat
+        if chat.type == "private":
+            return
+
+        game = self.gm.active_game(chat.id)
+        if self.brain is None:
+            text = "沒有開放電腦玩家ㄡ"
+        elif game is None:
+            text = "沒房ㄌ"
+        elif game.started:
+            text = "已經開始ㄌ"
+        elif len(game.players) >= config.MAX_PLAYERS:
+            text = "人滿ㄌ"
+        else:
+            taken = {player.user.id for player in game.players}
+            seat = 1
+            while ai.make_user(chat.id, seat).id in taken:
+                seat += 1
+            user = ai.make_user(chat.id, seat)
+            try:
+                self.gm.join_game(user, chat)
+            except LobbyClosedError:
+                text = "關房了"
+            else:
+                text = f"{display_name(user)} 加入ㄌ"
+                self.save("join", chat.id, user)
+        await self.reply(update.message, text)
+
+    async def show_odds(self, update: Update, context: CallbackContext):
+        chat = update.message.chat
+        if chat.type == "private":
+            return
+
+        game = self.gm.active_game(chat.id)
+        player = self.gm.player_for_user_in_chat(update.message.from_user, chat)
+        if game is None or player is None or player.game is not game:
+            text = "你不在遊戲裡ㄡ"
+        elif not game.started or game.ended:
+            text = "還沒開始ㄌ"
+        else:
+            # Only the player may see the odds given their owls, and no one
+            # else needs them as the rest of the table sees their stones
+            try:
+                await self.api.send_message(
+                    player.user.id, make_odds(player, odds(player))
+                )
+                return
+            except (BadRequest, Unauthorized):
+                text = "先私訊我 /start 才能看機率ㄡ"
+        await self.reply(update.message, text)
 
-    def leave(self, update: Update, context: CallbackContext):
+    async def leave(self, update: Update, context: CallbackContext):
         chat = update.message.chat
         user = update.message.from_user
 
-        player = gm.player_for_user_in_chat(user, chat)
+        player = self.gm.player_for_user_in_chat(user, chat)
         if player is None:
             text = "你不在遊戲內ㄡ"
         else:
             game = player.game
             try:
-                gm.leave_game(user, chat)
+                self.gm.leave_game(user, chat)
             except NoGameInChatError:
                 text = "你不在遊戲內ㄡ"
             except NotEnoughPlayersError:
                 text = "遊戲結束ㄌ"
             else:
+                self.save("leave", chat.id, user)
+                await self.refresh(game)
+                await self.autoplay(game)
                 if game.started:
                     text = f"好ㄉ。下位玩家 {display_name(game.current_player.user)}"
                 else:
                     text = f"{display_name(user)} 離開ㄌ"
-        update.message.reply_text(text)
+        await self.reply(update.message, text)
 
-    def start(self, update: Update, context: CallbackContext):
+    async def start(self, update: Update, context: CallbackContext):
         chat = update.message.chat
         if chat.type == "private":
             return
-        text = ""
-        markup = None
-        try:
-            game = gm.chatid_games[chat.id][-1]
-        except (KeyError, IndexError):
+        game = self.gm.active_game(chat.id)
+        if game is None:
             text = "還沒開房ㄡ"
         else:
             if game.started:
                 text = "已經開始ㄌㄡ"
-            elif len(game.players) < MIN_PLAYERS:
-                text = f"至少要 {MIN_PLAYERS} 人才能開ㄡ"
+            elif len(game.players) < config.MIN_PLAYERS:
+                text = f"至少要 {config.MIN_PLAYERS} 人才能開ㄡ"
             else:
                 game.start()
-                text = make_game_start(game)
-                markup = choices
-                context.bot.send_message(chat.id, text=make_room_info(game))
-                context.bot.send_message(chat.id, text=make_used_cards(game))
-        update.message.reply_text(text, reply_markup=markup)
+                self.save("start", chat.id, update.message.from_user)
+                if self.board is not None:
+                    await self.board.show(game, update.message.message_id)
+                else:
+                    await self.api.post_message(chat.id, make_room_info(game))
+                    await self.api.post_message(chat.id, make_used_cards(game))
+                    await self.reply(
+                        update.message, make_game_start(game), reply_markup=choices
+                    )
+                await self.autoplay(game)
+                return
+        await self.reply(update.message, text)
 
-    def leave_group(self, update: Update, context: CallbackContext):
+    async def leave_group(self, update: Update, context: CallbackContext):
         chat = update.message.chat
         user = update.message.left_chat_member
+        player = self.gm.player_for_user_in_chat(user, chat)
         try:
-            gm.leave_game(user, chat)
+            self.gm.leave_game(user, chat)
         except NoGameInChatError:
             return
         except NotEnoughPlayersError:
-            gm.end_game(chat, user)
+            self.gm.end_game(chat, user)
+            self.forget(chat.id)
             text = "遊戲終了！"
         else:
+            await self.refresh(player.game)
             text = display_name(user) + " 被踢出遊戲ㄌ"
-        context.bot.send_message(chat.id, text=text)
+        self.save("leave", chat.id, user)
+        await self.api.post_message(chat.id, text)
+        if not player.game.ended:
+            await self.autoplay(player.game)
 
-    def reply_query(self, update: Update, context: CallbackContext):
+    async def reply_query(self, update: Update, context: CallbackContext):
         results = []
 
         user = update.inline_query.from_user
         try:
-            player = gm.userid_current[user.id]
+            player = self.gm.userid_current[user.id]
         except KeyError:
             add_no_game(results)
         else:
             if not player.game.started:
                 add_not_started(results)
             else:
-                add_cards(results, player)
-        update.inline_query.answer(results, cache_time=0)
+                results = card_results(player)
+        await self.api.answer_inline_query(
+            update.inline_query.id, results, cache_time=0
+        )
 
-    def process_result(self, update: Update, context: CallbackContext):
+    async def process_result(self, update: Update, context: CallbackContext):
         user = update.chosen_inline_result.from_user
         result_id = update.chosen_inline_result.result_id
         try:
-            player = gm.userid_current[user.id]
+            player = self.gm.userid_current[user.id]
             game = player.game
             chat = game.chat
         except (KeyError, AttributeError):
             return
         if result_id in ("hand", "gameinfo", "nogame"):
             return
-        if len(result_id) == 36:
-            return
-        reply: Callable[[str], Message] = lambda text: context.bot.send_message(
-            chat.id, text=text, reply_to_message_id=message_id
-        )
-        if player != game.current_player:
-            reply(display_name(user) + " 還沒輪到你！")
+        if is_info_id(result_id):
             return
-        if result_id.isdigit() and 1 <= int(result_id) <= 8:
-            message_id = update.chosen_inline_result.inline_message_id
-            card = Card.from_id(result_id)
-            if player.last_played and player.last_played > card:
-                reply(display_name(user) + " 你只能施展更強大的魔法！")
-                return
-            if player.has(card):
-                idx = player.play(card)
-                message_succ = reply(
-                    f"施展成功！第 {idx+1} 個魔法石被移除！\n你還有 {len(player.cards)} 個魔法石！"
-                )
-                # NOTE: do card effect
-                if card == 1:
-                    message = message_succ.reply_dice()
-                    dice = message.dice
-                    value = 3 if dice.value % 3 == 0 else dice.value % 3
-                    message.reply_text(f"你骰出了 {dice.value} 所有人扣 {value} 點血！")
-                    for p in game.players:
-                        if p != game.current_player:
-                            p.hp -= value
-                elif card == 2:
-                    player.hp += 1
-                elif card == 3:
-                    message = message_succ.reply_dice()
-                    dice = message.dice
-                    value = 3 if dice.value % 3 == 0 else dice.value % 3
-                    message.reply_text(f"你骰出了 {dice.value} 回復 {value} 點血！")
-                    player.hp += value
-                elif card == 4:
-                    s_card = game.secret_cards.pop(0)
-                    player.secret_cards.append(s_card)
-                elif card == 5:
-                    if player.left != player.right:
-                        player.right.hp -= 1
-                    player.left.hp -= 1
-                elif card == 6:
-                    player.left.hp -= 1
-                elif card == 7:
-                    player.right.hp -= 1
-                elif card == 8:
-                    player.hp += 1
-
-                for p in game.players:
-                    if p.hp > 6:
-                        p.hp = 6
-                    elif p.hp < 0:
-                        p.hp = 0
-            else:
-                message_fail = reply(f"施展失敗！你沒有 {card}！")
-                if card == 1:
-                    message = message_fail.reply_dice()
-                    dice = message.dice
-                    value = 3 if dice.value % 3 == 0 else dice.value % 3
-                    message.reply_text(f"骰出了 {dice.value} 你扣了 {value} 點血！")
-
-                    player.hp -= value
-                    if player.hp < 0:
-                        player.hp = 0
-                else:
-                    player.hp -= 1
+        message_id = update.chosen_inline_result.inline_message_id
 
-                if player.hp != 0:
-                    game.turn()
-                    message_fail.reply_text(f"你剩下 {player.hp} 點血！")
-                else:
-                    message_fail.reply_text("魔法師死亡！")
-            context.bot.send_message(chat.id, text=make_round_settlement(game))
+        if result_id.isdigit() and 1 <= int(result_id) <= 8:
+            events = engine.cast(game, player, Card.from_id(result_id))
+        elif result_id == "pass":
+            events = engine.pass_turn(game, player)
+        else:
+            logger.info(f"Result: {result_id} is run into else clause!")
+            # The card cannot be played
+            return
 
-            if game.has_end():
-                game.scoring()
+        dice = await self.play(game, user, events, message_id)
+        if not isinstance(events[0], REJECTED):
+            await self.refresh(game)
+            self.save(
+                "pass" if result_id == "pass" else "cast",
+                chat.id,
+                user,
+                card=result_id,
+                dice=dice,
+                local=dice is not None and config.DICE == "local",
+            )
+            await self.autoplay(game)
+
+    async def play(
+        self,
+        game: Game,
+        user: User,
+        events: List[engine.Event],
+        message_id: Optional[str] = None,
+        anchor: Optional[Message] = None,
+        dice_message: Optional[Message] = None,
+    ) -> Optional[int]:
+        """Tell the chat about the events of a move, returns the dice rolled"""
+        chat = game.chat
+        live = self.board is not None
+        dice = None
+
+        async def reply(text: str) -> Message:
+            return await self.api.send_message(
+                chat.id, text, reply_to_message_id=message_id
+            )
 
-                if not game.has_winner():
-                    context.bot.send_message(
-                        chat.id, text=make_current_settlement(game)
+        async def answer(message: Optional[Message], text: str):
+            # Moves resumed after a restart have nothing to reply to
+            if message is None:
+                await self.api.post_message(chat.id, text)
+            else:
+                await self.reply(message, text)
+
+        for event in events:
+            if self.event_log is not None:
+                self.event_log.record(game, (event,))
+            if isinstance(event, engine.NotYourTurn):
+                await reply(display_name(user) + " 還沒輪到你！")
+            elif isinstance(event, engine.WeakerCard):
+                await reply(display_name(user) + " 你只能施展更強大的魔法！")
+            elif isinstance(event, engine.CannotPass):
+                await reply("還沒施展過魔法無法跳過！")
+            elif isinstance(event, engine.DicePending):
+                await reply(display_name(user) + " 骰子還在滾ㄡ！")
+            elif isinstance(event, engine.CastSucceeded):
+                anchor = await reply(
+                    f"施展成功！第 {event.index+1} 個魔法石被移除！\n你還有 {event.remaining} 個魔法石！"
+                )
+            elif isinstance(event, engine.CastFailed):
+                anchor = await reply(f"施展失敗！你沒有 {event.card}！")
+            elif isinstance(event, engine.DiceRequired):
+                if config.DICE == "local":
+                    # No dice message to wait for, the roll is told in text
+                    dice = game.rng.randint(1, 6)
+                elif self.spawn is not None:
+                    # Rolled and resolved once Telegram answers, meanwhile
+                    # the game is pending and the lane free
+                    self.spawn(partial(self.throw_dice, game, user, anchor))
+                    return None
+                else:
+                    dice_message = await self.api.send_dice(
+                        chat.id, reply_to_message_id=anchor and anchor.message_id
                     )
-                    game.start()
+                    dice = dice_message.dice.value
+                events.extend(engine.roll(game, dice))
+            elif isinstance(event, engine.Rolled):
+                if not event.success:
+                    text = f"骰出了 {event.dice} 你扣了 {event.value} 點血！"
+                elif event.card.rank == 1:
+                    text = f"你骰出了 {event.dice} 所有人扣 {event.value} 點血！"
                 else:
-                    gm.end_game(chat, user)
-                    context.bot.send_message(chat.id, text=make_settlement(game))
-                    return
-            context.bot.send_message(chat.id, text=make_used_cards(game))
-            context.bot.send_message(
-                chat.id, text=make_game_start(game), reply_markup=choices,
-            )
-        elif result_id == "pass":
-            if len(player.cards) == 5:
-                reply("還沒施展過魔法無法跳過！")
-                return
-            else:
-                draw_amount = min(5 - len(player.cards), len(game.deck.cards))
-                game.turn()
-                context.bot.send_message(
+                    text = f"你骰出了 {event.dice} 回復 {event.value} 點血！"
+                await answer(dice_message or anchor, text)
+            elif isinstance(event, engine.Wounded):
+                await answer(anchor, f"你剩下 {event.hp} 點血！")
+            elif isinstance(event, engine.Died):
+                await answer(anchor, "魔法師死亡！")
+            elif isinstance(event, engine.RoundSettled):
+                if not live:
+                    await self.api.post_message(chat.id, make_round_settlement(game))
+            elif isinstance(event, engine.NewRound):
+                if not live:
+                    await self.api.post_message(chat.id, make_current_settlement(game))
+            elif isinstance(event, engine.GameWon):
+                if live:
+                    # Show the final hit points before the board goes away
+                    await self.board.flush(game)
+                    self.forget(chat.id)
+                self.gm.end_game(chat, user)
+                await self.api.post_message(chat.id, make_settlement(game))
+            elif live and isinstance(event, (engine.Prompt, engine.Passed)):
+                # The board shows whose turn it is
+                continue
+            elif isinstance(event, engine.Prompt):
+                await self.api.post_message(chat.id, make_used_cards(game))
+                await self.api.post_message(
+                    chat.id, make_game_start(game), reply_markup=choices
+                )
+            elif isinstance(event, engine.Passed):
+                await self.api.post_message(
                     chat.id,
-                    text=f"補 {draw_amount} 個魔法石\n剩餘 {len(game.deck.cards)} 個魔法石\n換下一位魔法師 "
-                    + display_name(game.current_player.user),
+                    f"補 {event.drawn} 個魔法石\n剩餘 {event.remaining} 個魔法石\n換下一位魔法師 "
+                    + display_name(event.next_player.user),
                     reply_markup=choices,
                 )
+        return dice
+
+    async def throw_dice(self, game: Game, user: User, anchor: Optional[Message]):
+        """Send the dice of a pending move, then resolve it on the chat's lane"""
+        try:
+            message = await self.api.send_dice(
+                game.chat.id, reply_to_message_id=anchor and anchor.message_id
+            )
+        except Exception:
+            logger.exception(f"Failed to send the dice to chat {game.chat.id}")
+            # Do not leave the game stuck, roll here instead
+            message = None
+        resolve = partial(self.resolve_dice, game, user, anchor, message)
+        self.submit(game.chat.id, resolve)
+
+    async def resolve_dice(
+        self,
+        game: Game,
+        user: User,
+        anchor: Optional[Message],
+        dice_message: Optional[Message],
+    ):
+        if game.pending is None or not self.gm.is_live(game):
+            return
+        dice = dice_message.dice.value if dice_message else game.rng.randint(1, 6)
+        events = engine.roll(game, dice)
+        await self.play(game, user, events, anchor=anchor, dice_message=dice_message)
+        await self.refresh(game)
+        self.save("roll", game.chat.id, user, dice=dice, local=dice_message is None)
+        await self.autoplay(game)
+
+    async def resume(self):
+        """Carry on with the restored games that wait for the bot itself"""
+        for games in list(self.gm.chatid_games.values()):
+            for game in games:
+                if not game.started or game.ended:
+                    continue
+                job = partial(self.resume_game, game)
+                if self.submit is None:
+                    await job()
+                else:
+                    self.submit(game.chat.id, job)
+
+    async def resume_game(self, game: Game):
+        if not self.gm.is_live(game):
+            return
+        if game.pending is None:
+            # A computer player may have been about to move
+            await self.autoplay(game)
+            return
+        # The dice of a move journaled just before a restart was never rolled
+        user = game.pending.player.user
+        if self.spawn is not None and config.DICE != "local":
+            self.spawn(partial(self.throw_dice, game, user, None))
         else:
-            logger.info(f"Result: {result_id} is run into else clause!")
-            # The card cannot be played
+            await self.resolve_dice(game, user, None, None)
+
+    async def autoplay(self, game: Game):
+        """Let the computer player whose turn it is move"""
+        if self.brain is None or not game.started or game.ended:
+            return
+        player = game.current_player
+        if game.pending is not None or not ai.is_computer(player):
+            return
+        think = partial(self.think, game, game.version, ai.observe(game, player))
+        if self.spawn is None:
+            await think()
+        else:
+            self.spawn(think)
+
+    async def think(self, game: Game, version: int, view: ai.View):
+        try:
+            move = await self.brain.think(view)
+        except Exception:
+            # A dead worker must not leave the computer's turn hanging
+            logger.exception(f"Search failed in chat {game.chat.id}")
+            move = ai.fallback(view)
+        job = partial(self.move, game, version, move)
+        if self.submit is None:
+            await job()
+        else:
+            self.submit(game.chat.id, job)
+
+    async def move(self, game: Game, version: int, move: int):
+        """Play the move of a computer player unless the game went on meanwhile"""
+        if game.version != version or not self.gm.is_live(game):
+            return
+        player = game.current_player
+        if move == ai.PASS:
+            events = engine.pass_turn(game, player)
+        else:
+            events = engine.cast(game, player, STONES[move - 1])
+        if isinstance(events[0], REJECTED):
+            logger.warning(f"Computer move {move} in chat {game.chat.id} rejected")
+            return
+        dice = await self.play(game, player.user, events)
+        await self.refresh(game)
+        self.save(
+            "pass" if move == ai.PASS else "cast",
+            game.chat.id,
+            player.user,
+            card="pass" if move == ai.PASS else str(move),
+            dice=dice,
+            local=dice is not None and config.DICE == "local",
+        )
+        await self.autoplay(game)
 
-    def reply_callback(self, update: Update, context: CallbackContext):
+    async def expire(self, game: Game):
+        """End ``game`` if nobody touched it for too long"""
+        if not self.gm.expire_game(game):
+            return
+        chat_id = game.chat.id
+        self.save("expire", chat_id)
+        self.forget(chat_id)
+        await self.api.post_message(chat_id, "太久沒動靜，房間關掉ㄌ")
+
+    async def reply_callback(self, update: Update, context: CallbackContext):
         return
 
-    def delete_invalid(self, update: Update, context: CallbackContext):
+    async def delete_invalid(self, update: Update, context: CallbackContext):
         if update.message.text == INVALID_INPUT_TEXT:
-            update.message.delete()
+            await self.api.delete_message(
+                update.message.chat_id, update.message.message_id
+            )
 
     def error(self, update: Update, context: CallbackContext):
         """Simple error handler"""
         raise context.error
 
     def launch(self):
-        self.updater.start_polling()
-        self.updater.idle()
+        updater = Updater(bot=self.bot, workers=1)
+        scheduler = ChatScheduler(config.WORKERS)
+        QUEUED_UPDATES.set_function(lambda: scheduler.pending)
+        self.register(updater.dispatcher, scheduler)
+        # Dice sends wait for Telegram here instead of on a dispatcher worker
+        dice = ThreadPoolExecutor(config.API_WORKERS, thread_name_prefix="dice")
+        self.spawn = lambda job: dice.submit(run, job())
+        self.submit = lambda key, job: scheduler.submit(key, lambda: run(job()))
+        if self.board is not None:
+            self.board.defer = partial(defer_threaded, self.submit)
+        sweeper = Sweeper(
+            self.gm, lambda game: self.submit(game.chat.id, partial(self.expire, game))
+        )
+        sweeper.start()
+        self.spawn(self.resume)
+        if config.WEBHOOK_URL:
+            # The dispatcher only matches handlers and hands the update to the
+            # scheduler, so the server thread can feed it directly
+            server = webhook(self.bot, updater.dispatcher.process_update)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            server.server_close()
+        else:
+            updater.start_polling()
+            updater.idle()
+        sweeper.stop()
+        scheduler.shutdown()
 
 
+# Ops of Room.save that are moves
+MOVES = {"cast", "pass", "roll"}
+
+# Events that turn a move down without changing the game
+REJECTED = (
+    engine.NotYourTurn,
+    engine.WeakerCard,
+    engine.CannotPass,
+    engine.DicePending,
+)
+
 choices = InlineKeyboardMarkup(
     [[InlineKeyboardButton("選牌！", switch_inline_query_current_chat="")]]
 )
 
 
-gm = GameManager()
+def webhook(bot: Bot, sink: Optional[Callable[[Update], None]] = None) -> WebhookServer:
+    """Bind the webhook server and point Telegram to it"""
+    path = urlparse(config.WEBHOOK_URL).path or "/"
+    server = WebhookServer(bot, sink, config.WEBHOOK_LISTEN, config.WEBHOOK_PORT, path)
+    bot.set_webhook(config.WEBHOOK_URL, max_connections=config.WEBHOOK_MAX_CONNECTIONS)
+    return server
+
+
+def make_api(bot: Bot, asynchronous: bool, shards: int = 1) -> Api:
+    if asynchronous:
+        api = ExecutorApi(bot, config.API_WORKERS)
+    else:
+        api = Api(bot)
+    if config.OUTBOX:
+        # Shards split the global budget of the bot
+        outbox = Outbox(
+            bot,
+            config.API_WORKERS,
+            config.FLOOD_GLOBAL_RATE / shards,
+            config.FLOOD_CHAT_RATE,
+            config.FLOOD_CHAT_BURST,
+        )
+        if not asynchronous:
+            outbox.start()
+        OUTBOX_DEPTH.set_function(outbox.depth)
+        api = OutboxApi(outbox, api)
+    return api
+
+
+def make_store(gm: GameManager, bot: Bot, directory: str) -> Store:
+    store = Store(directory, config.SNAPSHOT_INTERVAL, config.JOURNAL_FSYNC_INTERVAL)
+    store.restore(gm, bot)
+    store.start()
+    return store
+
+
+def serve_metrics(gm: GameManager, port: int):
+    """Expose the metrics, with gauges about the games of ``gm``"""
+    GAMES.set_function(lambda: sum(map(len, list(gm.chatid_games.values()))))
+    PLAYERS.set_function(lambda: len(gm.userchat_player))
+    MetricsServer(config.METRICS_LISTEN, port).start()
+
+
+def sweep(room: Room, runtime: AsyncRuntime) -> Sweeper:
+    """Expire idle games on the chat scheduler of ``runtime``"""
+    sweeper = Sweeper(
+        room.gm,
+        lambda game: runtime.submit(game.chat.id, partial(room.expire, game)),
+    )
+    sweeper.start()
+    return sweeper
+
+
+def defer_threaded(submit: Submit, delay: float, key: Hashable, job: Job):
+    """Hand ``job`` to ``submit`` after ``delay`` seconds"""
+    timer = Timer(delay, submit, (key, job))
+    timer.daemon = True
+    timer.start()
+
+
+def live_board(api: Api) -> Optional[LiveBoard]:
+    if not config.LIVE_BOARD:
+        return None
+    return LiveBoard(api, choices, config.BOARD_DEBOUNCE)
+
+
+def make_event_log(directory: Optional[str]) -> Optional[EventLog]:
+    if not directory:
+        return None
+    event_log = EventLog(
+        directory,
+        config.EVENT_LOG_MAX_BYTES,
+        config.EVENT_LOG_BACKUPS,
+        config.EVENT_LOG_BUFFER,
+    )
+    event_log.start()
+    return event_log
+
+
+def make_brain() -> Optional[ai.Brain]:
+    if not config.AI_WORKERS:
+        return None
+    return ai.Brain(config.AI_WORKERS, config.AI_BUDGET)
+
+
+def bind(room: Room, runtime: AsyncRuntime):
+    """
+    Let ``room`` run dice sends, computer moves and board edits on ``runtime``,
+    and resume the restored games once it runs
+    """
+    room.spawn = runtime.spawn
+    room.submit = runtime.submit
+    runtime.on_start.append(partial(runtime.spawn, room.resume))
+    if room.board is not None:
+        room.board.defer = lambda delay, key, job: runtime.loop.call_later(
+            delay, runtime.submit, key, job
+        )
+
 
-Room(Updater(token=TOKEN, workers=WORKERS)).launch()
+def setup_logging():
+    logging.basicConfig(
+        format="%(asctime)s - %(filename)s:%(lineno)d - %(levelname)s - %(message)s",
+        level=logging.INFO,
+    )
+
+
+def shard_worker(index: int, shards: int, queue: Queue):
+    """Entry point of a shard process, handles the updates routed to it"""
+    setup_logging()
+    gm = GameManager()
+    gm.userid_current = SharedCurrent(CurrentStore(config.SHARD_STORE))
+    request = Request(con_pool_size=2 * config.API_WORKERS + 1)
+    bot = Bot(config.TOKEN, request=request)
+    store = None
+    if config.STATE_DIR:
+        store = make_store(gm, bot, os.path.join(config.STATE_DIR, f"shard{index}"))
+
+    if config.METRICS_PORT:
+        serve_metrics(gm, config.METRICS_PORT + 1 + index)
+
+    api = make_api(bot, True, shards)
+    event_log = None
+    if config.EVENT_LOG_DIR:
+        event_log = make_event_log(os.path.join(config.EVENT_LOG_DIR, f"shard{index}"))
+    room = Room(bot, gm, api, store, live_board(api), make_brain(), event_log)
+    runtime = AsyncRuntime(room.api, room.make_handlers(), room.chat_key)
+    QUEUED_UPDATES.set_function(lambda: runtime.scheduler.pending)
+    sweep(room, runtime)
+    bind(room, runtime)
+    try:
+        asyncio.run(runtime.consume(queue))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if store is not None:
+            store.close()
+        if room.brain is not None:
+            room.brain.close()
+        if event_log is not None:
+            event_log.close()
+
+
+def main():
+    setup_logging()
+    if config.SHARDS > 1:
+        bot = Bot(config.TOKEN)
+        server = webhook(bot) if config.WEBHOOK_URL else None
+        serve(bot, config.SHARDS, shard_worker, config.SHARD_STORE, server)
+        return
+
+    gm = GameManager()
+    asynchronous = config.RUNTIME == "asyncio"
+    if asynchronous:
+        pool = 2 * config.API_WORKERS + 1
+    else:
+        pool = config.WORKERS + config.API_WORKERS + 4
+    bot = Bot(config.TOKEN, request=Request(con_pool_size=pool))
+    store = make_store(gm, bot, config.STATE_DIR) if config.STATE_DIR else None
+    if config.METRICS_PORT:
+        serve_metrics(gm, config.METRICS_PORT)
+
+    api = make_api(bot, asynchronous)
+    event_log = make_event_log(config.EVENT_LOG_DIR)
+    room = Room(bot, gm, api, store, live_board(api), make_brain(), event_log)
+    try:
+        if asynchronous:
+            runtime = AsyncRuntime(room.api, room.make_handlers(), room.chat_key)
+            QUEUED_UPDATES.set_function(lambda: runtime.scheduler.pending)
+            sweep(room, runtime)
+            bind(room, runtime)
+            runtime.run(webhook(bot) if config.WEBHOOK_URL else None)
+        else:
+            room.launch()
+    finally:
+        if store is not None:
+            store.close()
+        if room.brain is not None:
+            room.brain.close()
+        if event_log is not None:
+            event_log.close()
+
+
+if __name__ == "__main__":
+    main()
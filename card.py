@@ -1,62 +1,146 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from json import load
-from operator import eq, ge, gt, le, lt
-from typing import Tuple, Union
+import json
+import os
+from typing import Dict, Tuple, Union
 
-PASS = {
-    "icon": "⏭️",
-    "sticker_id": "CAACAgUAAxkBAAECMzVgfHIPWXCWF7Rp7CekQ4rV_fI6yAACSQIAAi974VdHJthaSiSIex8E",
-}
+from catalog import CATALOG
 
 
-@dataclass
 class Card:
+    """
+    An immutable magic stone.
+    Every stone exists once in the registry, use :meth:`from_id` to look it up
+    instead of creating new instances.
+    """
+
+    __slots__ = ("id", "rank", "icon", "name", "effect", "sticker_id", "_short", "_str")
+
     id: str
+    rank: int
     icon: str
     name: str
     effect: str
     sticker_id: str
 
+    def __init__(
+        self, id: str, rank: int, icon: str, name: str, effect: str, sticker_id: str
+    ):
+        for key, value in (
+            ("id", id),
+            ("rank", rank),
+            ("icon", icon),
+            ("name", name),
+            ("effect", effect),
+            ("sticker_id", sticker_id),
+            ("_short", f"{icon} ({id})"),
+            ("_str", f"{icon} {name} ({id})"),
+        ):
+            object.__setattr__(self, key, value)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Card is immutable")
+
+    def __delattr__(self, key):
+        raise AttributeError("Card is immutable")
+
+    def __reduce__(self):
+        return Card.from_id, (self.id,)
+
     @classmethod
-    def from_id(cls, id: str) -> Card:
-        return cls(id, **stones[id])
+    def from_id(cls, id: Union[int, str]) -> Card:
+        return registry[id]
 
-    def __extract(self, obj: Union[int, str, Card]) -> Tuple[int, int]:
-        a = int(self.id)
+    def __rank(self, obj: Union[int, str, Card]) -> int:
+        if obj.__class__ is Card:
+            return obj.rank
         if isinstance(obj, int):
-            b = obj
-        elif isinstance(obj, str):
-            b = int(obj)
-        else:
-            b = int(obj.id)
-        return a, b
+            return obj
+        return registry[obj].rank
+
+    def __hash__(self):
+        return self.rank
 
     def __eq__(self, obj):
-        return eq(*self.__extract(obj))
+        if obj is self:
+            return True
+        if isinstance(obj, (Card, int, str)):
+            return self.rank == self.__rank(obj)
+        return NotImplemented
 
     def __ge__(self, obj):
-        return ge(*self.__extract(obj))
+        return self.rank >= self.__rank(obj)
 
     def __gt__(self, obj):
-        return gt(*self.__extract(obj))
+        return self.rank > self.__rank(obj)
 
     def __le__(self, obj):
-        return le(*self.__extract(obj))
+        return self.rank <= self.__rank(obj)
 
     def __lt__(self, obj):
-        return lt(*self.__extract(obj))
+        return self.rank < self.__rank(obj)
 
-    def short(self):
-        return f"{self.icon} ({self.id})"
+    def short(self) -> str:
+        return self._short
 
     def __str__(self) -> str:
-        return f"{self.icon} {self.name} ({self.id})"
+        return self._str
 
+    def __repr__(self) -> str:
+        return f"Card({self.id!r})"
 
-stones = load(open("stones.json"))
-CARDS = [Card.from_id(str(i)) for i in range(1, 9) for _ in range(i)]
-assert len(CARDS) == 36
 
-print("[INFO] Cards loaded")
+PASS = Card(
+    "pass",
+    0,
+    "⏭️",
+    "跳過",
+    "",
+    "CAACAgUAAxkBAAECMzVgfHIPWXCWF7Rp7CekQ4rV_fI6yAACSQIAAi974VdHJthaSiSIex8E",
+)
+STONES: Tuple[Card, ...] = tuple(Card(*row) for row in CATALOG)
+
+registry: Dict[Union[int, str], Card] = {PASS.id: PASS}
+for card in STONES:
+    registry[card.id] = registry[card.rank] = card
+del card
+
+CARDS = [card for card in STONES for _ in range(card.rank)]
+assert len(CARDS) == 36
+# Copies of every stone, by rank
+TOTAL = [CARDS.count(stone) for stone in STONES]
+
+
+def _literal(value: Union[int, str]) -> str:
+    """``repr`` of ``value`` with the double quotes black prefers"""
+    text = repr(value)
+    if isinstance(value, str) and '"' not in value:
+        text = '"' + text[1:-1].replace("\\'", "'") + '"'
+    return text
+
+
+def compile_catalog(source: str = "stones.json", target: str = "catalog.py"):
+    """
+    Write the stones of ``source`` as a module importable without any I/O,
+    formatted the way black would
+    """
+    with open(source, encoding="utf-8") as f:
+        stones = json.load(f)
+    with open(target, "w", encoding="utf-8") as f:
+        name = os.path.basename(source)
+        f.write(f'"""Generated from {name} by `python card.py`, do not edit"""\n')
+        f.write("CATALOG = (\n")
+        for rank in range(1, 9):
+            stone = stones[str(rank)]
+            row = (str(rank), rank) + tuple(
+                stone[key] for key in ("icon", "name", "effect", "sticker_id")
+            )
+            f.write("    (\n")
+            for value in row:
+                f.write(f"        {_literal(value)},\n")
+            f.write("    ),\n")
+        f.write(")\n")
+
+
+if __name__ == "__main__":
+    compile_catalog()
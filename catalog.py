@@ -0,0 +1,67 @@
+"""Generated from stones.json by `python card.py`, do not edit"""
+CATALOG = (
+    (
+        "1",
+        1,
+        "🐉",
+        "古代巨龍",
+        "自已以外扣 1-3 點血",
+        "CAACAgUAAxkBAAECMsxgfBrtWkQdrI9Q79NBEwYyc18m6wACmwIAAjnR4Ff0xZ5rF5Q-OB8E",
+    ),
+    (
+        "2",
+        2,
+        "👻",
+        "黑暗幽靈",
+        "自己回復 1 點血，其餘扣 1 點血",
+        "CAACAgUAAxkBAAECMs5gfBr2b6EO-0hxXRdY_nERzdCSvAAC4AIAAozc4FeRzPIKxZBFXB8E",
+    ),
+    (
+        "3",
+        3,
+        "🦄",
+        "甜蜜的夢",
+        "回復 1-3 點血",
+        "CAACAgUAAxkBAAECMtBgfBr-okBNJOY95lEvKqS2AZ1ujgACVwMAAvqD4VeKiJSPSx3K9h8E",
+    ),
+    (
+        "4",
+        4,
+        "🦉",
+        "貓頭鷹",
+        "抽 1 個祕密魔法石",
+        "CAACAgUAAxkBAAECMtJgfBsHUO_KBNt9Tc7kEfZ9_0kXGgACQgIAAl2q4VfQUWX2QxpoAh8E",
+    ),
+    (
+        "5",
+        5,
+        "⚡",
+        "閃電暴風雨",
+        "左右的魔法師扣 1 點血",
+        "CAACAgUAAxkBAAECMtRgfBsRd9FsshLiIDrd1NdRa6OSeQACnQIAAnKz4FdlpPYhFPrsCx8E",
+    ),
+    (
+        "6",
+        6,
+        "❄️️",
+        "暴風雪",
+        "左邊的魔法師扣 1 點血",
+        "CAACAgUAAxkBAAECMtZgfBscq_3idheltRHGS6Ni7ECzQAACowIAAiT84VejtZvT3KBNCx8E",
+    ),
+    (
+        "7",
+        7,
+        "️\u200d🔥",
+        "火球",
+        "右邊的魔法師扣 1 點血",
+        "CAACAgUAAxkBAAECMthgfBskkZ7BxeqDwGEI1CiMTrjxSgAC0AMAAuZ34VfQaiHPdH_rLR8E",
+    ),
+    (
+        "8",
+        8,
+        "🧪",
+        "魔法藥水",
+        "自己回復 1 點血",
+        "CAACAgUAAxkBAAECMtpgfBsxVJJdSk4oEhYQ8n6TTfJitwAC7AIAAkbj4FfhUL5GvFSc4B8E",
+    ),
+)
@@ -1,11 +1,72 @@
+"""
+Settings from config.json, read on first use.
+
+Modules look settings up as ``config.TOKEN`` when they need them, so
+importing any module neither touches the disk nor needs a config.json.
+"""
 import json
+from typing import Any, Dict, Optional
+
+PATH = "config.json"
+
+_settings: Optional[Dict[str, Any]] = None
+
+
+def load(path: str = PATH) -> Dict[str, Any]:
+    """Read ``path``, every setting missing from it takes its default"""
+    try:
+        with open(path, "r") as f:
+            config = json.loads(f.read())
+    except FileNotFoundError:
+        config = {}
+
+    return {
+        "TOKEN": config.get("token"),
+        "WORKERS": config.get("workers", 32),
+        "ADMIN_LIST": config.get("admin_list", None),
+        "OPEN_LOBBY": config.get("open_lobby", True),
+        "MIN_PLAYERS": config.get("min_players", 2),
+        "MAX_PLAYERS": config.get("max_players", 5),
+        "RUNTIME": config.get("runtime", "threaded"),
+        "API_WORKERS": config.get("api_workers", 8),
+        "OUTBOX": config.get("outbox", True),
+        "FLOOD_GLOBAL_RATE": config.get("flood_global_rate", 30),
+        "FLOOD_CHAT_RATE": config.get("flood_chat_rate", 1),
+        "FLOOD_CHAT_BURST": config.get("flood_chat_burst", 4),
+        "WEBHOOK_URL": config.get("webhook_url"),
+        "WEBHOOK_LISTEN": config.get("webhook_listen", "127.0.0.1"),
+        "WEBHOOK_PORT": config.get("webhook_port", 8443),
+        "WEBHOOK_MAX_CONNECTIONS": config.get("webhook_max_connections", 40),
+        "STATE_DIR": config.get("state_dir"),
+        "SNAPSHOT_INTERVAL": config.get("snapshot_interval", 300),
+        "JOURNAL_FSYNC_INTERVAL": config.get("journal_fsync_interval", 0.05),
+        "SHARDS": config.get("shards", 1),
+        "SHARD_STORE": config.get("shard_store", "current.db"),
+        "METRICS_LISTEN": config.get("metrics_listen", "127.0.0.1"),
+        "METRICS_PORT": config.get("metrics_port"),
+        "LOBBY_TTL": config.get("lobby_ttl", 3600),
+        "GAME_TTL": config.get("game_ttl", 86400),
+        "SWEEP_INTERVAL": config.get("sweep_interval", 60),
+        "LIVE_BOARD": config.get("live_board", False),
+        "BOARD_DEBOUNCE": config.get("board_debounce", 1.0),
+        "DICE": config.get("dice", "telegram"),
+        "AI_WORKERS": config.get("ai_workers", 1),
+        "AI_BUDGET": config.get("ai_budget", 1.0),
+        "EVENT_LOG_DIR": config.get("event_log_dir"),
+        "EVENT_LOG_MAX_BYTES": config.get("event_log_max_bytes", 64 << 20),
+        "EVENT_LOG_BACKUPS": config.get("event_log_backups", 10),
+        "EVENT_LOG_BUFFER": config.get("event_log_buffer", 10000),
+    }
 
-with open("config.json", "r") as f:
-    config = json.loads(f.read())
 
-TOKEN = config.get("token")
-WORKERS = config.get("workers", 32)
-ADMIN_LIST = config.get("admin_list", None)
-OPEN_LOBBY = config.get("open_lobby", True)
-MIN_PLAYERS = config.get("min_players", 2)
-MAX_PLAYERS = config.get("max_players", 5)
+def __getattr__(name: str) -> Any:
+    global _settings
+    if _settings is None:
+        _settings = load()
+    try:
+        value = _settings[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    # Later lookups find the plain module attribute
+    globals()[name] = value
+    return value
@@ -1,28 +1,30 @@
 from __future__ import annotations
 
 from logging import getLogger
-from random import shuffle
-from typing import TYPE_CHECKING, List
+from typing import TYPE_CHECKING, Iterable, Optional
 
 from errors import DeckEmptyError
+from hand import Hand
 
 if TYPE_CHECKING:
     from card import Card
+    from rng import Stream
 
 
 class Deck:
-    def __init__(self):
-        self.cards = []
+    def __init__(self, rng: Optional[Stream] = None):
+        self.cards = Hand()
+        # rng.DEFAULT when None
+        self.rng = rng
 
         self.logger = getLogger(__name__)
 
-    def init(self, cards: List[Card]):
-        self.cards = cards
-        shuffle(self.cards)
+    def init(self, cards: Iterable[Card]):
+        self.cards = Hand.from_cards(cards)
 
     def draw(self) -> Card:
         if len(self.cards) > 0:
-            card = self.cards.pop()
+            card = self.cards.pop_random(self.rng)
             self.logger.debug("Drawing card " + str(card))
             return card
         raise DeckEmptyError()
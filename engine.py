@@ -0,0 +1,254 @@
+"""
+Network-free rules engine.
+
+Every move is resolved against a :class:`Game` and reported as a list of
+events. The bot renders those events into messages, while simulations and
+replays can drive the very same rules without a Telegram stand-in.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:
+    from card import Card
+    from game import Game
+    from player import Player
+
+MAX_HP = 6
+
+
+@dataclass
+class Event:
+    player: Player
+
+
+@dataclass
+class NotYourTurn(Event):
+    pass
+
+
+@dataclass
+class WeakerCard(Event):
+    card: Card
+
+
+@dataclass
+class CannotPass(Event):
+    pass
+
+
+@dataclass
+class DicePending(Event):
+    pass
+
+
+@dataclass
+class CastSucceeded(Event):
+    card: Card
+    index: int
+    remaining: int
+
+
+@dataclass
+class CastFailed(Event):
+    card: Card
+
+
+@dataclass
+class DiceRequired(Event):
+    """The move waits for a dice value, feed it back with :func:`roll`"""
+
+    card: Card
+    success: bool
+
+
+@dataclass
+class Rolled(Event):
+    card: Card
+    success: bool
+    dice: int
+    value: int
+
+
+@dataclass
+class Wounded(Event):
+    hp: int
+
+
+@dataclass
+class Died(Event):
+    pass
+
+
+@dataclass
+class Passed(Event):
+    drawn: int
+    remaining: int
+    next_player: Player
+
+
+@dataclass
+class RoundSettled(Event):
+    pass
+
+
+@dataclass
+class NewRound(Event):
+    pass
+
+
+@dataclass
+class GameWon(Event):
+    pass
+
+
+@dataclass
+class Prompt(Event):
+    """The current player should choose the next magic"""
+
+
+@dataclass
+class Pending:
+    player: Player
+    card: Card
+    success: bool
+
+
+def dice_value(dice: int) -> int:
+    """Map a 1-6 dice to the 1-3 points it is worth"""
+    return 3 if dice % 3 == 0 else dice % 3
+
+
+def needs_dice(card: Card, success: bool) -> bool:
+    if card.rank == 1:
+        return True
+    return success and card.rank == 3
+
+
+def cast(game: Game, player: Player, card: Card) -> List[Event]:
+    """Let ``player`` try to cast ``card``"""
+    rejected = _check(game, player)
+    if rejected:
+        return rejected
+    if player.last_played and player.last_played > card:
+        return [WeakerCard(player, card)]
+
+    events: List[Event] = []
+    success = player.has(card)
+    if success:
+        index = player.play(card)
+        events.append(CastSucceeded(player, card, index, len(player.cards)))
+    else:
+        events.append(CastFailed(player, card))
+
+    if needs_dice(card, success):
+        game.pending = Pending(player, card, success)
+        events.append(DiceRequired(player, card, success))
+        return events
+
+    if success:
+        _apply_effect(game, player, card)
+        _clamp(game)
+    else:
+        player.hp -= 1
+        _clamp(game)
+        _after_failure(game, player, events)
+    _settle(game, player, events)
+    return events
+
+
+def roll(game: Game, dice: int) -> List[Event]:
+    """Resolve the pending move with a 1-6 dice"""
+    pending: Optional[Pending] = game.pending
+    if pending is None:
+        raise ValueError("No pending move")
+    game.pending = None
+
+    player, card = pending.player, pending.card
+    value = dice_value(dice)
+    events: List[Event] = [Rolled(player, card, pending.success, dice, value)]
+    if pending.success:
+        _apply_effect(game, player, card, value)
+        _clamp(game)
+    else:
+        player.hp -= value
+        _clamp(game)
+        _after_failure(game, player, events)
+    _settle(game, player, events)
+    return events
+
+
+def pass_turn(game: Game, player: Player) -> List[Event]:
+    """End the turn of ``player`` after at least one cast"""
+    rejected = _check(game, player)
+    if rejected:
+        return rejected
+    if len(player.cards) == 5:
+        return [CannotPass(player)]
+
+    drawn = min(5 - len(player.cards), len(game.deck.cards))
+    game.turn()
+    return [Passed(player, drawn, len(game.deck.cards), game.current_player)]
+
+
+def _check(game: Game, player: Player) -> List[Event]:
+    if player is not game.current_player:
+        return [NotYourTurn(player)]
+    if game.pending is not None:
+        return [DicePending(player)]
+    return []
+
+
+def _apply_effect(game: Game, player: Player, card: Card, value: int = 0):
+    rank = card.rank
+    if rank == 1:
+        for p in game.players:
+            if p is not player:
+                p.hp -= value
+    elif rank == 2:
+        player.hp += 1
+    elif rank == 3:
+        player.hp += value
+    elif rank == 4:
+        s_card = game.secret_cards.pop(0)
+        player.secret_cards.append(s_card)
+        game.bump()
+    elif rank == 5:
+        if player.left is not player.right:
+            player.right.hp -= 1
+        player.left.hp -= 1
+    elif rank == 6:
+        player.left.hp -= 1
+    elif rank == 7:
+        player.right.hp -= 1
+    elif rank == 8:
+        player.hp += 1
+
+
+def _clamp(game: Game):
+    for p in game.players:
+        if p.hp > MAX_HP:
+            p.hp = MAX_HP
+        elif p.hp < 0:
+            p.hp = 0
+
+
+def _after_failure(game: Game, player: Player, events: List[Event]):
+    if player.hp != 0:
+        game.turn()
+        events.append(Wounded(player, player.hp))
+    else:
+        events.append(Died(player))
+
+
+def _settle(game: Game, player: Player, events: List[Event]):
+    events.append(RoundSettled(player))
+    if game.has_end():
+        game.scoring()
+        if game.has_winner():
+            events.append(GameWon(player))
+            return
+        game.start()
+        events.append(NewRound(player))
+    events.append(Prompt(game.current_player))
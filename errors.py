@@ -1,25 +1,29 @@
-class NoGameInChatError(Exception):
+class GameError(Exception):
+    """Base of the errors a handler reports back to the chat"""
+
+
+class NoGameInChatError(GameError):
     pass
 
 
-class AlreadyJoinedError(Exception):
+class AlreadyJoinedError(GameError):
     pass
 
 
-class LobbyClosedError(Exception):
+class LobbyClosedError(GameError):
     pass
 
 
-class NotEnoughPlayersError(Exception):
+class NotEnoughPlayersError(GameError):
     pass
 
 
-class DeckEmptyError(Exception):
+class DeckEmptyError(GameError):
     pass
 
 
-class GameStartedException(Exception):
+class GameStartedException(GameError):
     pass
 
-class CanNotDiscardError(Exception):
+class CanNotDiscardError(GameError):
     pass
@@ -0,0 +1,180 @@
+"""
+Structured log of what happens in games.
+
+Every lifecycle change and every move becomes one compact JSON line, e.g.::
+
+    {"t":1700000000.123,"chat":-100,"ev":"cast","user":42,"card":5,"slot":2,"left":3}
+
+Handlers only append records to a bounded buffer, a background thread wakes
+up every ``flush_interval`` seconds, encodes what piled up and appends it to
+``events.<n>.log`` segments, starting a new segment once one
+grows past ``max_bytes`` and keeping the newest ``backups`` of them. When the
+writer falls behind, records are dropped and counted rather than making the
+handler wait.
+"""
+from __future__ import annotations
+
+import json
+import os
+from collections import deque
+from glob import glob
+from logging import getLogger
+from threading import Event, Thread
+from time import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+)
+
+import engine
+from metrics import Counter
+
+if TYPE_CHECKING:
+    from game import Game
+
+logger = getLogger(__name__)
+
+EVENTS_DROPPED = Counter(
+    "abracada_events_dropped_total", "Game events dropped with the log buffer full"
+)
+
+
+def _scores(event: engine.Event) -> Dict[str, Any]:
+    players = event.player.game.players
+    return {
+        "users": [p.user.id for p in players],
+        "score": [p.score for p in players],
+    }
+
+
+# What is logged of an engine event besides its player, rejected moves and
+# prompts change nothing and are left out
+ENCODERS: Dict[type, Callable[[Any], Dict[str, Any]]] = {
+    engine.CastSucceeded: lambda e: {
+        "ev": "cast",
+        "card": e.card.rank,
+        "slot": e.index,
+        "left": e.remaining,
+    },
+    engine.CastFailed: lambda e: {"ev": "fail", "card": e.card.rank},
+    engine.Rolled: lambda e: {"ev": "roll", "card": e.card.rank, "dice": e.dice},
+    engine.Wounded: lambda e: {"ev": "wound", "hp": e.hp},
+    engine.Died: lambda e: {"ev": "die"},
+    engine.Passed: lambda e: {"ev": "pass", "drawn": e.drawn},
+    engine.NewRound: lambda e: {"ev": "round", **_scores(e)},
+    engine.GameWon: lambda e: {"ev": "win", **_scores(e)},
+}
+
+
+def segments(directory: str) -> List[str]:
+    """Event log segments, oldest first"""
+    paths = glob(os.path.join(directory, "events.*.log"))
+    return sorted(paths, key=lambda path: int(path.rsplit(".", 2)[1]))
+
+
+class EventLog:
+    """Append-only, rotated game event log written by a background thread"""
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 64 << 20,
+        backups: int = 10,
+        buffer: int = 10_000,
+        flush_interval: float = 0.5,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.buffer = buffer
+        self.flush_interval = flush_interval
+        # Appends and pops of a deque are atomic, no lock on the hot path
+        self.pending: Deque[Dict[str, Any]] = deque()
+        self.written = 0
+        self.dropped = 0
+        self.stopped = Event()
+        self.thread: Optional[Thread] = None
+        self.file = None
+        self.number = 0
+
+    def emit(self, chat_id: int, ev: str, user_id: Optional[int] = None, **fields):
+        """Queue a record, never waits"""
+        record = {"t": round(time(), 3), "chat": chat_id, "ev": ev}
+        if user_id is not None:
+            record["user"] = user_id
+        record.update(fields)
+        if len(self.pending) >= self.buffer:
+            self.dropped += 1
+            EVENTS_DROPPED.inc()
+            return
+        self.pending.append(record)
+
+    def record(self, game: Game, events: Iterable[engine.Event]):
+        """Queue a record for every engine event that changed ``game``"""
+        for event in events:
+            encode = ENCODERS.get(type(event))
+            if encode is not None:
+                fields = encode(event)
+                ev = fields.pop("ev")
+                self.emit(game.chat.id, ev, event.player.user.id, **fields)
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        existing = segments(self.directory)
+        if existing:
+            self.number = int(existing[-1].rsplit(".", 2)[1])
+            if os.path.getsize(existing[-1]) >= self.max_bytes:
+                self.number += 1
+        else:
+            self.number = 1
+        path = os.path.join(self.directory, f"events.{self.number}.log")
+        self.file = open(path, "a", encoding="utf-8")
+
+    def _rotate(self):
+        self.file.close()
+        self.number += 1
+        path = os.path.join(self.directory, f"events.{self.number}.log")
+        self.file = open(path, "a", encoding="utf-8")
+        for old in segments(self.directory)[: -self.backups - 1]:
+            os.remove(old)
+
+    def flush(self):
+        """Write the buffered records"""
+        pending = self.pending
+        while pending:
+            record = pending.popleft()
+            self.file.write(
+                json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+            )
+            self.written += 1
+            if self.file.tell() >= self.max_bytes:
+                self._rotate()
+        self.file.flush()
+
+    def _run(self):
+        while not self.stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to write the event log")
+
+    def start(self):
+        self._open()
+        self.thread = Thread(target=self._run, name="eventlog", daemon=True)
+        self.thread.start()
+
+    def close(self):
+        """Write what is queued and stop the writer"""
+        if self.thread is None:
+            return
+        self.stopped.set()
+        self.thread.join()
+        self.thread = None
+        self.flush()
+        self.file.close()
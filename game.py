@@ -2,16 +2,20 @@ from __future__ import annotations
 
 from enum import IntEnum
 from logging import getLogger
-from typing import TYPE_CHECKING, List, Optional
+from time import monotonic
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
 
+import config
 from card import CARDS
-from config import OPEN_LOBBY
 from deck import Deck
 from errors import DeckEmptyError, NotEnoughPlayersError
+from hand import Hand
+from rng import Stream
 
 if TYPE_CHECKING:
     from telegram import User
 
+    from engine import Pending
     from player import Player
 
 
@@ -26,17 +30,35 @@ class Game:
     current_player: Optional[User] = None
     starter: Optional[User] = None
     state: Game.State = State.START
-    open = OPEN_LOBBY
+    pending: Optional[Pending] = None
 
-    def __init__(self, chat):
+    def __init__(self, chat, seed: Optional[int] = None):
         self.chat = chat
-
-        self.deck = Deck()
-        self.used_cards = {str(k): 0 for k in range(1, 9)}
+        # Deals, slots and local dice all draw from here, so a game replays
+        # from its seed and is journaled with the position in the stream
+        self.rng = Stream(seed)
+        self.open = config.OPEN_LOBBY
+        # Bumped whenever hands, last played stones or the turn change
+        self.version = 0
+        # When the game last changed, for expiring idle games
+        self.active = monotonic()
+
+        self.deck = Deck(self.rng)
+        self.used_cards = Hand()
         self.secret_cards = []
+        # Turn order starting at each player, dropped when the seating changes
+        self._roster: Dict[Player, Tuple[Player, ...]] = {}
 
         self.logger = getLogger(__name__)
 
+    def bump(self):
+        self.version += 1
+        self.active = monotonic()
+
+    def reseat(self):
+        """Drop the cached roster, called when players join or leave"""
+        self._roster = {}
+
     @property
     def started(self) -> bool:
         return self.state > Game.State.START
@@ -46,25 +68,25 @@ class Game:
         return self.state == Game.State.END
 
     def start(self):
-        self.deck.init(CARDS.copy())
+        self.deck.init(CARDS)
         p_amount = len(self.players)
-        self.used_cards = {str(k): 0 for k in range(1, 9)}
+        self.used_cards = Hand()
         if 2 <= p_amount <= 3:
             discard_amount = 6 * (4 - p_amount)
-            for i in range(discard_amount):
-                self.used_cards[self.deck.cards[i].id] += 1
-            self.deck.cards = self.deck.cards[discard_amount:]
-        self.secret_cards = self.deck.cards[:4]
-        self.deck.cards = self.deck.cards[4:]
+            for _ in range(discard_amount):
+                self.used_cards.add(self.deck.draw())
+        self.secret_cards = [self.deck.draw() for _ in range(4)]
+        self.pending = None
 
         self.state = Game.State.PLAYING
         self.logger.info(f"{self.state} == {self.State.PLAYING}")
+        self.bump()
 
         for player in self.players:
             player.hp = 6
             player.last_played = None
             player.secret_cards = []
-            player.cards = []
+            player.cards = Hand()
             player.draw()
 
     def turn(self):
@@ -76,19 +98,23 @@ class Game:
         except DeckEmptyError:
             pass
         self.current_player = self.current_player.next
+        self.bump()
 
     @property
-    def players(self) -> List[Player]:
-        if not self.current_player:
-            return []
-
-        players = []
+    def players(self) -> Tuple[Player, ...]:
+        """Players in turn order, starting with the current player"""
         current_player = self.current_player
-        itplayer = current_player.next
-        players.append(current_player)
-        while itplayer and itplayer is not current_player:
-            players.append(itplayer)
-            itplayer = itplayer.next
+        if not current_player:
+            return ()
+
+        players = self._roster.get(current_player)
+        if players is None:
+            seats = [current_player]
+            itplayer = current_player.next
+            while itplayer and itplayer is not current_player:
+                seats.append(itplayer)
+                itplayer = itplayer.next
+            players = self._roster[current_player] = tuple(seats)
         return players
 
     def has_end(self):
@@ -1,6 +1,8 @@
 from logging import getLogger
-from typing import Dict, List
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
 
+import config
 from errors import (
     AlreadyJoinedError,
     LobbyClosedError,
@@ -10,26 +12,38 @@ from errors import (
 )
 from game import Game
 from player import Player
+from rng import Stream
+from sweeper import TimerWheel
 
 
 class GameManager:
     """Manage all running games."""
 
-    def __init__(self):
+    def __init__(self, seed: Optional[int] = None):
+        # Seeds of the games, a fixed seed replays every game it creates
+        self.seeds = Stream(seed)
         self.chatid_games: Dict[int, List[Game]] = {}
         self.userid_players: Dict[int, List[Player]] = {}
         self.userid_current: Dict[int, Player] = {}
+        # Indexes kept in sync with the dicts above for O(1) lookups
+        self.chatid_game: Dict[int, Game] = {}
+        self.userchat_player: Dict[Tuple[int, int], Player] = {}
+        # Deadlines of the live games, see sweeper.Sweeper
+        self.wheel = TimerWheel(config.SWEEP_INTERVAL)
 
         self.logger = getLogger(__name__)
 
-    def new_game(self, chat):
+    def new_game(self, chat, seed: Optional[int] = None):
         """
-        Create a new game in this chat
+        Create a new game in this chat, seeded from ``self.seeds`` unless
+        replaying a journaled one
         """
         chat_id = chat.id
 
         self.logger.debug("Creating new game in chat " + str(chat_id))
-        game = Game(chat)
+        if seed is None:
+            seed = self.seeds.getrandbits(64)
+        game = Game(chat, seed)
 
         if chat_id not in self.chatid_games:
             self.chatid_games[chat_id] = list()
@@ -40,14 +54,19 @@ class GameManager:
                 self.chatid_games[chat_id].remove(g)
 
         self.chatid_games[chat_id].append(game)
+        self.chatid_game[chat_id] = game
+        self.wheel.schedule(game, self.deadline(game))
         return game
 
+    def active_game(self, chat_id: int) -> Optional[Game]:
+        """The latest game in this chat"""
+        return self.chatid_game.get(chat_id)
+
     def join_game(self, user, chat):
         """ Create a player from the Telegram user and add it to the game """
         self.logger.info("Joining game with id " + str(chat.id))
-        try:
-            game = self.chatid_games[chat.id][-1]
-        except (KeyError, IndexError):
+        game = self.chatid_game.get(chat.id)
+        if game is None:
             raise NoGameInChatError()
 
         if game.started:
@@ -63,9 +82,9 @@ class GameManager:
 
         # Don not re-add a player and remove the player from previous games in
         # this chat, if he is in one of them
-        for player in players:
-            if player in game.players:
-                raise AlreadyJoinedError()
+        player = self.userchat_player.get((user.id, chat.id))
+        if player is not None and player.game is game:
+            raise AlreadyJoinedError()
 
         try:
             self.leave_game(user, chat)
@@ -85,6 +104,7 @@ class GameManager:
 
         players.append(player)
         self.userid_current[user.id] = player
+        self.userchat_player[user.id, chat.id] = player
 
     def leave_game(self, user, chat):
         """ Remove a player from its current game """
@@ -93,16 +113,6 @@ class GameManager:
         players = self.userid_players.get(user.id, list())
 
         if not player:
-            games = self.chatid_games[chat.id]
-            for g in games:
-                for p in g.players:
-                    if p.user.id == user.id:
-                        if p is g.current_player:
-                            g.turn()
-
-                        p.leave()
-                        return
-
             raise NoGameInChatError
 
         game = player.game
@@ -115,6 +125,7 @@ class GameManager:
 
         player.leave()
         players.remove(player)
+        del self.userchat_player[user.id, chat.id]
 
         # If this is the selected game, switch to another
         if self.userid_current.get(user.id, None) is player:
@@ -134,11 +145,17 @@ class GameManager:
         if not player:
             raise NoGameInChatError
 
-        game = player.game
+        self.remove_game(player.game)
+
+    def remove_game(self, game: Game):
+        """Mark ``game`` as ended and drop it from every index"""
+        chat_id = game.chat.id
         game.state = game.State.END
+        self.wheel.cancel(game)
 
         # Clear game
         for player_in_game in game.players:
+            self.userchat_player.pop((player_in_game.user.id, chat_id), None)
             this_users_players = self.userid_players.get(player_in_game.user.id, list())
 
             try:
@@ -162,13 +179,63 @@ class GameManager:
                 except KeyError:
                     pass
 
-        self.chatid_games[chat.id].remove(game)
-        if not self.chatid_games[chat.id]:
-            del self.chatid_games[chat.id]
-
-    def player_for_user_in_chat(self, user, chat):
-        players = self.userid_players.get(user.id, list())
-        for player in players:
-            if player.game.chat.id == chat.id:
-                return player
-        return None
+        self.chatid_games[chat_id].remove(game)
+        if self.chatid_games[chat_id]:
+            self.chatid_game[chat_id] = self.chatid_games[chat_id][-1]
+        else:
+            del self.chatid_games[chat_id]
+            del self.chatid_game[chat_id]
+
+    def is_live(self, game: Game) -> bool:
+        return not game.ended and game in self.chatid_games.get(game.chat.id, ())
+
+    def deadline(self, game: Game) -> float:
+        """When ``game`` expires unless it changes before"""
+        ttl = config.GAME_TTL if game.started else config.LOBBY_TTL
+        return game.active + ttl
+
+    def expire_game(self, game: Game, now: Optional[float] = None) -> bool:
+        """End ``game`` if it idled past its deadline, otherwise keep watching it"""
+        if not self.is_live(game):
+            return False
+        deadline = self.deadline(game)
+        if deadline > (monotonic() if now is None else now):
+            self.wheel.schedule(game, deadline)
+            return False
+        self.logger.info(f"Game in chat {game.chat.id} expired")
+        self.remove_game(game)
+        return True
+
+    def replace_chat(self, chat_id: int, games: List[Game]):
+        """Swap in the games of a chat, used when restoring saved state"""
+        for game in self.chatid_games.pop(chat_id, ()):
+            self.wheel.cancel(game)
+            for player in game.players:
+                user_id = player.user.id
+                self.userchat_player.pop((user_id, chat_id), None)
+                players = self.userid_players.get(user_id, [])
+                if player in players:
+                    players.remove(player)
+                if not players:
+                    self.userid_players.pop(user_id, None)
+                if self.userid_current.get(user_id) is player:
+                    if players:
+                        self.userid_current[user_id] = players[0]
+                    else:
+                        del self.userid_current[user_id]
+        self.chatid_game.pop(chat_id, None)
+
+        if not games:
+            return
+        self.chatid_games[chat_id] = games
+        self.chatid_game[chat_id] = games[-1]
+        for game in games:
+            self.wheel.schedule(game, self.deadline(game))
+            for player in game.players:
+                user_id = player.user.id
+                self.userid_players.setdefault(user_id, []).append(player)
+                self.userchat_player[user_id, chat_id] = player
+                self.userid_current.setdefault(user_id, player)
+
+    def player_for_user_in_chat(self, user, chat) -> Optional[Player]:
+        return self.userchat_player.get((user.id, chat.id))
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from typing import Iterable, Iterator, Optional, Union
+
+from card import STONES, Card
+from rng import DEFAULT, Stream
+
+
+def _slot(card: Union[int, str, Card]) -> int:
+    if card.__class__ is Card:
+        return card.rank - 1
+    return Card.from_id(card).rank - 1
+
+
+class Hand:
+    """
+    A multiset of magic stones stored as 8 counts, one per stone id.
+    Iterating yields the stones in ascending order.
+    """
+
+    __slots__ = ("counts", "size")
+
+    def __init__(self, counts: Iterable[int] = ()):
+        self.counts = bytearray(counts) or bytearray(8)
+        self.size = sum(self.counts)
+
+    @classmethod
+    def from_cards(cls, cards: Iterable[Card]) -> Hand:
+        hand = cls()
+        for card in cards:
+            hand.add(card)
+        return hand
+
+    def copy(self) -> Hand:
+        return Hand(self.counts)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, card: Union[int, str, Card]) -> bool:
+        return self.counts[_slot(card)] > 0
+
+    def __iter__(self) -> Iterator[Card]:
+        for card, count in zip(STONES, self.counts):
+            for _ in range(count):
+                yield card
+
+    def __getitem__(self, index: int) -> Card:
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("Hand index out of range")
+        for card, count in zip(STONES, self.counts):
+            if index < count:
+                return card
+            index -= count
+
+    def __repr__(self) -> str:
+        return f"Hand({list(self.counts)})"
+
+    def count(self, card: Union[int, str, Card]) -> int:
+        return self.counts[_slot(card)]
+
+    def add(self, card: Union[int, str, Card]):
+        self.counts[_slot(card)] += 1
+        self.size += 1
+
+    def remove(self, card: Union[int, str, Card], rng: Optional[Stream] = None) -> int:
+        """
+        Remove one ``card`` and return the slot it was taken from. The hand
+        is hidden from its holder's rivals, so the slot is uniform and says
+        nothing about the rank or the other stones.
+        """
+        slot = _slot(card)
+        if not self.counts[slot]:
+            raise ValueError(f"{card} is not in hand")
+        index = (rng or DEFAULT).below(self.size)
+        self.counts[slot] -= 1
+        self.size -= 1
+        return index
+
+    def pop_random(self, rng: Optional[Stream] = None) -> Card:
+        """Remove and return a uniformly random stone"""
+        if not self.size:
+            raise IndexError("pop from empty hand")
+        pick = (rng or DEFAULT).below(self.size)
+        for i, count in enumerate(self.counts):
+            if pick < count:
+                self.counts[i] -= 1
+                self.size -= 1
+                return STONES[i]
+            pick -= count
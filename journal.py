@@ -0,0 +1,386 @@
+"""
+Crash-safe game state.
+
+Live games survive restarts through two kinds of files in one directory:
+
+* ``snapshot.json``, the whole :class:`GameManager` as of a journal sequence
+  number, rewritten atomically every few minutes.
+* ``journal.<seq>.log`` segments, one JSON line per operation: the op, its
+  chat, user and arguments such as the stone cast or the dice rolled.
+
+Records are buffered and fsynced in batches by a background thread, a crash
+loses at most the moves of the last ``fsync_interval``. Restoring loads the
+snapshot and replays the newer records through :class:`GameManager` and
+:mod:`engine`. Games draw from their seeded stream, so a replay deals the
+same stones, and every record carries the stream position to check it.
+Snapshots are built the same way on their own thread, from the files.
+"""
+from __future__ import annotations
+
+import json
+import os
+from glob import glob
+from logging import getLogger
+from threading import Event, Lock, Thread
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from telegram import Chat, User
+
+import engine
+from card import Card
+from errors import NotEnoughPlayersError
+from game import Game
+from game_manager import GameManager
+from hand import Hand
+from player import Player
+
+if TYPE_CHECKING:
+    from telegram import Bot
+
+SNAPSHOT = "snapshot.json"
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def encode_player(player: Player) -> Dict[str, Any]:
+    return {
+        "user": player.user.to_dict(),
+        "cards": list(player.cards.counts),
+        "secret": [card.id for card in player.secret_cards],
+        "last": player.last_played and player.last_played.id,
+        "hp": player.hp,
+        "score": player.score,
+    }
+
+
+def encode_game(game: Game) -> Dict[str, Any]:
+    # Turn order, starting with the current player
+    players = game.players
+    pending = game.pending
+    return {
+        "chat": game.chat.to_dict(),
+        "starter": game.starter and game.starter.to_dict(),
+        "state": int(game.state),
+        "open": game.open,
+        "deck": list(game.deck.cards.counts),
+        "used": list(game.used_cards.counts),
+        "secret": [card.id for card in game.secret_cards],
+        "pending": pending
+        and [players.index(pending.player), pending.card.id, pending.success],
+        "players": [encode_player(player) for player in players],
+        "rng": list(game.rng.getstate()),
+    }
+
+
+def decode_game(data: Dict[str, Any], bot: Optional[Bot] = None) -> Game:
+    game = Game(Chat.de_json(data["chat"], bot))
+    game.starter = User.de_json(data["starter"], bot)
+    game.state = Game.State(data["state"])
+    game.open = data["open"]
+    game.deck.cards = Hand(data["deck"])
+    game.used_cards = Hand(data["used"])
+    game.secret_cards = [Card.from_id(id) for id in data["secret"]]
+    # Records written before games had their own stream go on unseeded
+    if "rng" in data:
+        game.rng.setstate(tuple(data["rng"]))
+
+    players = []
+    for item in data["players"]:
+        player = Player(game, User.de_json(item["user"], bot))
+        player.cards = Hand(item["cards"])
+        player.secret_cards = [Card.from_id(id) for id in item["secret"]]
+        player.last_played = item["last"] and Card.from_id(item["last"])
+        player.hp = item["hp"]
+        player.score = item["score"]
+        players.append(player)
+
+    if data["pending"]:
+        seat, card, success = data["pending"]
+        game.pending = engine.Pending(players[seat], Card.from_id(card), success)
+    return game
+
+
+def encode_current(gm: GameManager, user_ids) -> List[List[Optional[int]]]:
+    """The chat whose game each user currently plays in"""
+    current = []
+    for user_id in user_ids:
+        player = gm.userid_current.get(user_id)
+        current.append([user_id, player and player.game.chat.id])
+    return current
+
+
+class Journal:
+    """Append-only move log, fsynced in batches"""
+
+    def __init__(self, directory: str, seq: int = 0):
+        self.directory = directory
+        self.lock = Lock()
+        self.seq = seq
+        self.dirty = False
+        self.file = self._open()
+
+    def _open(self):
+        path = os.path.join(self.directory, f"journal.{self.seq + 1}.log")
+        torn = False
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+        file = open(path, "a", encoding="utf-8")
+        if torn:
+            # Keep the next record off the line a crash cut short
+            file.write("\n")
+        return file
+
+    def append(self, record: Dict[str, Any]) -> int:
+        with self.lock:
+            self.seq += 1
+            record["seq"] = self.seq
+            self.file.write(_dumps(record) + "\n")
+            self.dirty = True
+            return self.seq
+
+    def sync(self):
+        """Flush buffered records to disk"""
+        with self.lock:
+            if not self.dirty:
+                return
+            self.file.flush()
+            self.dirty = False
+            # fsync a duplicate, so appends are not held up by the disk and
+            # the descriptor outlives a concurrent rotate
+            fd = os.dup(self.file.fileno())
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def rotate(self) -> int:
+        """Continue in a new segment, return the last sequence number so far"""
+        with self.lock:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            self.dirty = False
+            self.file = self._open()
+            return self.seq
+
+    def close(self):
+        with self.lock:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+
+
+def segments(directory: str) -> List[str]:
+    """Journal segments, oldest first"""
+    paths = glob(os.path.join(directory, "journal.*.log"))
+    return sorted(paths, key=lambda path: int(path.rsplit(".", 2)[1]))
+
+
+def read_segment(path: str):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Cut short by a crash
+                continue
+
+
+class Store:
+    def __init__(
+        self,
+        directory: str,
+        snapshot_interval: float = 300,
+        fsync_interval: float = 0.05,
+    ):
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self.fsync_interval = fsync_interval
+        self.journal: Optional[Journal] = None
+        self.stopped = Event()
+        self.threads: List[Thread] = []
+
+        self.logger = getLogger(__name__)
+
+    def load(
+        self, gm: GameManager, bot: Optional[Bot] = None, last: Optional[int] = None
+    ) -> Tuple[int, int]:
+        """
+        Load the snapshot into ``gm`` and replay the journal up to ``last``,
+        return the sequence number reached and the records replayed
+        """
+        seq = 0
+        path = os.path.join(self.directory, SNAPSHOT)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            seq = snapshot["seq"]
+            for chat_id, games in snapshot["chats"]:
+                gm.replace_chat(chat_id, [decode_game(game, bot) for game in games])
+            for user_id, chat_id in snapshot["current"]:
+                player = gm.userchat_player.get((user_id, chat_id))
+                if player is not None:
+                    gm.userid_current[user_id] = player
+
+        replayed = 0
+        for segment in segments(self.directory):
+            for record in read_segment(segment):
+                if record["seq"] <= seq:
+                    continue
+                if last is not None and record["seq"] > last:
+                    return seq, replayed
+                seq = record["seq"]
+                try:
+                    self.replay(gm, record, bot)
+                except Exception:
+                    self.logger.exception(f"Failed to replay journal record {seq}")
+                replayed += 1
+        return seq, replayed
+
+    def replay(
+        self, gm: GameManager, record: Dict[str, Any], bot: Optional[Bot] = None
+    ):
+        """Redo a journaled operation on ``gm``"""
+        op, chat_id = record["op"], record["chat"]
+        game = gm.active_game(chat_id)
+        if op == "new":
+            game = gm.new_game(Chat.de_json(record["room"], bot), record["seed"])
+            game.starter = User.de_json(record["from"], bot)
+        elif op == "join":
+            gm.join_game(User.de_json(record["from"], bot), game.chat)
+        elif op == "start":
+            game.start()
+        elif op == "expire":
+            gm.remove_game(game)
+        else:
+            player = gm.userchat_player[record["user"], chat_id]
+            if op == "leave":
+                try:
+                    gm.leave_game(player.user, game.chat)
+                except NotEnoughPlayersError:
+                    gm.end_game(game.chat, player.user)
+            elif op == "kill":
+                gm.end_game(game.chat, player.user)
+            else:
+                self._move(gm, game, player, op, record["args"])
+
+        game = gm.active_game(chat_id)
+        position = record.get("rng")
+        if game is not None and position is not None:
+            if game.rng.position != position:
+                self.logger.warning(
+                    f"Replay of record {record['seq']} left the stream of chat "
+                    f"{chat_id} at {game.rng.position} instead of {position}"
+                )
+                game.rng.setstate((game.rng.getstate()[0], position))
+
+    def _move(
+        self, gm: GameManager, game: Game, player: Player, op: str, args: Dict[str, Any]
+    ):
+        if op == "cast":
+            events = engine.cast(game, player, Card.from_id(args["card"]))
+        elif op == "pass":
+            events = engine.pass_turn(game, player)
+        else:
+            events = []
+        dice = args.get("dice")
+        if game.pending is not None and dice is not None:
+            if args.get("local"):
+                # The dice came from the stream, draw it again to stay in step
+                game.rng.randint(1, 6)
+            events.extend(engine.roll(game, dice))
+        if any(isinstance(event, engine.GameWon) for event in events):
+            gm.end_game(game.chat, player.user)
+
+    def restore(self, gm: GameManager, bot: Optional[Bot] = None) -> int:
+        """Load the snapshot and replay the journal into ``gm``"""
+        began = perf_counter()
+        os.makedirs(self.directory, exist_ok=True)
+        seq, replayed = self.load(gm, bot)
+        self.journal = Journal(self.directory, seq)
+        self.logger.info(
+            f"Restored {sum(map(len, gm.chatid_games.values()))} games with "
+            f"{replayed} journal records in {perf_counter() - began:.3f}s"
+        )
+        return seq
+
+    def record(
+        self,
+        gm: GameManager,
+        op: str,
+        chat_id: int,
+        user: Optional[User] = None,
+        **args,
+    ):
+        """Journal an operation on the games of a chat, made just now"""
+        record = {"op": op, "chat": chat_id, "user": user and user.id, "args": args}
+        game = gm.active_game(chat_id)
+        if op in ("new", "join"):
+            record["from"] = user.to_dict()
+        if op == "new":
+            record["room"] = game.chat.to_dict()
+            record["seed"] = game.rng.getstate()[0]
+        elif game is not None:
+            # Checked by the replay, which also draws from the stream
+            record["rng"] = game.rng.position
+        self.journal.append(record)
+
+    def snapshot(self):
+        """Write the whole state and drop the journal segments it covers"""
+        seq = self.journal.rotate()
+        # Rebuilt from the files on this thread, the live games are not read
+        gm = GameManager()
+        self.load(gm, last=seq)
+        chats = [
+            [chat_id, [encode_game(game) for game in games]]
+            for chat_id, games in gm.chatid_games.items()
+        ]
+        current = encode_current(gm, list(gm.userid_current))
+        data = _dumps({"seq": seq, "chats": chats, "current": current})
+
+        path = os.path.join(self.directory, SNAPSHOT)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+        for segment in segments(self.directory)[:-1]:
+            os.remove(segment)
+        self.logger.debug(f"Snapshot at {seq} written, {len(data)} bytes")
+
+    def _sync(self):
+        while not self.stopped.wait(self.fsync_interval):
+            try:
+                self.journal.sync()
+            except Exception:
+                self.logger.exception("Failed to sync the journal")
+
+    def _snapshot(self):
+        while not self.stopped.wait(self.snapshot_interval):
+            try:
+                self.snapshot()
+            except Exception:
+                self.logger.exception("Failed to write a snapshot")
+
+    def start(self):
+        """Sync the journal and write snapshots in the background"""
+        self.threads = [
+            Thread(target=self._sync, name="journal", daemon=True),
+            Thread(target=self._snapshot, name="snapshot", daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def close(self):
+        """Stop the background threads and leave a fresh snapshot behind"""
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join()
+        self.snapshot()
+        self.journal.close()
@@ -0,0 +1,359 @@
+"""
+Load test against a fake Bot API.
+
+A local HTTP server stands in for Telegram, serving getUpdates, sendMessage,
+sendDice, answerInlineQuery and friends, while the real :class:`bot.Room`
+handlers run on the threaded or asyncio runtime and talk to it through a
+real :class:`telegram.Bot`. Simulated chats of three players each open a
+game, join, start and then play through inline queries and chosen results,
+starting over whenever a game ends.
+
+    python loadtest.py --chats 200 --seconds 30 --runtime threaded --workers 32
+
+Latencies are measured from the moment an update is available to getUpdates
+until the bot answers it: the inline query answer, or the first message a
+chosen result causes in its chat. The fake server and the players share the
+process with the bot, so absolute numbers are on the pessimistic side.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count, islice
+from threading import Condition, Lock, Thread
+from time import monotonic, sleep, time
+from typing import Any, Deque, Dict, List, Optional
+
+from telegram import Bot
+from telegram.ext import Updater
+from telegram.utils.request import Request
+
+from aio import AsyncRuntime
+from api import Api, ExecutorApi
+from bot import Room
+from game_manager import GameManager
+from scheduler import ChatScheduler
+
+TOKEN = "123456:loadtest"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Bot", "username": "loadbot"}
+PLAYERS = 3
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in two writes, keep them off Nagle's delay
+    disable_nagle_algorithm = True
+    server: FakeTelegram
+
+    def do_POST(self):
+        method = self.path.rsplit("/", 1)[-1]
+        length = int(self.headers.get("Content-Length", 0))
+        data = json.loads(self.rfile.read(length) or b"{}")
+        result = self.server.call(method, data)
+        body = json.dumps({"ok": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeTelegram(ThreadingHTTPServer):
+    """The Bot API methods the bot uses, with updates fed by :meth:`push`"""
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0):
+        super().__init__(("127.0.0.1", port), FakeTelegramHandler)
+        self.cond = Condition()
+        self.updates: Deque[Dict[str, Any]] = deque()
+        self.update_ids = count(1)
+        self.message_ids = count(1)
+        self.delivered = 0
+        self.calls = 0
+        self.driver: Optional[Driver] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/bot"
+
+    def start(self) -> Thread:
+        thread = Thread(target=self.serve_forever, name="fake-telegram", daemon=True)
+        thread.start()
+        return thread
+
+    def push(self, update: Dict[str, Any]):
+        with self.cond:
+            update["update_id"] = next(self.update_ids)
+            self.updates.append(update)
+            self.cond.notify_all()
+
+    def get_updates(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(data.get("offset", 0))
+        with self.cond:
+            while self.updates and self.updates[0]["update_id"] < offset:
+                self.updates.popleft()
+            if not self.updates:
+                self.cond.wait(float(data.get("timeout", 0)))
+            updates = list(islice(self.updates, int(data.get("limit", 100))))
+            if updates:
+                self.delivered = max(self.delivered, updates[-1]["update_id"])
+        return updates
+
+    def message(self, data: Dict[str, Any], **fields) -> Dict[str, Any]:
+        return dict(
+            message_id=next(self.message_ids),
+            date=int(time()),
+            chat={"id": data["chat_id"], "type": "group"},
+            **fields,
+        )
+
+    def call(self, method: str, data: Dict[str, Any]) -> Any:
+        # python-telegram-bot sends numbers as strings
+        if "chat_id" in data:
+            data["chat_id"] = int(data["chat_id"])
+        if method == "getUpdates":
+            return self.get_updates(data)
+        with self.cond:
+            self.calls += 1
+        if method == "getMe":
+            return BOT_USER
+        if method == "sendMessage":
+            result = self.message(data, text=data.get("text", ""))
+        elif method == "sendDice":
+            dice = {"emoji": "🎲", "value": random.randint(1, 6)}
+            result = self.message(data, dice=dice)
+        else:
+            result = True
+        if self.driver is not None:
+            self.driver.observe(method, data)
+        return result
+
+
+class Session:
+    """One simulated group chat"""
+
+    def __init__(self, index: int):
+        self.chat_id = -1000 - index
+        self.users = [index * 10 + i + 1 for i in range(PLAYERS)]
+        self.round = 0
+        self.answers: List[List[str]] = []
+        self.moved = False
+        self.starting = False
+        self.move_at: Optional[float] = None
+
+
+class Driver:
+    """Plays every session, reacting to what the bot sends"""
+
+    def __init__(self, server: FakeTelegram, chats: int, pass_prob: float = 0.3):
+        self.server = server
+        self.sessions = [Session(i) for i in range(chats)]
+        self.by_chat = {session.chat_id: session for session in self.sessions}
+        self.pass_prob = pass_prob
+        self.lock = Lock()
+        self.running = False
+        self.query_ids = count(1)
+        self.queries: Dict[str, Any] = {}
+        self.inline_latency: List[float] = []
+        self.move_latency: List[float] = []
+        self.moves = 0
+        self.games = 0
+
+    def start(self):
+        self.running = True
+        with self.lock:
+            for session in self.sessions:
+                self.lobby(session)
+
+    def stop(self):
+        self.running = False
+
+    def user(self, user_id: int) -> Dict[str, Any]:
+        return {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+
+    def command(self, session: Session, user_id: int, text: str):
+        message = {
+            "message_id": next(self.server.message_ids),
+            "date": int(time()),
+            "chat": {"id": session.chat_id, "type": "group"},
+            "from": self.user(user_id),
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}],
+        }
+        self.server.push({"message": message})
+
+    def lobby(self, session: Session):
+        # Updates of one chat are handled in order, no need to wait in between
+        self.command(session, session.users[0], "/new")
+        for user_id in session.users[1:]:
+            self.command(session, user_id, "/join")
+        self.command(session, session.users[0], "/start")
+        # Inline queries carry no chat and are only ordered after the joins
+        # once the players are known, so wait for the game to start
+        session.starting = True
+
+    def query(self, session: Session):
+        """Ask every player of ``session`` for their inline results"""
+        session.round += 1
+        session.answers = []
+        session.moved = False
+        for user_id in session.users:
+            query_id = str(next(self.query_ids))
+            self.queries[query_id] = (session, session.round, user_id, monotonic())
+            self.server.push(
+                {
+                    "inline_query": {
+                        "id": query_id,
+                        "from": self.user(user_id),
+                        "query": "",
+                        "offset": "",
+                    }
+                }
+            )
+
+    def answer(self, query_id: str, results: List[Dict[str, Any]]):
+        session, round, user_id, pushed = self.queries.pop(query_id)
+        self.inline_latency.append(monotonic() - pushed)
+        if round != session.round or session.moved or not self.running:
+            return
+        ids = [result["id"] for result in results]
+        session.answers.append(ids)
+        playable = [id for id in ids if id.isdigit()]
+        if "pass" in ids and random.random() < self.pass_prob:
+            playable = ["pass"]
+        if playable:
+            session.moved = True
+            session.move_at = monotonic()
+            self.moves += 1
+            self.server.push(
+                {
+                    "chosen_inline_result": {
+                        "result_id": random.choice(playable),
+                        "from": self.user(user_id),
+                        "query": "",
+                    }
+                }
+            )
+            self.query(session)
+        elif len(session.answers) == len(session.users):
+            # Nobody may move, the game is over
+            self.games += 1
+            self.lobby(session)
+
+    def observe(self, method: str, data: Dict[str, Any]):
+        with self.lock:
+            if method == "answerInlineQuery":
+                # Sent as a JSON string inside the JSON body
+                self.answer(data["inline_query_id"], json.loads(data["results"]))
+            elif method in ("sendMessage", "sendDice"):
+                session = self.by_chat.get(data["chat_id"])
+                if session is None:
+                    return
+                if session.move_at is not None:
+                    self.move_latency.append(monotonic() - session.move_at)
+                    session.move_at = None
+                if session.starting and "reply_markup" in data and self.running:
+                    session.starting = False
+                    self.query(session)
+
+
+def run(
+    chats: int,
+    seconds: float,
+    runtime: str,
+    workers: int,
+    api_workers: int,
+    seed: Optional[int] = None,
+):
+    # The games replay from the seed, the timing of the clients does not
+    random.seed(seed)
+    server = FakeTelegram()
+    server.start()
+    driver = server.driver = Driver(server, chats)
+
+    pool = workers + api_workers + 4
+    bot = Bot(TOKEN, base_url=server.base_url, request=Request(con_pool_size=pool))
+    gm = GameManager(seed)
+    if runtime == "asyncio":
+        room = Room(bot, gm, ExecutorApi(bot, api_workers))
+        loop_runtime = AsyncRuntime(
+            room.api, room.make_handlers(), room.chat_key, poll_timeout=1
+        )
+        thread = Thread(target=asyncio.run, args=(loop_runtime.poll(),), daemon=True)
+        thread.start()
+        stop = loop_runtime.stop
+    else:
+        room = Room(bot, gm, Api(bot))
+        updater = Updater(bot=bot, workers=1)
+        scheduler = ChatScheduler(workers)
+        room.register(updater.dispatcher, scheduler)
+        updater.start_polling(poll_interval=0, timeout=1)
+
+        def stop():
+            updater.stop()
+            scheduler.shutdown()
+
+    began = monotonic()
+    driver.start()
+    sleep(seconds)
+    driver.stop()
+    elapsed = monotonic() - began
+    delivered, calls = server.delivered, server.calls
+    stop()
+    server.shutdown()
+
+    print(f"{chats} chats, {runtime} runtime, {workers} workers, {elapsed:.1f}s")
+    print(f"updates    {delivered:8d} {delivered / elapsed:10.1f}/s")
+    print(f"api calls  {calls:8d} {calls / elapsed:10.1f}/s")
+    print(f"moves      {driver.moves:8d} {driver.moves / elapsed:10.1f}/s")
+    print(f"games      {driver.games:8d}")
+    for name, values in (
+        ("inline", driver.inline_latency),
+        ("move", driver.move_latency),
+    ):
+        print(
+            f"{name:6} latency p50 {percentile(values, 0.5) * 1000:8.1f}ms"
+            f" p99 {percentile(values, 0.99) * 1000:8.1f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument(
+        "--runtime", choices=("threaded", "asyncio"), default="threaded"
+    )
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--api-workers", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    run(
+        args.chats,
+        args.seconds,
+        args.runtime,
+        args.workers,
+        args.api_workers,
+        args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
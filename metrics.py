@@ -0,0 +1,285 @@
+"""
+Prometheus-style metrics.
+
+Counters and histograms are updated in place on the hot path, gauges are
+computed when scraped. :class:`MetricsServer` exposes everything in the text
+exposition format, e.g. ``curl http://127.0.0.1:9100/metrics``.
+"""
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging import getLogger
+from threading import Lock, Thread
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from errors import GameError
+
+logger = getLogger(__name__)
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Metric(ABC):
+    kind = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        registry: Optional[Registry] = REGISTRY,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self.lock = Lock()
+        self.children: Dict[Tuple[str, ...], Any] = {}
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values: str):
+        """The child for ``values``, worth keeping around on hot paths"""
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(values, self.child())
+        return child
+
+    @abstractmethod
+    def child(self) -> Any:
+        """A new child holding the value of one set of labels"""
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Lines of the exposition format"""
+
+
+class _CounterChild:
+    __slots__ = ("lock", "value")
+
+    def __init__(self):
+        self.lock = Lock()
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        with self.lock:
+            self.value += amount
+
+
+class Counter(Metric):
+    kind = "counter"
+    child = _CounterChild
+
+    def inc(self, *values: str, amount: float = 1):
+        self.labels(*values).inc(amount)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, values)} {_number(child.value)}"
+            for values, child in list(self.children.items())
+        ]
+
+
+class _HistogramChild:
+    __slots__ = ("lock", "bounds", "counts", "sum")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.lock = Lock()
+        self.bounds = bounds
+        # The last count is the +Inf bucket
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        i = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = BUCKETS, **kwargs):
+        self.bounds = tuple(buckets)
+        super().__init__(*args, **kwargs)
+
+    def child(self) -> _HistogramChild:
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float, *values: str):
+        self.labels(*values).observe(value)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for values, child in list(self.children.items()):
+            with child.lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), counts):
+                cumulative += count
+                bucket = _labels(self.labelnames, values, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+            labels = _labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class _GaugeChild:
+    __slots__ = ("function",)
+
+    def __init__(self):
+        self.function: Callable[[], float] = lambda: 0
+
+    def set_function(self, function: Callable[[], float]):
+        self.function = function
+
+
+class Gauge(Metric):
+    """A value computed when scraped"""
+
+    kind = "gauge"
+    child = _GaugeChild
+
+    def set_function(self, function: Callable[[], float], *values: str):
+        self.labels(*values).set_function(function)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for values, child in list(self.children.items()):
+            try:
+                value = child.function()
+            except Exception:
+                logger.exception(f"Failed to compute {self.name}")
+                continue
+            labels = _labels(self.labelnames, values)
+            lines.append(f"{self.name}{labels} {_number(value)}")
+        return lines
+
+
+HANDLER_LATENCY = Histogram(
+    "abracada_handler_seconds", "Time spent handling an update", ["handler"]
+)
+HANDLER_ERRORS = Counter(
+    "abracada_handler_errors_total",
+    "Exceptions escaping a handler",
+    ["handler", "error"],
+)
+GAME_ERRORS = Counter(
+    "abracada_game_errors_total", "Game errors escaping a handler, by type", ["error"]
+)
+API_LATENCY = Histogram(
+    "abracada_api_seconds", "Duration of Bot API requests", ["method"]
+)
+API_THROTTLED = Counter(
+    "abracada_api_throttled_total", "Bot API requests answered with 429", ["method"]
+)
+API_ERRORS = Counter(
+    "abracada_api_errors_total", "Failed Bot API requests", ["method", "error"]
+)
+GAMES = Gauge("abracada_games", "Live games")
+PLAYERS = Gauge("abracada_players", "Players in live games")
+QUEUED_UPDATES = Gauge("abracada_queued_updates", "Updates waiting for a handler")
+OUTBOX_DEPTH = Gauge("abracada_outbox_depth", "Messages waiting in the outbox")
+
+
+def instrument(callback: Callable) -> Callable:
+    """Time a coroutine handler and count the exceptions it raises"""
+    name = callback.__name__
+    latency = HANDLER_LATENCY.labels(name)
+
+    @wraps(callback)
+    async def wrapper(update, context):
+        began = perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception as e:
+            HANDLER_ERRORS.inc(name, type(e).__name__)
+            # Only here, games raise and catch some of them in normal play
+            if isinstance(e, GameError):
+                GAME_ERRORS.inc(type(e).__name__)
+            raise
+        finally:
+            latency.observe(perf_counter() - began)
+
+    return wrapper
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    server: MetricsServer
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        listen: str = "127.0.0.1",
+        port: int = 9100,
+        registry: Registry = REGISTRY,
+    ):
+        super().__init__((listen, port), MetricsHandler)
+        self.registry = registry
+
+    def start(self) -> Thread:
+        """Serve on a daemon thread"""
+        thread = Thread(target=self.serve_forever, name="metrics", daemon=True)
+        thread.start()
+        return thread
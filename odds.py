@@ -0,0 +1,66 @@
+"""
+Odds of the stones in a player's own hand.
+
+A player sees every hand but their own. The ``pool`` stones they have not
+seen, ``copies`` of them of some rank, are dealt at random between their hand
+of ``drawn`` stones, the deck, the secret stones and the owls of the others.
+So the hand is a uniform subset of the pool and the copies it holds follow a
+hypergeometric law, with none of them held with probability
+``C(pool - copies, drawn) / C(pool, drawn)``.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+from math import comb
+from typing import TYPE_CHECKING, List, Tuple
+
+from card import TOTAL
+
+if TYPE_CHECKING:
+    from player import Player
+
+
+@lru_cache(maxsize=4096)
+def absent(pool: int, copies: int, drawn: int) -> float:
+    """Chance that ``drawn`` stones out of ``pool`` miss all ``copies``"""
+    if drawn > pool - copies:
+        return 0.0
+    return comb(pool - copies, drawn) / comb(pool, drawn)
+
+
+def unseen(player: Player, owls: bool = True) -> List[int]:
+    """
+    Copies of every rank ``player`` has not seen. With ``owls`` false their
+    own owls count as unseen, so the odds can be shown to everyone.
+    """
+    counts = [t - u for t, u in zip(TOTAL, player.game.used_cards.counts)]
+    for other in player.game.players:
+        if other is not player:
+            counts = [n - h for n, h in zip(counts, other.cards.counts)]
+    if owls:
+        for card in player.secret_cards:
+            counts[card.rank - 1] -= 1
+    return counts
+
+
+@dataclass(frozen=True)
+class Odds:
+    # Chance to hold at least one, and average copies held, of every stone
+    hold: Tuple[float, ...]
+    mean: Tuple[float, ...]
+
+
+def odds(player: Player, owls: bool = True) -> Odds:
+    """The odds of the hand of ``player``, kept until the game changes"""
+    key = (player.game.version, owls)
+    cached = player.odds_cache
+    if cached is None or cached[0] != key:
+        counts = unseen(player, owls)
+        pool, drawn = sum(counts), len(player.cards)
+        result = Odds(
+            hold=tuple(1.0 - absent(pool, copies, drawn) for copies in counts),
+            mean=tuple(copies * drawn / pool if pool else 0.0 for copies in counts),
+        )
+        player.odds_cache = cached = (key, result)
+    return cached[1]
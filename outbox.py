@@ -0,0 +1,295 @@
+"""
+Outbound message queue with flood control.
+
+Messages are queued per chat and sent by one task per busy chat, within a
+global and a per-chat rate budget. Consecutive plain texts to the same chat
+are coalesced into one message, queued edits of a message collapse into the
+latest one and 429 responses are retried after the ``retry_after`` Telegram
+asks for.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from logging import getLogger
+from threading import Thread
+from time import monotonic
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional, Union
+
+from telegram.error import RetryAfter
+
+from api import Api, timed_call
+
+if TYPE_CHECKING:
+    from telegram import Bot, Message, ReplyMarkup
+
+MAX_TEXT = 4096
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = monotonic()
+
+    def refill(self):
+        now = monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def take(self) -> float:
+        """Take a token, or return how long to wait for one"""
+        self.refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    @property
+    def full(self) -> bool:
+        self.refill()
+        return self.tokens >= self.burst
+
+
+@dataclass
+class Outgoing:
+    method: str
+    chat_id: int
+    kwargs: Dict[str, Any]
+    # Empty for fire-and-forget posts
+    futures: List[asyncio.Future] = field(default_factory=list)
+
+    def mergeable(self, other: Outgoing) -> bool:
+        if self.method == other.method == "edit_message_text":
+            return self.kwargs["message_id"] == other.kwargs["message_id"]
+        return (
+            self.method == other.method == "send_message"
+            and self.kwargs.get("reply_markup") is None
+            and self.kwargs.get("reply_to_message_id")
+            == other.kwargs.get("reply_to_message_id")
+            and len(self.kwargs["text"]) + len(other.kwargs["text"]) + 2 <= MAX_TEXT
+        )
+
+    def merge(self, other: Outgoing):
+        if self.method == "edit_message_text":
+            # Only the latest text of a message matters
+            self.kwargs = other.kwargs
+            self.futures.extend(other.futures)
+            return
+        self.kwargs = dict(
+            other.kwargs, text=self.kwargs["text"] + "\n\n" + other.kwargs["text"]
+        )
+        self.futures.extend(other.futures)
+
+
+class Outbox:
+    def __init__(
+        self,
+        bot: Bot,
+        workers: int = 8,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        chat_burst: float = 4,
+        retries: int = 5,
+    ):
+        self.bot = bot
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="outbox")
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.retries = retries
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.queues: Dict[int, Deque[Outgoing]] = {}
+        self.buckets: Dict[int, TokenBucket] = {}
+        self.sent = 0
+        self.coalesced = 0
+        self.throttled = 0
+
+        self.logger = getLogger(__name__)
+
+    def start(self):
+        """Run the outbox on its own event loop thread"""
+        self.loop = asyncio.new_event_loop()
+        Thread(target=self.loop.run_forever, name="outbox", daemon=True).start()
+
+    def bind(self):
+        """Run the outbox on the running event loop, done on first use"""
+        self.loop = asyncio.get_running_loop()
+
+    def depth(self, chat_id: Optional[int] = None) -> int:
+        """Number of queued messages, overall or for one chat"""
+        if chat_id is not None:
+            return len(self.queues.get(chat_id, ()))
+        return sum(len(queue) for queue in list(self.queues.values()))
+
+    async def request(self, method: str, chat_id: int, **kwargs) -> Any:
+        """Queue a call and wait for its result"""
+        if self.loop is None:
+            self.bind()
+        if asyncio.get_running_loop() is self.loop:
+            future = self.loop.create_future()
+            self._enqueue(Outgoing(method, chat_id, kwargs, [future]))
+            return await future
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(
+                self.request(method, chat_id, **kwargs), self.loop
+            )
+        )
+
+    def post(self, method: str, chat_id: int, **kwargs):
+        """Queue a call without waiting for it"""
+        item = Outgoing(method, chat_id, kwargs)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if self.loop is None:
+            self.bind()
+        if running is self.loop:
+            self._enqueue(item)
+        else:
+            self.loop.call_soon_threadsafe(self._enqueue, item)
+
+    def _enqueue(self, item: Outgoing):
+        queue = self.queues.get(item.chat_id)
+        if queue is not None:
+            queue.append(item)
+            return
+        self.queues[item.chat_id] = deque((item,))
+        self.loop.create_task(self._drain(item.chat_id))
+
+    def _take(self, queue: Deque[Outgoing]) -> Outgoing:
+        item = queue.popleft()
+        while queue and item.mergeable(queue[0]):
+            item.merge(queue.popleft())
+            self.coalesced += 1
+        return item
+
+    async def _drain(self, chat_id: int):
+        queue = self.queues[chat_id]
+        bucket = self.buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.buckets[chat_id] = TokenBucket(
+                self.chat_rate, self.chat_burst
+            )
+        while queue:
+            for limit in (bucket, self.global_bucket):
+                delay = limit.take()
+                while delay:
+                    # Let more messages pile up for coalescing meanwhile
+                    await asyncio.sleep(delay)
+                    delay = limit.take()
+            await self._deliver(self._take(queue))
+        del self.queues[chat_id]
+        self.loop.call_later(self.chat_burst / self.chat_rate, self._forget, chat_id)
+
+    def _forget(self, chat_id: int):
+        bucket = self.buckets.get(chat_id)
+        if chat_id not in self.queues and bucket is not None and bucket.full:
+            del self.buckets[chat_id]
+
+    async def _deliver(self, item: Outgoing):
+        call = partial(
+            timed_call,
+            item.method,
+            partial(
+                getattr(self.bot, item.method), chat_id=item.chat_id, **item.kwargs
+            ),
+        )
+        for attempt in range(self.retries + 1):
+            try:
+                result = await self.loop.run_in_executor(self.executor, call)
+            except RetryAfter as e:
+                self.throttled += 1
+                if attempt == self.retries:
+                    self._fail(item, e)
+                    return
+                self.logger.warning(
+                    f"Chat {item.chat_id} throttled for {e.retry_after}s"
+                )
+                await asyncio.sleep(e.retry_after)
+            except Exception as e:
+                self._fail(item, e)
+                return
+            else:
+                self.sent += 1
+                for future in item.futures:
+                    if not future.done():
+                        future.set_result(result)
+                return
+
+    def _fail(self, item: Outgoing, error: Exception):
+        if not item.futures:
+            self.logger.error(f"{item.method} to chat {item.chat_id} failed: {error}")
+        for future in item.futures:
+            if not future.done():
+                future.set_exception(error)
+
+
+class OutboxApi(Api):
+    """Send chat messages through an :class:`Outbox`, other calls via ``api``"""
+
+    def __init__(self, outbox: Outbox, api: Api):
+        super().__init__(api.bot)
+        self.outbox = outbox
+        self.api = api
+
+    async def call(self, method: str, *args, **kwargs) -> Any:
+        return await self.api.call(method, *args, **kwargs)
+
+    async def send_message(
+        self,
+        chat_id: int,
+        text: str,
+        reply_to_message_id: Optional[int] = None,
+        reply_markup: Optional[ReplyMarkup] = None,
+    ) -> Message:
+        return await self.outbox.request(
+            "send_message",
+            chat_id,
+            text=text,
+            reply_to_message_id=reply_to_message_id,
+            reply_markup=reply_markup,
+        )
+
+    async def post_message(
+        self,
+        chat_id: int,
+        text: str,
+        reply_to_message_id: Optional[int] = None,
+        reply_markup: Optional[ReplyMarkup] = None,
+    ):
+        self.outbox.post(
+            "send_message",
+            chat_id,
+            text=text,
+            reply_to_message_id=reply_to_message_id,
+            reply_markup=reply_markup,
+        )
+
+    async def send_dice(
+        self, chat_id: int, reply_to_message_id: Optional[int] = None
+    ) -> Message:
+        return await self.outbox.request(
+            "send_dice", chat_id, reply_to_message_id=reply_to_message_id
+        )
+
+    async def edit_message_text(
+        self,
+        chat_id: int,
+        message_id: int,
+        text: str,
+        reply_markup: Optional[ReplyMarkup] = None,
+    ) -> Union[Message, bool]:
+        return await self.outbox.request(
+            "edit_message_text",
+            chat_id,
+            message_id=message_id,
+            text=text,
+            reply_markup=reply_markup,
+        )
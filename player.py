@@ -1,13 +1,16 @@
 from __future__ import annotations
 
 from logging import getLogger
-from random import choice
-from typing import List, TYPE_CHECKING, Optional
+from typing import List, TYPE_CHECKING, Optional, Tuple
 
 from card import Card
+from hand import Hand
 
 if TYPE_CHECKING:
+    from telegram import InlineQueryResult
+
     from game import Game
+    from odds import Odds
 
 
 class Player:
@@ -25,11 +28,13 @@ class Player:
         self.game: Game = game
         self.user = user
 
-        self.cards: List[Card] = []
+        self.cards = Hand()
         self.secret_cards: List[Card] = []
         self.last_played: Optional[Card] = None
         self.hp: int = 6
         self.score: int = 0
+        self.result_cache: Optional[Tuple[int, List[InlineQueryResult]]] = None
+        self.odds_cache: Optional[Tuple[Tuple[int, bool], Odds]] = None
 
         self.logger = getLogger(__name__)
 
@@ -43,6 +48,8 @@ class Player:
             self.next = self
             self.prev = self
             game.current_player = self
+        game.reseat()
+        game.bump()
 
     @property
     def left(self) -> Player:
@@ -59,10 +66,12 @@ class Player:
 
         self.next.prev = self.prev
         self.prev.next = self.next
+        self.game.reseat()
+        self.game.bump()
         self.next = None
         self.prev = None
 
-        self.cards = []
+        self.cards = Hand()
         self.discard_amount = 0
 
     def __repr__(self):
@@ -72,17 +81,18 @@ class Player:
         return str(self.user)
 
     def draw(self):
+        if len(self.cards) < 5:
+            self.game.bump()
         while len(self.cards) < 5:
-            self.cards.append(self.game.deck.draw())
+            self.cards.add(self.game.deck.draw())
 
     def has(self, card: Card):
         return card in self.cards
 
     def play(self, card: Card) -> int:
         """Plays a card and removes it from hand"""
-        indices = [i for i, c in enumerate(self.cards) if c == card]
-        index = choice(indices)
-        self.cards.pop(index)
-        self.game.used_cards[card.id] += 1
+        index = self.cards.remove(card, self.game.rng)
+        self.game.used_cards.add(card)
         self.last_played = card
+        self.game.bump()
         return index
@@ -1,13 +1,12 @@
 from __future__ import annotations
 
 from typing import TYPE_CHECKING, List
-from uuid import uuid4
 
 from telegram import InlineQueryResultArticle
 from telegram import InlineQueryResultCachedSticker as Sticker
 from telegram import InputTextMessageContent
 
-from card import Card, PASS
+from card import PASS, STONES
 from constants import INVALID_INPUT_TEXT
 from utils import display_name
 
@@ -19,28 +18,55 @@ if TYPE_CHECKING:
 INPUT_INVALID = InputTextMessageContent(INVALID_INPUT_TEXT)
 
 
+def info_id(*parts) -> str:
+    """Stable id for results that only show information"""
+    return ":".join(str(part) for part in parts)
+
+
+def is_info_id(result_id: str) -> bool:
+    return ":" in result_id
+
+
+def card_results(player: Player) -> List[InlineQueryResult]:
+    """Results of :func:`add_cards`, rebuilt only when the game changed"""
+    version = player.game.version
+    cached = player.result_cache
+    if cached is None or cached[0] != version:
+        results: List[InlineQueryResult] = []
+        add_cards(results, player)
+        player.result_cache = cached = (version, results)
+    return cached[1]
+
+
 def add_cards(results: List[InlineQueryResult], player: Player):
     if player.game.current_player == player:
         results.append(
             InlineQueryResultArticle(
-                uuid4(), title="請選擇你要施展的魔法！", input_message_content=INPUT_INVALID,
+                info_id("title", "turn"),
+                title="請選擇你要施展的魔法！",
+                input_message_content=INPUT_INVALID,
             )
         )
-        start = int(player.last_played.id) if player.last_played else 1
-        for i in range(start, 9):
-            card = Card.from_id(str(i))
+        start = player.last_played.rank if player.last_played else 1
+        for card in STONES[start - 1 :]:
             results.append(Sticker(card.id, sticker_file_id=card.sticker_id))
         if player.last_played:
-            results.append(Sticker("pass", PASS["sticker_id"]))
+            results.append(Sticker(PASS.id, PASS.sticker_id))
     if player.secret_cards:
         results.append(
             InlineQueryResultArticle(
-                uuid4(), title="你的祕密魔法石", input_message_content=INPUT_INVALID,
+                info_id("title", "secret"),
+                title="你的祕密魔法石",
+                input_message_content=INPUT_INVALID,
             )
         )
-        for c in player.secret_cards:
+        for i, c in enumerate(player.secret_cards):
             results.append(
-                Sticker(uuid4(), c.sticker_id, input_message_content=INPUT_INVALID)
+                Sticker(
+                    info_id("secret", i),
+                    c.sticker_id,
+                    input_message_content=INPUT_INVALID,
+                )
             )
     game = player.game
     for p in game.players:
@@ -48,14 +74,18 @@ def add_cards(results: List[InlineQueryResult], player: Player):
             continue
         results.append(
             InlineQueryResultArticle(
-                uuid4(),
+                info_id("title", p.user.id),
                 title=display_name(p.user) + " 的魔法石",
                 input_message_content=INPUT_INVALID,
             ),
         )
-        for c in p.cards:
+        for i, c in enumerate(p.cards):
             results.append(
-                Sticker(uuid4(), c.sticker_id, input_message_content=INPUT_INVALID)
+                Sticker(
+                    info_id("hand", p.user.id, i),
+                    c.sticker_id,
+                    input_message_content=INPUT_INVALID,
+                )
             )
 
 
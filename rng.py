@@ -0,0 +1,80 @@
+"""
+Seedable random streams.
+
+A :class:`Stream` is the Mersenne Twister of :mod:`random`, seeded with one
+integer and counting the 64-bit draws it hands out. Its whole state is then
+two integers: a game records it with every move, and a restore reseeds and
+skips ``position`` draws in a single C call to continue bit for bit.
+:meth:`Stream.spawn` derives independent seeds with splitmix64.
+"""
+from __future__ import annotations
+
+import os
+import random
+from typing import Optional, Tuple
+
+MASK = (1 << 64) - 1
+GAMMA = 0x9E3779B97F4A7C15
+# Draws skipped per call when restoring, 8 MiB of bits
+SKIP = 1 << 20
+
+
+def mix(z: int) -> int:
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK
+    return z ^ (z >> 31)
+
+
+class Stream(random.Random):
+    """:class:`random.Random` with a tiny, serializable state"""
+
+    def __init__(self, seed: Optional[int] = None):
+        # Every draw goes through the C generator 64 bits at a time
+        self._bits = super().getrandbits
+        super().__init__(seed)
+
+    def seed(self, a: Optional[int] = None, version: int = 2):
+        if a is None:
+            a = int.from_bytes(os.urandom(8), "big")
+        self._seed = a & MASK
+        self.position = 0
+        super().seed(self._seed)
+
+    def getstate(self) -> Tuple[int, int]:
+        return self._seed, self.position
+
+    def setstate(self, state: Tuple[int, int]):
+        seed, position = state
+        self.seed(seed)
+        self.position = position
+        while position:
+            skip = min(position, SKIP)
+            self._bits(64 * skip)
+            position -= skip
+
+    def below(self, n: int) -> int:
+        """A uniform integer in ``[0, n)``, without randrange's checks"""
+        # Multiply-shift instead of rejection, one draw each: the bias is
+        # below n / 2**64
+        self.position += 1
+        return (self._bits(64) * n) >> 64
+
+    # randrange, randint, choice and shuffle end here
+    _randbelow = below
+
+    def getrandbits(self, k: int) -> int:
+        draws = (k + 63) >> 6
+        self.position += draws
+        return self._bits(64 * draws) >> (64 * draws - k) if k else 0
+
+    def random(self) -> float:
+        self.position += 1
+        return (self._bits(64) >> 11) * (1.0 / (1 << 53))
+
+    def spawn(self, index: int) -> Stream:
+        """The ``index``-th child stream, independent of this one"""
+        return Stream(mix(mix(self._seed ^ GAMMA) + index * GAMMA & MASK))
+
+
+# For hands and decks that are not part of a game
+DEFAULT = Stream()
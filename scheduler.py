@@ -0,0 +1,112 @@
+"""
+Per-chat serialized execution.
+
+Every chat behaves like an actor: its jobs run one after another in arrival
+order, while jobs of different chats run in parallel. This keeps two updates
+of the same game from interleaving without a global lock.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+from logging import getLogger
+from threading import Condition, Lock
+from typing import Awaitable, Callable, Deque, Dict, Hashable
+
+logger = getLogger(__name__)
+
+# Jobs one chat may run before its worker is handed to another chat
+BATCH = 16
+
+
+class ChatScheduler:
+    """Thread pool flavour, used by the threaded runtime"""
+
+    def __init__(self, workers: int):
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="chat")
+        self.lock = Lock()
+        self.idle = Condition(self.lock)
+        # A key is present while its chat has queued or running jobs
+        self.queues: Dict[Hashable, Deque[Callable[[], None]]] = {}
+        self.pending = 0
+
+    def submit(self, key: Hashable, job: Callable[[], None]):
+        with self.lock:
+            self.pending += 1
+            queue = self.queues.get(key)
+            if queue is not None:
+                queue.append(job)
+                return
+            self.queues[key] = deque((job,))
+        self.executor.submit(self._drain, key)
+
+    def _drain(self, key: Hashable):
+        for _ in range(BATCH):
+            with self.lock:
+                queue = self.queues[key]
+                if not queue:
+                    del self.queues[key]
+                    if not self.queues:
+                        self.idle.notify_all()
+                    return
+                job = queue.popleft()
+                self.pending -= 1
+            try:
+                job()
+            except Exception:
+                logger.exception(f"Job of chat {key} failed")
+        self.executor.submit(self._drain, key)
+
+    def shutdown(self):
+        """Wait for every queued job, then stop the workers"""
+        with self.lock:
+            while self.queues:
+                self.idle.wait()
+        self.executor.shutdown()
+
+
+class AsyncChatScheduler:
+    """asyncio flavour, every busy chat is drained by one task"""
+
+    def __init__(self):
+        self.queues: Dict[Hashable, Deque[Callable[[], Awaitable[None]]]] = {}
+        self.tasks = set()
+        self.pending = 0
+
+    def submit(self, key: Hashable, job: Callable[[], Awaitable[None]]):
+        self.pending += 1
+        queue = self.queues.get(key)
+        if queue is not None:
+            queue.append(job)
+            return
+        self.queues[key] = deque((job,))
+        task = asyncio.get_running_loop().create_task(self._drain(key))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _drain(self, key: Hashable):
+        queue = self.queues[key]
+        while queue:
+            job = queue.popleft()
+            self.pending -= 1
+            try:
+                await job()
+            except Exception:
+                logger.exception(f"Job of chat {key} failed")
+        del self.queues[key]
+
+    async def join(self):
+        while self.tasks:
+            await asyncio.gather(*self.tasks)
+
+
+def serialized(scheduler: ChatScheduler, key: Callable, callback: Callable):
+    """Wrap a dispatcher callback so it runs on ``scheduler`` under ``key``"""
+
+    @wraps(callback)
+    def wrapper(update, context):
+        scheduler.submit(key(update), partial(callback, update, context))
+
+    return wrapper
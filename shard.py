@@ -0,0 +1,195 @@
+"""
+Sharded deployment.
+
+A front process receives every update, by long polling or webhook, and routes
+it to one of several worker processes. Each worker owns the chats that
+consistent hashing on the chat id assigns to it, with its own
+:class:`GameManager` and asyncio runtime. Inline queries and chosen results
+carry no chat, so the chat a user currently plays in is kept in a SQLite
+database shared by all processes.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import sqlite3
+from bisect import bisect
+from hashlib import blake2b
+from logging import getLogger
+from threading import Lock
+from time import sleep
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+if TYPE_CHECKING:
+    from multiprocessing import Queue
+
+    from telegram import Bot, Update
+
+    from player import Player
+    from webhook import WebhookServer
+
+logger = getLogger(__name__)
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hashing, adding a shard only moves about 1/n of the chats"""
+
+    def __init__(self, shards: int, replicas: int = 100):
+        points = sorted(
+            (_hash(f"{shard}:{i}"), shard)
+            for shard in range(shards)
+            for i in range(replicas)
+        )
+        self.hashes = [point for point, _ in points]
+        self.shards = [shard for _, shard in points]
+
+    def shard(self, key: int) -> int:
+        i = bisect(self.hashes, _hash(str(key)))
+        return self.shards[i % len(self.shards)]
+
+
+class CurrentStore:
+    """user id -> chat id of the game the user currently plays in"""
+
+    def __init__(self, path: str):
+        self.lock = Lock()
+        self.db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS current"
+                " (user_id INTEGER PRIMARY KEY, chat_id INTEGER NOT NULL)"
+            )
+
+    def get(self, user_id: int) -> Optional[int]:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT chat_id FROM current WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return row and row[0]
+
+    def set(self, user_id: int, chat_id: int):
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO current VALUES (?, ?)", (user_id, chat_id)
+            )
+
+    def discard(self, user_id: int, chat_id: int):
+        """Forget the user, unless another shard moved it to another chat"""
+        with self.lock, self.db:
+            self.db.execute(
+                "DELETE FROM current WHERE user_id = ? AND chat_id = ?",
+                (user_id, chat_id),
+            )
+
+
+class SharedCurrent(dict):
+    """``GameManager.userid_current`` that writes through to a store"""
+
+    def __init__(self, store: CurrentStore):
+        super().__init__()
+        self.store = store
+
+    def __setitem__(self, user_id: int, player: Player):
+        super().__setitem__(user_id, player)
+        self.store.set(user_id, player.game.chat.id)
+
+    def __delitem__(self, user_id: int):
+        player = self[user_id]
+        super().__delitem__(user_id)
+        self.store.discard(user_id, player.game.chat.id)
+
+    def setdefault(self, user_id: int, player: Player) -> Player:
+        if user_id not in self:
+            self[user_id] = player
+        return self[user_id]
+
+    def pop(self, user_id: int, *default):
+        if user_id not in self:
+            return super().pop(user_id, *default)
+        player = self[user_id]
+        del self[user_id]
+        return player
+
+
+class Router:
+    """Front process, hands every update to the shard owning its chat"""
+
+    def __init__(self, bot: Bot, store: CurrentStore, queues: List[Queue]):
+        self.bot = bot
+        self.store = store
+        self.queues = queues
+        self.ring = HashRing(len(queues))
+        self.running = False
+
+    def key(self, update: Update) -> int:
+        if update.effective_chat:
+            return update.effective_chat.id
+        user = update.effective_user
+        if user is None:
+            return 0
+        chat_id = self.store.get(user.id)
+        return user.id if chat_id is None else chat_id
+
+    def route(self, update: Update):
+        queue = self.queues[self.ring.shard(self.key(update))]
+        queue.put(update.to_json())
+
+    def poll(self, timeout: int = 10):
+        offset = None
+        self.running = True
+        while self.running:
+            try:
+                updates = self.bot.get_updates(offset=offset, timeout=timeout)
+            except Exception:
+                logger.exception("Failed to get updates")
+                sleep(1)
+                continue
+            for update in updates:
+                offset = update.update_id + 1
+                self.route(update)
+
+    def run(self, server: Optional[WebhookServer] = None):
+        """Poll for updates, or receive them from ``server``"""
+        try:
+            if server is None:
+                self.bot.delete_webhook()
+                self.poll()
+            else:
+                server.sink = self.route
+                server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        if server is not None:
+            server.server_close()
+
+
+def serve(
+    bot: Bot,
+    shards: int,
+    worker: Callable[[int, int, Queue], None],
+    store_path: str,
+    server: Optional[WebhookServer] = None,
+):
+    """Start ``shards`` processes running ``worker`` and route updates to them"""
+    context = multiprocessing.get_context("spawn")
+    queues = [context.Queue() for _ in range(shards)]
+    processes = [
+        context.Process(target=worker, args=(i, shards, queue), name=f"shard{i}")
+        for i, queue in enumerate(queues)
+    ]
+    for process in processes:
+        process.start()
+    logger.info(f"Started {shards} shards")
+
+    try:
+        Router(bot, CurrentStore(store_path), queues).run(server)
+    finally:
+        for queue in queues:
+            queue.put(None)
+        for process in processes:
+            process.join()
@@ -0,0 +1,292 @@
+"""
+Vectorized Monte Carlo self-play.
+
+Plays whole games over a batch dimension with NumPy count vectors instead of
+``Game``/``Player`` objects. The rules mirror ``engine`` and ``Game``: the
+real ``CARDS`` multiset, the 2-3 player discard in ``Game.start`` and the
+scoring in ``Game.scoring``.
+
+    python simulator.py --games 1000000 --players 4
+"""
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import numpy as np
+
+from card import CARDS
+from engine import MAX_HP
+
+HAND_SIZE = 5
+SECRET_SIZE = 4
+WINNING_SCORE = 8
+
+TOTAL = np.bincount([c.rank for c in CARDS], minlength=9)[1:].astype(np.int8)
+RANKS = np.arange(1, 9)
+
+
+class Batch:
+    """State of ``size`` games with ``players`` seats each"""
+
+    def __init__(self, size: int, players: int, rng: np.random.Generator):
+        if not 2 <= players <= 5:
+            raise ValueError("Abracada What needs 2 to 5 players")
+        self.size = size
+        self.players = players
+        self.rng = rng
+
+        self.deck = np.zeros((size, 8), np.int8)
+        self.deck_size = np.zeros(size, np.int8)
+        self.used = np.zeros((size, 8), np.int8)
+        self.secret = np.zeros((size, 8), np.int8)
+        self.hands = np.zeros((size, players, 8), np.int8)
+        self.hand_size = np.zeros((size, players), np.int8)
+        # (game, seat) flattened views for single-array fancy indexing
+        self.seat_hands = self.hands.reshape(-1, 8)
+        self.seat_size = self.hand_size.reshape(-1)
+        self.owls = np.zeros((size, players), np.int8)
+        self.hp = np.zeros((size, players), np.int8)
+        self.score = np.zeros((size, players), np.int8)
+        self.current = np.zeros(size, np.intp)
+        self.last = np.zeros(size, np.int8)
+        self.rounds = np.zeros(size, np.int32)
+        self.done = np.zeros(size, bool)
+
+        self.deal(np.arange(size))
+
+    def draw(self, rows: np.ndarray, source: np.ndarray, left: np.ndarray):
+        """Remove one random stone out of ``left`` from ``source[rows]``"""
+        cum = source[rows].cumsum(axis=1)
+        pick = (self.rng.random(rows.size) * left).astype(np.int8)
+        slot = (cum <= pick[:, None]).sum(axis=1)
+        source[rows, slot] -= 1
+        return slot
+
+    def refill(self, rows: np.ndarray, seats: np.ndarray):
+        """Draw until the hand holds 5 stones or the deck is empty"""
+        flat = rows * self.players + seats
+        need = np.minimum(HAND_SIZE - self.seat_size[flat], self.deck_size[rows])
+        for i in range(HAND_SIZE):
+            m = need > i
+            if not m.any():
+                return
+            r, f = rows[m], flat[m]
+            self.seat_hands[f, self.draw(r, self.deck, self.deck_size[r])] += 1
+            self.seat_size[f] += 1
+            self.deck_size[r] -= 1
+
+    def deal(self, rows: np.ndarray):
+        """Game.start for ``rows``"""
+        self.deck[rows] = TOTAL
+        self.deck_size[rows] = TOTAL.sum()
+        self.used[rows] = 0
+        self.secret[rows] = 0
+        discard = 6 * (4 - self.players) if 2 <= self.players <= 3 else 0
+        for _ in range(discard):
+            self.used[rows, self.draw(rows, self.deck, self.deck_size[rows])] += 1
+            self.deck_size[rows] -= 1
+        for _ in range(SECRET_SIZE):
+            self.secret[rows, self.draw(rows, self.deck, self.deck_size[rows])] += 1
+            self.deck_size[rows] -= 1
+
+        self.hands[rows] = 0
+        self.hand_size[rows] = 0
+        self.owls[rows] = 0
+        self.hp[rows] = MAX_HP
+        self.last[rows] = 0
+        self.rounds[rows] += 1
+        for offset in range(self.players):
+            self.refill(rows, (self.current[rows] + offset) % self.players)
+
+    def turn(self, rows: np.ndarray):
+        """Game.turn for ``rows``"""
+        self.last[rows] = 0
+        self.refill(rows, self.current[rows])
+        self.current[rows] = (self.current[rows] + 1) % self.players
+
+    def step(self, policy: Policy):
+        rows = np.flatnonzero(~self.done)
+        if not rows.size:
+            return
+        seats = self.current[rows]
+        can_pass = self.seat_size[rows * self.players + seats] < HAND_SIZE
+
+        action = np.asarray(policy(self, rows), np.intp)
+        action[~can_pass & (action == 0)] = 1
+        casting = action > 0
+        self.turn(rows[~casting])
+
+        rows, seats = rows[casting], seats[casting]
+        card = np.maximum(action[casting], self.last[rows])
+        flat = rows * self.players + seats
+        success = self.seat_hands[flat, card - 1] > 0
+        value = self.rng.integers(1, 4, rows.size).astype(np.int8)
+
+        ok, seat, card_ok, value_ok = (
+            rows[success],
+            seats[success],
+            card[success],
+            value[success],
+        )
+        self.seat_hands[flat[success], card_ok - 1] -= 1
+        self.seat_size[flat[success]] -= 1
+        self.used[ok, card_ok - 1] += 1
+        self.last[ok] = card_ok
+
+        hp = self.hp
+        left = (seat - 1) % self.players
+        right = (seat + 1) % self.players
+        m = card_ok == 1
+        hp[ok[m]] -= value_ok[m][:, None]
+        hp[ok[m], seat[m]] += value_ok[m]
+        m = (card_ok == 2) | (card_ok == 8)
+        hp[ok[m], seat[m]] += 1
+        m = card_ok == 3
+        hp[ok[m], seat[m]] += value_ok[m]
+        m = card_ok == 4
+        self.draw(ok[m], self.secret, self.secret[ok[m]].sum(axis=1))
+        self.owls[ok[m], seat[m]] += 1
+        if self.players > 2:
+            m = card_ok == 5
+            hp[ok[m], right[m]] -= 1
+        m = (card_ok == 5) | (card_ok == 6)
+        hp[ok[m], left[m]] -= 1
+        m = card_ok == 7
+        hp[ok[m], right[m]] -= 1
+
+        bad, seat = rows[~success], seats[~success]
+        penalty = np.where(card[~success] == 1, value[~success], 1)
+        hp[bad, seat] -= penalty.astype(np.int8)
+        hp[rows] = np.clip(hp[rows], 0, MAX_HP)
+        self.turn(bad[hp[bad, seat] > 0])
+
+        self.settle(rows)
+
+    def settle(self, rows: np.ndarray):
+        """Game.has_end, Game.scoring and Game.has_winner for ``rows``"""
+        seats = self.current[rows]
+        empty = self.seat_size[rows * self.players + seats] == 0
+        end = empty | (self.deck_size[rows] == 0) | (self.hp[rows] == 0).any(axis=1)
+        rows, seats, empty = rows[end], seats[end], empty[end]
+        if not rows.size:
+            return
+
+        alive = self.hp[rows] > 0
+        mine = np.zeros_like(alive)
+        mine[np.arange(rows.size), seats] = True
+        me_alive = alive[np.arange(rows.size), seats]
+
+        gain = np.where(mine, 3, 0) * (empty | me_alive)[:, None]
+        gain += (alive & ~mine) * (~empty & me_alive)[:, None]
+        gain += alive * (~empty & ~me_alive)[:, None]
+        gain += alive * self.owls[rows]
+        self.score[rows] = np.minimum(self.score[rows] + gain, WINNING_SCORE)
+
+        won = (self.score[rows] == WINNING_SCORE).any(axis=1)
+        self.done[rows[won]] = True
+        self.deal(rows[~won])
+
+
+Policy = Callable[[Batch, np.ndarray], np.ndarray]
+
+
+def random_policy(pass_prob: float = 0.5) -> Policy:
+    """Cast a uniformly random legal stone, pass with ``pass_prob``"""
+
+    def policy(batch: Batch, rows: np.ndarray) -> np.ndarray:
+        low = np.maximum(batch.last[rows], 1)
+        card = batch.rng.integers(low, 9)
+        passing = (batch.last[rows] > 0) & (batch.rng.random(rows.size) < pass_prob)
+        return np.where(passing, 0, card)
+
+    return policy
+
+
+def likely_policy(threshold: float = 0.5) -> Policy:
+    """
+    Cast the legal stone with most unseen copies and pass once the expected
+    number of copies in hand drops below ``threshold``.
+    """
+
+    def policy(batch: Batch, rows: np.ndarray) -> np.ndarray:
+        seats = batch.current[rows]
+        seen = batch.used[rows] + batch.hands[rows].sum(axis=1)
+        seen -= batch.hands[rows, seats]
+        unseen = (TOTAL - seen).astype(np.float32)
+        unseen[RANKS[None, :] < batch.last[rows][:, None]] = -1
+        card = unseen.argmax(axis=1) + 1
+
+        size = batch.hand_size[rows, seats]
+        pool = np.maximum(TOTAL.sum() - seen.sum(axis=1), 1)
+        expected = unseen.max(axis=1) * size / pool
+        passing = (batch.last[rows] > 0) & (expected < threshold)
+        return np.where(passing, 0, card)
+
+    return policy
+
+
+@dataclass
+class Result:
+    score: np.ndarray
+    rounds: np.ndarray
+    steps: int
+
+    @property
+    def winners(self) -> np.ndarray:
+        return self.score == WINNING_SCORE
+
+    def win_rate(self) -> np.ndarray:
+        """Share of games won per seat, ties count for every winner"""
+        return self.winners.mean(axis=0)
+
+
+def simulate(
+    games: int,
+    players: int,
+    policy: Optional[Policy] = None,
+    seed: Optional[int] = None,
+    batch_size: int = 100_000,
+    max_steps: int = 10_000,
+) -> Result:
+    """Play ``games`` complete games with ``players`` seats"""
+    policy = policy or random_policy()
+    # One independent stream per batch, so a batch depends only on the seed
+    # and its index and batches can be split across workers
+    starts = range(0, games, batch_size)
+    streams = np.random.SeedSequence(seed).spawn(len(starts))
+    scores, rounds, steps = [], [], 0
+    for start, stream in zip(starts, streams):
+        rng = np.random.default_rng(stream)
+        batch = Batch(min(batch_size, games - start), players, rng)
+        for _ in range(max_steps):
+            if batch.done.all():
+                break
+            batch.step(policy)
+            steps += 1
+        else:
+            raise RuntimeError("Games did not finish within max_steps")
+        scores.append(batch.score)
+        rounds.append(batch.rounds)
+    return Result(np.concatenate(scores), np.concatenate(rounds), steps)
+
+
+def main():
+    parser = ArgumentParser(description="Abracada What self-play simulator")
+    parser.add_argument("--games", type=int, default=100_000)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--policy", choices=("random", "likely"), default="random")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    policy = random_policy() if args.policy == "random" else likely_policy()
+    result = simulate(args.games, args.players, policy, args.seed, args.batch_size)
+    print(f"games: {args.games}  rounds/game: {result.rounds.mean():.2f}")
+    for seat, rate in enumerate(result.win_rate()):
+        print(f"seat {seat}: {rate:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Expiry of idle games.
+
+Deadlines live in a :class:`TimerWheel`, a ring of buckets one tick wide.
+Scheduling is an append and every tick only looks at the buckets that came
+due, so thousands of games cost one background thread and no per-game
+timers. Touching a game does not move it in the wheel: when its bucket comes
+due the real deadline is checked again and the game is put back if it was
+active in the meantime. Ended games are cancelled so the wheel only holds
+live ones.
+"""
+from __future__ import annotations
+
+from logging import getLogger
+from math import ceil
+from threading import Event, Lock, Thread
+from time import monotonic
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from game import Game
+    from game_manager import GameManager
+
+logger = getLogger(__name__)
+
+
+class TimerWheel:
+    def __init__(self, tick: float = 60, size: int = 64, now: Optional[float] = None):
+        self.tick = tick
+        self.buckets: List[List[Tuple[float, Any]]] = [[] for _ in range(size)]
+        self.cursor = int((monotonic() if now is None else now) // tick)
+        # Bucket of every scheduled item, an item is in the wheel at most once
+        self.slots: Dict[Any, int] = {}
+        self.lock = Lock()
+
+    def __len__(self) -> int:
+        return sum(map(len, self.buckets))
+
+    def schedule(self, item: Any, deadline: float):
+        with self.lock:
+            self._remove(item)
+            slot = max(ceil(deadline / self.tick), self.cursor + 1) % len(self.buckets)
+            self.buckets[slot].append((deadline, item))
+            self.slots[item] = slot
+
+    def cancel(self, item: Any):
+        """Stop watching ``item``"""
+        with self.lock:
+            self._remove(item)
+
+    def _remove(self, item: Any):
+        slot = self.slots.pop(item, None)
+        if slot is not None:
+            bucket = self.buckets[slot]
+            self.buckets[slot] = [entry for entry in bucket if entry[1] is not item]
+
+    def advance(self, now: Optional[float] = None) -> List[Any]:
+        """Pop the items whose deadline passed"""
+        now = monotonic() if now is None else now
+        due = []
+        with self.lock:
+            target = int(now // self.tick)
+            size = len(self.buckets)
+            steps = min(target - self.cursor, size)
+            for tick in range(self.cursor + 1, self.cursor + 1 + steps):
+                bucket = self.buckets[tick % size]
+                # Items a whole turn of the wheel or more ahead stay put
+                self.buckets[tick % size] = [
+                    entry for entry in bucket if entry[0] > now
+                ]
+                for deadline, item in bucket:
+                    if deadline <= now:
+                        del self.slots[item]
+                        due.append(item)
+            self.cursor = max(self.cursor, target)
+        return due
+
+
+class Sweeper:
+    """Hands games that idled past their deadline to ``expire``"""
+
+    def __init__(
+        self,
+        gm: GameManager,
+        expire: Callable[[Game], None],
+        interval: Optional[float] = None,
+    ):
+        self.gm = gm
+        self.expire = expire
+        self.interval = gm.wheel.tick if interval is None else interval
+        self.stopped = Event()
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        now = monotonic() if now is None else now
+        expired = 0
+        for game in self.gm.wheel.advance(now):
+            if not self.gm.is_live(game):
+                continue
+            deadline = self.gm.deadline(game)
+            if deadline > now:
+                self.gm.wheel.schedule(game, deadline)
+                continue
+            try:
+                self.expire(game)
+                expired += 1
+            except Exception:
+                logger.exception(f"Failed to expire the game in chat {game.chat.id}")
+                self.gm.wheel.schedule(game, now + self.interval)
+        return expired
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sweep()
+
+    def start(self) -> Thread:
+        thread = Thread(target=self.run, name="sweeper", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.stopped.set()
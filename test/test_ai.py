@@ -0,0 +1,59 @@
+import random
+import unittest
+from time import time
+
+from telegram import User
+
+import ai
+from game import Game
+from player import Player
+
+
+def make_game(players: int) -> Game:
+    game = Game(None)
+    for i in range(players):
+        Player(game, User(i + 1, f"user{i + 1}", False))
+    game.start()
+    return game
+
+
+class Test(unittest.TestCase):
+    def test_observe(self):
+        game = make_game(3)
+        me = game.current_player
+        view = ai.observe(game, me)
+        self.assertIsNone(view.hands[0])
+        self.assertEqual(view.hands[1], tuple(me.next.cards.counts))
+        with self.assertRaises(ValueError):
+            ai.observe(game, me.next)
+
+        # Every deal keeps what the player can see and hides the rest
+        state = ai.State(view, random.Random(1))
+        self.assertEqual(state.hands[1], list(me.next.cards.counts))
+        self.assertEqual(sum(state.hands[0]), len(me.cards))
+        self.assertEqual(len(state.deck), len(game.deck.cards))
+        self.assertEqual(len(state.secret), len(game.secret_cards))
+
+    def test_search(self):
+        game = make_game(4)
+        view = ai.observe(game, game.current_player)
+        move = ai.search(view, budget=5, seed=1, iterations=300)
+        # A full hand cannot pass
+        self.assertIn(move, range(1, 9))
+        self.assertEqual(move, ai.search(view, budget=5, seed=1, iterations=300))
+
+        # Nothing left to search in: the cheap move
+        self.assertEqual(ai.search(view, budget=0), ai.fallback(view))
+        # Neither when the move waited for a worker longer than the budget
+        asked = time() - 10
+        self.assertEqual(ai.search(view, budget=5, asked=asked), ai.fallback(view))
+
+    def test_rounds(self):
+        rng = random.Random(2)
+        for players in (2, 3, 5):
+            game = make_game(players)
+            state = ai.State(ai.observe(game, game.current_player), rng)
+            ai.rollout(state, rng)
+            self.assertTrue(state.over)
+            self.assertTrue(all(0 <= hp <= 6 for hp in state.hp))
+            self.assertTrue(any(state.score))
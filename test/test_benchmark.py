@@ -0,0 +1,12 @@
+import unittest
+
+from benchmark import BENCHMARKS
+
+
+class Test(unittest.TestCase):
+    def test_benchmarks_run(self):
+        for name, setup in BENCHMARKS.items():
+            with self.subTest(name):
+                run = setup()
+                run()
+                run()
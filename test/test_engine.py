@@ -0,0 +1,83 @@
+import unittest
+
+import engine
+from card import Card
+from game import Game
+from hand import Hand
+from player import Player
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.game = Game(None)
+        self.p0 = Player(self.game, "Player 0")
+        self.p1 = Player(self.game, "Player 1")
+        self.p2 = Player(self.game, "Player 2")
+        self.game.start()
+
+    def deal(self, player, *ids):
+        player.cards = Hand.from_cards(Card.from_id(str(i)) for i in ids)
+
+    def test_not_your_turn(self):
+        events = engine.cast(self.game, self.p1, Card.from_id("8"))
+        self.assertIsInstance(events[0], engine.NotYourTurn)
+        self.assertEqual(len(events), 1)
+
+    def test_cast_succeeded(self):
+        self.deal(self.p0, 6, 6, 7, 8, 8)
+        events = engine.cast(self.game, self.p0, Card.from_id("6"))
+
+        self.assertIsInstance(events[0], engine.CastSucceeded)
+        self.assertIn(events[0].index, range(5))
+        self.assertEqual(events[0].remaining, 4)
+        self.assertEqual(self.p0.left.hp, 5)
+        self.assertIs(self.game.current_player, self.p0)
+        self.assertIsInstance(events[-1], engine.Prompt)
+
+        events = engine.cast(self.game, self.p0, Card.from_id("5"))
+        self.assertIsInstance(events[0], engine.WeakerCard)
+
+    def test_cast_failed(self):
+        self.deal(self.p0, 6, 6, 7, 8, 8)
+        events = engine.cast(self.game, self.p0, Card.from_id("2"))
+
+        self.assertIsInstance(events[0], engine.CastFailed)
+        self.assertIsInstance(events[1], engine.Wounded)
+        self.assertEqual(self.p0.hp, 5)
+        self.assertIs(self.game.current_player, self.p1)
+
+    def test_dice(self):
+        self.deal(self.p0, 1, 6, 7, 8, 8)
+        events = engine.cast(self.game, self.p0, Card.from_id("1"))
+        self.assertIsInstance(events[-1], engine.DiceRequired)
+
+        events = engine.pass_turn(self.game, self.p0)
+        self.assertIsInstance(events[0], engine.DicePending)
+
+        events = engine.roll(self.game, 6)
+        self.assertEqual(events[0].value, 3)
+        self.assertEqual(self.p0.hp, 6)
+        self.assertEqual(self.p1.hp, 3)
+        self.assertEqual(self.p2.hp, 3)
+
+    def test_pass(self):
+        self.deal(self.p0, 6, 6, 7, 8, 8)
+        events = engine.pass_turn(self.game, self.p0)
+        self.assertIsInstance(events[0], engine.CannotPass)
+
+        engine.cast(self.game, self.p0, Card.from_id("8"))
+        events = engine.pass_turn(self.game, self.p0)
+        self.assertIsInstance(events[0], engine.Passed)
+        self.assertEqual(events[0].drawn, 1)
+        self.assertIs(events[0].next_player, self.p1)
+        self.assertEqual(len(self.p0.cards), 5)
+
+    def test_round_end(self):
+        self.deal(self.p0, 7, 8, 8, 8, 8)
+        self.p1.hp = 1
+        events = engine.cast(self.game, self.p0, Card.from_id("7"))
+
+        self.assertIsInstance(events[-2], engine.NewRound)
+        self.assertEqual(self.p0.score, 3)
+        self.assertEqual(self.p2.score, 1)
+        self.assertEqual(self.p1.hp, 6)
@@ -0,0 +1,82 @@
+import json
+import os
+import tempfile
+import unittest
+
+from telegram import Chat, User
+
+import engine
+from eventlog import EventLog, segments
+from game import Game
+from player import Player
+
+
+def read(directory):
+    records = []
+    for path in segments(directory):
+        with open(path, encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f)
+    return records
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_record(self):
+        log = EventLog(self.directory)
+        log.start()
+        game = Game(Chat(-1, "group"), seed=6)
+        for i in range(2):
+            Player(game, User(i + 1, f"user{i + 1}", False))
+        game.start()
+        log.emit(-1, "start", 1, seed=6)
+        player = game.current_player
+        events = engine.cast(game, player, next(iter(player.cards)))
+        if game.pending:
+            events += engine.roll(game, 3)
+        log.record(game, events)
+        log.close()
+
+        records = read(self.directory)
+        self.assertEqual(records[0]["ev"], "start")
+        self.assertEqual(records[0]["seed"], 6)
+        cast = records[1]
+        self.assertEqual((cast["ev"], cast["chat"], cast["user"]), ("cast", -1, 1))
+        self.assertEqual(cast["left"], len(player.cards))
+        # Prompts and settlements without a new round are left out
+        self.assertNotIn("RoundSettled", [r["ev"] for r in records])
+
+    def test_rotate(self):
+        log = EventLog(self.directory, max_bytes=200, backups=2)
+        log.start()
+        for i in range(50):
+            log.emit(-1, "join", i)
+        log.close()
+        paths = segments(self.directory)
+        self.assertEqual(len(paths), 3)
+        # The oldest segments are gone, the newest records are kept in order
+        users = [record["user"] for record in read(self.directory)]
+        self.assertEqual(users, sorted(users))
+        self.assertEqual(users[-1], 49)
+
+        # A restart appends to the last segment
+        log = EventLog(self.directory, max_bytes=200, backups=2)
+        log.start()
+        log.close()
+        self.assertEqual(segments(self.directory), paths)
+
+    def test_full(self):
+        # Nothing drains the queue before start
+        log = EventLog(self.directory, buffer=3)
+        for i in range(5):
+            log.emit(-1, "join", i)
+        self.assertEqual(log.dropped, 2)
+        log.start()
+        log.close()
+        self.assertEqual([r["user"] for r in read(self.directory)], [0, 1, 2])
+        self.assertTrue(os.path.exists(segments(self.directory)[0]))
@@ -88,4 +88,24 @@ class Test(unittest.TestCase):
         self.assertFalse(0 in self.gm.chatid_games)
         self.assertFalse(0 in self.gm.userid_players)
         self.assertFalse(1 in self.gm.userid_players)
-        self.assertFalse(2 in self.gm.userid_players)
\ No newline at end of file
+        self.assertFalse(2 in self.gm.userid_players)
+
+    def test_lookup(self):
+        g0 = self.gm.new_game(self.chat0)
+        self.gm.join_game(self.user0, self.chat0)
+        self.gm.join_game(self.user1, self.chat0)
+        self.gm.join_game(self.user2, self.chat0)
+
+        self.assertIs(self.gm.active_game(0), g0)
+        self.assertIsNone(self.gm.active_game(1))
+
+        player = self.gm.player_for_user_in_chat(self.user1, self.chat0)
+        self.assertIs(player.game, g0)
+        self.assertIsNone(self.gm.player_for_user_in_chat(self.user1, self.chat1))
+
+        self.gm.leave_game(self.user1, self.chat0)
+        self.assertIsNone(self.gm.player_for_user_in_chat(self.user1, self.chat0))
+
+        self.gm.end_game(self.chat0, self.user0)
+        self.assertIsNone(self.gm.active_game(0))
+        self.assertFalse(self.gm.userchat_player)
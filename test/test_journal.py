@@ -0,0 +1,161 @@
+import os
+import tempfile
+import unittest
+
+from telegram import Chat, User
+
+import engine
+from card import Card
+from game_manager import GameManager
+from journal import Store, encode_game, segments
+from rng import Stream
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = self.tmp.name
+        self.gm = GameManager()
+        self.store = Store(self.directory)
+        self.store.restore(self.gm)
+
+        self.chats = [Chat(-i, "group") for i in range(1, 4)]
+        self.users = [User(i, f"user{i}", False) for i in range(1, 7)]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def play(self, chat, users):
+        game = self.gm.new_game(chat)
+        game.starter = users[0]
+        self.store.record(self.gm, "new", chat.id, users[0])
+        for user in users:
+            self.gm.join_game(user, chat)
+            self.store.record(self.gm, "join", chat.id, user)
+        game.start()
+        self.store.record(self.gm, "start", chat.id, users[0])
+        self.move(game, next(iter(game.current_player.cards)).id, 3)
+
+    def move(self, game, card, dice=None):
+        """Cast ``card`` or pass and journal it, local dice when ``dice`` is None"""
+        player, chat_id = game.current_player, game.chat.id
+        if card == "pass":
+            events = engine.pass_turn(game, player)
+        else:
+            events = engine.cast(game, player, Card.from_id(card))
+        if isinstance(events[0], (engine.WeakerCard, engine.CannotPass)):
+            return events
+        local = game.pending is not None and dice is None
+        if game.pending is not None:
+            dice = game.rng.randint(1, 6) if local else dice
+            events.extend(engine.roll(game, dice))
+        if isinstance(events[-1], engine.GameWon):
+            self.gm.end_game(game.chat, player.user)
+        op = "pass" if card == "pass" else "cast"
+        self.store.record(
+            self.gm, op, chat_id, player.user, card=card, dice=dice, local=local
+        )
+        return events
+
+    def restored(self):
+        self.store.journal.close()
+        gm = GameManager()
+        Store(self.directory).restore(gm)
+        return gm
+
+    def assertSameState(self, gm):
+        self.assertEqual(gm.chatid_games.keys(), self.gm.chatid_games.keys())
+        for chat_id, games in self.gm.chatid_games.items():
+            self.assertEqual(
+                [encode_game(game) for game in gm.chatid_games[chat_id]],
+                [encode_game(game) for game in games],
+            )
+        self.assertEqual(gm.userchat_player.keys(), self.gm.userchat_player.keys())
+        for user_id, player in self.gm.userid_current.items():
+            self.assertEqual(
+                gm.userid_current[user_id].game.chat.id, player.game.chat.id
+            )
+
+    def test_replay(self):
+        self.play(self.chats[0], self.users[:3])
+        self.play(self.chats[1], self.users[2:5])
+        self.assertSameState(self.restored())
+
+    def test_whole_game(self):
+        self.gm = GameManager(seed=7)
+        self.play(self.chats[0], self.users[:4])
+        game = self.gm.active_game(self.chats[0].id)
+        choices = Stream(11)
+        for _ in range(60):
+            hand = [card.id for card in game.current_player.cards]
+            self.move(game, choices.choice(hand + ["pass"]))
+            if choices.random() < 0.05:
+                # Later records are replayed over a snapshot
+                self.store.snapshot()
+        # Rounds were dealt and dice drawn from the stream along the way
+        self.assertFalse(game.ended)
+        self.assertGreater(game.rng.position, 30)
+        self.assertSameState(self.restored())
+
+    def test_snapshot(self):
+        self.play(self.chats[0], self.users[:3])
+        self.store.snapshot()
+        self.assertEqual(len(segments(self.directory)), 1)
+
+        self.play(self.chats[1], self.users[3:6])
+        self.gm.end_game(self.chats[0], self.users[0])
+        self.store.record(self.gm, "kill", self.chats[0].id, self.users[0])
+        gm = self.restored()
+        self.assertSameState(gm)
+        self.assertNotIn(self.chats[0].id, gm.chatid_games)
+
+    def test_snapshot_copies(self):
+        self.play(self.chats[0], self.users[:3])
+        game = self.gm.active_game(self.chats[0].id)
+        journaled = encode_game(game)
+        # A move still being made on its lane is left to its own record
+        game.current_player.score += 1
+        self.store.snapshot()
+        gm = self.restored()
+        self.assertEqual(encode_game(gm.active_game(self.chats[0].id)), journaled)
+
+    def test_torn_record(self):
+        self.play(self.chats[0], self.users[:3])
+        self.store.journal.close()
+        path = segments(self.directory)[-1]
+        with open(path, "a") as f:
+            f.write('{"op":"cast","chat":')
+
+        gm = GameManager()
+        store = Store(self.directory)
+        store.restore(gm)
+        self.assertSameState(gm)
+
+        # Records appended after the torn one are still read back
+        self.gm, self.store = gm, store
+        self.play(self.chats[1], self.users[3:6])
+        self.assertSameState(self.restored())
+        self.assertTrue(os.path.exists(path))
+
+    def test_seed(self):
+        self.gm = GameManager(seed=42)
+        self.play(self.chats[0], self.users[:3])
+        live = self.gm.active_game(self.chats[0].id)
+        restored = self.restored().active_game(self.chats[0].id)
+        # The stream goes on where the journal left it
+        self.assertEqual(
+            [restored.deck.draw() for _ in range(5)],
+            [live.deck.draw() for _ in range(5)],
+        )
+
+        # And a fixed seed deals the same games again
+        deals = []
+        for _ in range(2):
+            gm = GameManager(seed=42)
+            gm.new_game(self.chats[1])
+            for user in self.users[3:6]:
+                gm.join_game(user, self.chats[1])
+            game = gm.active_game(self.chats[1].id)
+            game.start()
+            deals.append(encode_game(game))
+        self.assertEqual(deals[0], deals[1])
@@ -0,0 +1,71 @@
+import asyncio
+import unittest
+from urllib.request import urlopen
+
+from errors import NoGameInChatError
+from metrics import (
+    GAME_ERRORS,
+    HANDLER_ERRORS,
+    HANDLER_LATENCY,
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsServer,
+    Registry,
+    instrument,
+)
+
+
+class Test(unittest.TestCase):
+    def test_render(self):
+        registry = Registry()
+        counter = Counter("calls_total", "Calls", ["method"], registry=registry)
+        histogram = Histogram(
+            "call_seconds", "Latency", ["method"], buckets=(0.1, 1), registry=registry
+        )
+        gauge = Gauge("games", "Games", registry=registry)
+        labelled = Gauge("shard_games", "Games", ["shard"], registry=registry)
+        counter.inc('say "hi"')
+        counter.inc('say "hi"', amount=2)
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, "send")
+        gauge.set_function(lambda: 3)
+        labelled.labels("1").set_function(lambda: 2)
+
+        lines = registry.render().splitlines()
+        self.assertIn("# TYPE calls_total counter", lines)
+        self.assertIn('calls_total{method="say \\"hi\\""} 3', lines)
+        self.assertIn('call_seconds_bucket{method="send",le="0.1"} 1', lines)
+        self.assertIn('call_seconds_bucket{method="send",le="1"} 2', lines)
+        self.assertIn('call_seconds_bucket{method="send",le="+Inf"} 3', lines)
+        self.assertIn('call_seconds_sum{method="send"} 5.55', lines)
+        self.assertIn('call_seconds_count{method="send"} 3', lines)
+        self.assertIn("games 3", lines)
+        self.assertIn('shard_games{shard="1"} 2', lines)
+
+    def test_instrument(self):
+        async def fails(update, context):
+            raise NoGameInChatError()
+
+        before = GAME_ERRORS.labels("NoGameInChatError").value
+        # Errors the game raises and catches itself are not counted
+        NoGameInChatError()
+        self.assertEqual(GAME_ERRORS.labels("NoGameInChatError").value, before)
+        with self.assertRaises(NoGameInChatError):
+            asyncio.run(instrument(fails)(None, None))
+        self.assertEqual(GAME_ERRORS.labels("NoGameInChatError").value, before + 1)
+        self.assertEqual(HANDLER_ERRORS.labels("fails", "NoGameInChatError").value, 1)
+        self.assertEqual(HANDLER_LATENCY.labels("fails").counts[-1], 0)
+        self.assertEqual(sum(HANDLER_LATENCY.labels("fails").counts), 1)
+
+    def test_server(self):
+        server = MetricsServer(port=0)
+        server.start()
+        try:
+            port = server.server_address[1]
+            with urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+                body = response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertIn("# TYPE abracada_handler_seconds histogram", body)
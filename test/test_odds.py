@@ -0,0 +1,47 @@
+import unittest
+from math import comb
+
+from telegram import User
+
+from card import STONES
+from game import Game
+from odds import absent, odds, unseen
+from player import Player
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.game = Game(None, seed=4)
+        for i in range(3):
+            Player(self.game, User(i + 1, f"user{i + 1}", False))
+        self.game.start()
+        self.player = self.game.current_player
+
+    def test_absent(self):
+        self.assertEqual(absent(10, 3, 2), comb(7, 2) / comb(10, 2))
+        self.assertEqual(absent(10, 9, 2), 0.0)
+        self.assertEqual(absent(10, 0, 5), 1.0)
+
+    def test_odds(self):
+        player = self.player
+        result = odds(player)
+        self.assertAlmostEqual(sum(result.mean), len(player.cards))
+        for rank, copies in enumerate(unseen(player), 1):
+            self.assertGreaterEqual(copies, player.cards.count(STONES[rank - 1]))
+            if not copies:
+                self.assertEqual(result.hold[rank - 1], 0.0)
+            else:
+                self.assertGreater(result.hold[rank - 1], 0.0)
+
+        # Kept until the game changes
+        self.assertIs(odds(player), result)
+        self.game.bump()
+        self.assertIsNot(odds(player), result)
+
+    def test_owls(self):
+        player = self.player
+        player.secret_cards.append(self.game.secret_cards.pop())
+        self.game.bump()
+        owl = player.secret_cards[0].rank - 1
+        self.assertEqual(unseen(player)[owl] + 1, unseen(player, owls=False)[owl])
+        self.assertLessEqual(odds(player).hold[owl], odds(player, owls=False).hold[owl])
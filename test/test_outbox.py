@@ -0,0 +1,75 @@
+import asyncio
+import unittest
+
+from telegram.error import RetryAfter
+
+from outbox import Outbox
+
+
+class FakeBot:
+    def __init__(self, throttle=0):
+        self.sent = []
+        self.throttle = throttle
+
+    def send_message(self, chat_id, text, reply_to_message_id=None, reply_markup=None):
+        if self.throttle:
+            self.throttle -= 1
+            raise RetryAfter(0)
+        self.sent.append((chat_id, text))
+        return len(self.sent)
+
+
+class Test(unittest.TestCase):
+    def run_outbox(self, bot, body, **kwargs):
+        async def main():
+            outbox = Outbox(bot, 2, **kwargs)
+            result = await body(outbox)
+            while outbox.queues:
+                await asyncio.sleep(0.01)
+            return outbox, result
+
+        return asyncio.run(main())
+
+    def test_coalesce(self):
+        bot = FakeBot()
+
+        async def body(outbox):
+            first = await outbox.request("send_message", 1, text="a")
+            for text in "bcd":
+                outbox.post("send_message", 1, text=text)
+            outbox.post("send_message", 2, text="e")
+            depth = outbox.depth(1)
+            last = await outbox.request("send_message", 1, text="f", reply_markup=1)
+            return first, depth, last
+
+        outbox, (first, depth, last) = self.run_outbox(
+            bot, body, chat_rate=10, chat_burst=1
+        )
+        self.assertEqual(first, 1)
+        self.assertEqual(depth, 3)
+        self.assertIn((1, "b\n\nc\n\nd\n\nf"), bot.sent)
+        self.assertIn((2, "e"), bot.sent)
+        self.assertEqual(outbox.coalesced, 3)
+        self.assertEqual(outbox.depth(), 0)
+
+    def test_retry_after(self):
+        bot = FakeBot(throttle=2)
+
+        async def body(outbox):
+            return await outbox.request("send_message", 1, text="a")
+
+        outbox, result = self.run_outbox(bot, body)
+        self.assertEqual(result, 1)
+        self.assertEqual(outbox.throttled, 2)
+
+    def test_thread(self):
+        bot = FakeBot()
+        outbox = Outbox(bot, 2)
+        outbox.start()
+
+        async def body():
+            outbox.post("send_message", 1, text="a")
+            return await outbox.request("send_message", 1, text="b", reply_markup=1)
+
+        self.assertEqual(asyncio.run(body()), 2)
+        self.assertEqual(bot.sent, [(1, "a"), (1, "b")])
@@ -1,7 +1,10 @@
 import unittest
 
+from card import Card
 from game import Game
+from hand import Hand
 from player import Player
+from rng import Stream
 
 
 class Test(unittest.TestCase):
@@ -31,6 +34,22 @@ class Test(unittest.TestCase):
         self.assertEqual(p0, p2.next)
         self.assertEqual(p2, p0.next)
 
+    def test_players(self):
+        p0 = Player(self.game, "Player 0")
+        p1 = Player(self.game, "Player 1")
+        p2 = Player(self.game, "Player 2")
+
+        self.assertEqual(self.game.players, (p0, p1, p2))
+        self.assertIs(self.game.players, self.game.players)
+
+        self.game.current_player = p1
+        self.assertEqual(self.game.players, (p1, p2, p0))
+
+        p2.leave()
+        self.assertEqual(self.game.players, (p1, p0))
+        p3 = Player(self.game, "Player 3")
+        self.assertEqual(self.game.players, (p1, p0, p3))
+
     def test_draw(self):
         p = Player(self.game, "Player 0")
         self.game.start()
@@ -50,3 +69,32 @@ class Test(unittest.TestCase):
         p1.play(p1.cards[0])
         p2.play(p2.cards[0])
 
+    def test_hand(self):
+        p = Player(self.game, "Player 0")
+        p.cards = Hand.from_cards(Card.from_id(i) for i in "63686")
+
+        self.assertEqual([c.id for c in p.cards], ["3", "6", "6", "6", "8"])
+        # Indexes like the list of stones a hand used to be
+        self.assertEqual(p.cards[-1].id, "8")
+        self.assertEqual(p.cards[-5].id, "3")
+        with self.assertRaises(IndexError):
+            p.cards[-6]
+        self.assertTrue(p.has(Card.from_id("8")))
+        self.assertFalse(p.has(Card.from_id("1")))
+
+        self.assertIn(p.play(Card.from_id("6")), range(5))
+        self.assertIn(p.play(Card.from_id("8")), range(4))
+        self.assertEqual(len(p.cards), 3)
+        self.assertEqual(self.game.used_cards.count(Card.from_id("6")), 1)
+        self.assertEqual(self.game.used_cards.count(Card.from_id("8")), 1)
+
+    def test_removed_slot(self):
+        # The slot a stone leaves must not tell the table its rank
+        rng = Stream(7)
+        trials = 5000
+        for card in "18":
+            seen = [0] * 5
+            for _ in range(trials):
+                seen[Hand([1, 0, 0, 0, 0, 0, 0, 4]).remove(card, rng)] += 1
+            for n in seen:
+                self.assertAlmostEqual(n / trials, 1 / 5, delta=0.03)
@@ -0,0 +1,35 @@
+import unittest
+
+from telegram import User
+
+import engine
+from game import Game
+from player import Player
+from results import card_results, is_info_id
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.game = Game(None)
+        self.p0 = Player(self.game, User(0, "user0", False))
+        self.p1 = Player(self.game, User(1, "user1", False))
+        self.game.start()
+
+    def test_cache(self):
+        results = card_results(self.p0)
+        self.assertIs(card_results(self.p0), results)
+        self.assertIsNot(card_results(self.p1), results)
+
+        card = self.p0.cards[0]
+        engine.cast(self.game, self.p0, card)
+        self.assertIsNot(card_results(self.p0), results)
+
+    def test_stable_ids(self):
+        ids = [r.id for r in card_results(self.p0)]
+        self.p0.result_cache = None
+        self.assertEqual([r.id for r in card_results(self.p0)], ids)
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertIn("1", ids)
+        self.assertFalse(is_info_id("1"))
+        self.assertFalse(is_info_id("pass"))
+        self.assertEqual(sum(not is_info_id(i) for i in ids), 8)
@@ -0,0 +1,322 @@
+import asyncio
+import itertools
+import json
+import tempfile
+import unittest
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from queue import Queue
+from unittest.mock import patch
+
+from telegram import Chat, Dice, Message, Update
+from telegram.error import Unauthorized
+
+import ai
+import config
+from aio import AsyncRuntime, blocking, run
+from api import Api
+from board import LiveBoard
+from bot import Room
+from card import STONES
+from eventlog import EventLog, segments
+from game_manager import GameManager
+from journal import Store
+from utils import make_board
+
+
+class FakeBot:
+    id = 1000
+    username = "abracadawhatbot"
+
+
+class FakeApi(Api):
+    def __init__(self, bot):
+        super().__init__(bot)
+        self.calls = []
+        self.ids = itertools.count(1)
+        # Chats that never talked to the bot
+        self.blocked = set()
+
+    async def call(self, method, *args, **kwargs):
+        self.calls.append((method, args, kwargs))
+        if args and args[0] in self.blocked:
+            raise Unauthorized("Forbidden: bot can't initiate conversation")
+        if method in ("send_message", "send_dice"):
+            dice = Dice(6, "🎲") if method == "send_dice" else None
+            return Message(
+                next(self.ids), datetime.now(), Chat(args[0], "group"), dice=dice
+            )
+        return True
+
+
+def user(i):
+    return {"id": i, "is_bot": False, "first_name": f"user{i}"}
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.bot = FakeBot()
+        self.gm = GameManager()
+        self.room = Room(self.bot, self.gm, FakeApi(self.bot))
+        self.runtime = AsyncRuntime(
+            self.room.api, self.room.make_handlers(), self.room.chat_key
+        )
+        self.update_ids = itertools.count(1)
+
+    def dispatch(self, **data):
+        update = Update.de_json(dict(update_id=next(self.update_ids), **data), self.bot)
+        asyncio.run(self.runtime.dispatch(update))
+
+    def command(self, user_id, text, chat_id=-1):
+        self.dispatch(
+            message={
+                "message_id": next(self.update_ids),
+                "date": 0,
+                "chat": {"id": chat_id, "type": "group"},
+                "from": user(user_id),
+                "text": text,
+                "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}],
+            }
+        )
+
+    def choose(self, user_id, result_id):
+        self.dispatch(
+            chosen_inline_result={
+                "result_id": result_id,
+                "from": user(user_id),
+                "query": "",
+            }
+        )
+
+    def sent(self):
+        return [kwargs.get("text") for method, _, kwargs in self.room.api.calls]
+
+    def test_game(self):
+        self.command(1, "/new")
+        self.command(2, "/join")
+        self.command(3, "/join")
+        self.command(1, "/start")
+
+        game = self.gm.chatid_games[-1][-1]
+        self.assertTrue(game.started)
+        self.assertEqual(len(game.players), 3)
+
+        self.dispatch(
+            inline_query={"id": "q", "from": user(1), "query": "", "offset": ""}
+        )
+        method, args, _ = self.room.api.calls[-1]
+        self.assertEqual(method, "answer_inline_query")
+        self.assertEqual(args[0], "q")
+
+        self.choose(2, "8")
+        self.assertTrue(self.sent()[-1].endswith("還沒輪到你！"))
+
+        self.room.api.calls.clear()
+        card = list(game.current_player.cards)[-1]
+        self.choose(1, card.id)
+        self.assertTrue(self.sent()[0].startswith("施展成功！"))
+
+        self.choose(1, "pass")
+        self.assertEqual(game.current_player.user.id, 2)
+
+    def test_consume(self):
+        queue = Queue()
+        for user_id, text in ((1, "/new"), (2, "/join"), (3, "/join")):
+            message = {
+                "message_id": user_id,
+                "date": 0,
+                "chat": {"id": -1, "type": "group"},
+                "from": user(user_id),
+                "text": text,
+                "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}],
+            }
+            queue.put(json.dumps({"update_id": user_id, "message": message}))
+        queue.put(None)
+
+        asyncio.run(self.runtime.consume(queue))
+        self.assertEqual(len(self.gm.active_game(-1).players), 3)
+
+    def test_board(self):
+        deferred = []
+        board = LiveBoard(
+            self.room.api, debounce=60, defer=lambda *job: deferred.append(job)
+        )
+        self.room.board = board
+        self.command(1, "/new")
+        self.command(2, "/join")
+        self.command(1, "/start")
+        game = self.gm.active_game(-1)
+        self.assertEqual(self.sent()[-1], make_board(game))
+        self.assertIn(-1, board.boards)
+
+        # Right after posting the board the edit waits for the debounce
+        self.room.api.calls.clear()
+        self.choose(1, list(game.current_player.cards)[-1].id)
+        self.assertNotIn("edit_message_text", [call[0] for call in self.room.api.calls])
+        game.current_player.hp -= 1
+        asyncio.run(board.refresh(game))
+        self.assertEqual(len(deferred), 1)
+
+        delay, key, job = deferred.pop()
+        self.assertEqual(key, -1)
+        asyncio.run(job())
+        method, _, kwargs = self.room.api.calls[-1]
+        self.assertEqual(method, "edit_message_text")
+        self.assertEqual(kwargs["text"], make_board(game))
+        asyncio.run(board.flush(game))
+        self.assertEqual((board.edits, board.skipped), (1, 1))
+
+    def test_blocking(self):
+        loops = []
+
+        async def handler(update, context):
+            loops.append(asyncio.get_running_loop())
+
+        # The threaded runtime keeps one loop per worker thread
+        blocking(handler)(None, None)
+        blocking(handler)(None, None)
+        self.assertIs(loops[0], loops[1])
+        self.assertIs(run(asyncio.sleep(0, "done")), "done")
+
+    def test_odds(self):
+        self.command(1, "/new")
+        self.command(2, "/join")
+        self.command(3, "/odds")
+        self.assertEqual(self.sent()[-1], "你不在遊戲裡ㄡ")
+        self.command(1, "/start")
+        self.command(2, "/odds")
+        method, args, kwargs = self.room.api.calls[-1]
+        self.assertEqual(method, "send_message")
+        # Only to the player who asked, never to the group
+        self.assertEqual(args[0], 2)
+        self.assertIn("《機率》", kwargs["text"])
+        self.assertEqual(len(kwargs["text"].splitlines()), 2 + len(STONES))
+
+        self.room.api.blocked.add(2)
+        self.command(2, "/odds")
+        method, args, kwargs = self.room.api.calls[-1]
+        self.assertEqual(args[0], -1)
+        self.assertNotIn("《機率》", kwargs["text"])
+        group = [kw["text"] for _, a, kw in self.room.api.calls if a and a[0] == -1]
+        self.assertFalse([text for text in group if text and "《機率》" in text])
+
+    def test_event_log(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.room.event_log = EventLog(directory)
+            self.room.event_log.start()
+            self.command(1, "/new")
+            self.command(2, "/join")
+            self.command(1, "/start")
+            game = self.gm.active_game(-1)
+            self.choose(1, list(game.current_player.cards)[-1].id)
+            self.room.event_log.close()
+            with open(segments(directory)[0], encoding="utf-8") as f:
+                records = [json.loads(line) for line in f]
+        evs = [record["ev"] for record in records]
+        self.assertEqual(evs[:4], ["new", "join", "join", "start"])
+        self.assertEqual(records[3]["seed"], game.rng.getstate()[0])
+        self.assertEqual(evs[4], "cast")
+
+    def test_dice(self):
+        spawned, submitted = [], []
+        self.room.spawn = spawned.append
+        self.room.submit = lambda key, job: submitted.append((key, job))
+        self.command(1, "/new")
+        self.command(2, "/join")
+        self.command(1, "/start")
+        game = self.gm.active_game(-1)
+
+        # The dragon always rolls, the handler returns before the dice does
+        game.current_player.cards.add(STONES[0])
+        self.choose(1, "1")
+        self.assertIsNotNone(game.pending)
+        self.assertNotIn("send_dice", [call[0] for call in self.room.api.calls])
+        self.choose(1, "pass")
+        self.assertTrue(self.sent()[-1].endswith("骰子還在滾ㄡ！"))
+
+        asyncio.run(spawned.pop()())
+        self.assertEqual(self.room.api.calls[-1][0], "send_dice")
+        key, job = submitted.pop()
+        self.assertEqual(key, -1)
+        asyncio.run(job())
+        self.assertIsNone(game.pending)
+        self.assertIn("你骰出了 6 所有人扣 3 點血！", self.sent())
+
+        # Rolled locally there is nothing to wait for
+        with patch.object(config, "DICE", "local"):
+            game.current_player.cards.add(STONES[0])
+            self.choose(game.current_player.user.id, "1")
+        self.assertIsNone(game.pending)
+        self.assertFalse(spawned)
+
+    def test_restart(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # Seeded so that user1 moves first holding an ancient dragon
+            self.gm = self.room.gm = GameManager(seed=6)
+            store = self.room.store = Store(directory)
+            store.restore(self.gm)
+            self.room.spawn = lambda job: None
+            self.command(1, "/new")
+            self.command(2, "/join")
+            self.command(1, "/start")
+            game = self.gm.active_game(-1)
+            self.assertIn(STONES[0], game.current_player.cards)
+            self.choose(1, "1")
+            # Restarted before the dice was thrown
+            store.journal.close()
+            gm = GameManager()
+            Store(directory).restore(gm)
+
+        room = Room(self.bot, gm, FakeApi(self.bot))
+        spawned, submitted = [], []
+        room.spawn = spawned.append
+        room.submit = lambda key, job: submitted.append(job)
+        game = gm.active_game(-1)
+        self.assertIsNotNone(game.pending)
+        asyncio.run(room.resume())
+        asyncio.run(submitted.pop()())
+        # The dice is thrown anew, as there is nothing to reply to
+        asyncio.run(spawned.pop()())
+        self.assertEqual(room.api.calls[0][0], "send_dice")
+        asyncio.run(submitted.pop()())
+        self.assertIsNone(game.pending)
+        texts = [kwargs.get("text") for _, _, kwargs in room.api.calls]
+        self.assertIn("你骰出了 6 所有人扣 3 點血！", texts)
+
+    def test_computer(self):
+        class Brain:
+            async def think(self, view):
+                return ai.fallback(view)
+
+        self.command(1, "/new")
+        self.command(1, "/ai")
+        self.assertTrue(self.sent()[-1].endswith("電腦玩家ㄡ"))
+        self.room.brain = Brain()
+        self.command(1, "/ai")
+        game = self.gm.active_game(-1)
+        computer = game.players[1]
+        self.assertTrue(ai.is_computer(computer))
+        self.assertEqual(computer.user.id, -11)
+
+        self.command(1, "/start")
+        self.room.api.calls.clear()
+        # The human fails a cast, the computer plays its turn right away
+        stone = next(card for card in STONES if card not in game.current_player.cards)
+        self.choose(1, stone.id)
+        self.assertTrue(game.ended or game.current_player.user.id == 1)
+        self.assertIn(f"施展失敗！你沒有 {stone}！", self.sent())
+        self.assertGreater(len(self.room.api.calls), 2)
+
+        # A broken search still moves, and so do computers after a restart
+        class Broken:
+            async def think(self, view):
+                raise BrokenProcessPool("worker died")
+
+        self.room.brain = Broken()
+        if not game.ended:
+            game.current_player = computer
+            game.bump()
+            version = game.version
+            with self.assertLogs("bot", "ERROR"):
+                asyncio.run(self.room.resume())
+            self.assertNotEqual(game.version, version)
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from scheduler import AsyncChatScheduler, ChatScheduler
+
+
+class Test(unittest.TestCase):
+    def test_threads(self):
+        scheduler = ChatScheduler(4)
+        done = {0: [], 1: []}
+        overlap = threading.Event()
+        running = set()
+
+        def job(key, i):
+            running.add(key)
+            if len(running) > 1:
+                overlap.set()
+            time.sleep(0.001)
+            done[key].append(i)
+            running.discard(key)
+
+        for i in range(50):
+            for key in done:
+                scheduler.submit(key, lambda key=key, i=i: job(key, i))
+        scheduler.shutdown()
+
+        self.assertEqual(done[0], list(range(50)))
+        self.assertEqual(done[1], list(range(50)))
+        self.assertTrue(overlap.is_set())
+        self.assertEqual(scheduler.pending, 0)
+        self.assertFalse(scheduler.queues)
+
+    def test_asyncio(self):
+        done = {0: [], 1: []}
+        order = []
+
+        async def job(key, i):
+            await asyncio.sleep(0)
+            done[key].append(i)
+            order.append(key)
+
+        async def main():
+            scheduler = AsyncChatScheduler()
+            for i in range(20):
+                for key in done:
+                    scheduler.submit(key, lambda key=key, i=i: job(key, i))
+            await scheduler.join()
+            return scheduler
+
+        scheduler = asyncio.run(main())
+        self.assertEqual(done[0], list(range(20)))
+        self.assertEqual(done[1], list(range(20)))
+        # Both chats progressed together instead of one after the other
+        self.assertNotEqual(order, sorted(order))
+        self.assertFalse(scheduler.queues)
@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+import unittest
+from queue import Queue
+
+from telegram import Chat, Update, User
+
+from game_manager import GameManager
+from shard import CurrentStore, HashRing, Router, SharedCurrent
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = CurrentStore(os.path.join(self.tmp.name, "current.db"))
+
+    def tearDown(self):
+        self.store.db.close()
+        self.tmp.cleanup()
+
+    def test_ring(self):
+        keys = range(-10000, 0)
+        four = HashRing(4)
+        five = HashRing(5)
+        shards = [four.shard(key) for key in keys]
+        self.assertEqual(set(shards), {0, 1, 2, 3})
+        self.assertEqual(shards, [four.shard(key) for key in keys])
+
+        moved = sum(four.shard(key) != five.shard(key) for key in keys)
+        self.assertLess(moved, len(keys) / 3)
+
+    def test_store(self):
+        self.assertIsNone(self.store.get(1))
+        self.store.set(1, -10)
+        self.assertEqual(self.store.get(1), -10)
+        # Another shard moved the user meanwhile
+        self.store.discard(1, -20)
+        self.assertEqual(self.store.get(1), -10)
+        self.store.discard(1, -10)
+        self.assertIsNone(self.store.get(1))
+
+    def test_shared_current(self):
+        gm = GameManager()
+        gm.userid_current = SharedCurrent(self.store)
+        chat = Chat(-10, "group")
+        users = [User(i, f"user{i}", False) for i in range(3)]
+        gm.new_game(chat)
+        for user in users:
+            gm.join_game(user, chat)
+        self.assertEqual([self.store.get(user.id) for user in users], [-10] * 3)
+
+        gm.end_game(chat, users[0])
+        self.assertEqual([self.store.get(user.id) for user in users], [None] * 3)
+
+    def test_route(self):
+        queues = [Queue() for _ in range(4)]
+        router = Router(None, self.store, queues)
+        self.store.set(7, -10)
+        shard = router.ring.shard(-10)
+
+        router.route(
+            Update.de_json(
+                {
+                    "update_id": 1,
+                    "inline_query": {
+                        "id": "1",
+                        "from": {"id": 7, "is_bot": False, "first_name": "user7"},
+                        "query": "",
+                        "offset": "",
+                    },
+                },
+                None,
+            )
+        )
+        self.assertEqual(queues[shard].qsize(), 1)
+        data = queues[shard].get()
+        self.assertEqual(Update.de_json(json.loads(data), None).update_id, 1)
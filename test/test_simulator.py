@@ -0,0 +1,45 @@
+import unittest
+
+import numpy as np
+
+from simulator import TOTAL, Batch, likely_policy, random_policy, simulate
+
+
+class Test(unittest.TestCase):
+    def assertConserved(self, batch):
+        total = (
+            batch.deck_size
+            + batch.used.sum(axis=1)
+            + batch.secret.sum(axis=1)
+            + batch.hand_size.sum(axis=1)
+            + batch.owls.sum(axis=1)
+        )
+        self.assertTrue((total == TOTAL.sum()).all())
+        self.assertTrue((batch.hands.sum(axis=2) == batch.hand_size).all())
+        self.assertTrue((batch.deck.sum(axis=1) == batch.deck_size).all())
+
+    def test_deal(self):
+        rng = np.random.default_rng(0)
+        for players in range(2, 6):
+            batch = Batch(100, players, rng)
+            discard = 6 * (4 - players) if players <= 3 else 0
+            self.assertTrue((batch.used.sum(axis=1) == discard).all())
+            self.assertTrue((batch.secret.sum(axis=1) == 4).all())
+            self.assertTrue((batch.hand_size == 5).all())
+            self.assertConserved(batch)
+
+    def test_step(self):
+        batch = Batch(500, 3, np.random.default_rng(1))
+        policy = likely_policy()
+        while not batch.done.all():
+            batch.step(policy)
+            self.assertConserved(batch)
+            self.assertTrue(((batch.hp >= 0) & (batch.hp <= 6)).all())
+        self.assertTrue((batch.score.max(axis=1) == 8).all())
+
+    def test_simulate(self):
+        a = simulate(1000, 4, random_policy(), seed=7, batch_size=300)
+        b = simulate(1000, 4, random_policy(), seed=7, batch_size=300)
+        self.assertEqual(a.score.shape, (1000, 4))
+        self.assertTrue((a.score == b.score).all())
+        self.assertTrue(a.winners.any(axis=1).all())
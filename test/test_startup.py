@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from card import STONES, compile_catalog
+from catalog import CATALOG
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds, a few times what a warm import takes on a laptop
+BUDGETS = {"card": 0.1, "game_manager": 0.3, "bot": 1.5}
+
+PROBE = """
+import sys
+from time import perf_counter
+began = perf_counter()
+import {module}
+elapsed = perf_counter() - began
+import config
+sys.stderr.write(f"{{elapsed}} {{config._settings is not None}}")
+"""
+
+
+class Test(unittest.TestCase):
+    def test_import(self):
+        # No config.json and nothing else in the working directory
+        with tempfile.TemporaryDirectory() as cwd:
+            env = {**os.environ, "PYTHONPATH": ROOT}
+            for module, budget in BUDGETS.items():
+                with self.subTest(module=module):
+                    done = subprocess.run(
+                        [sys.executable, "-c", PROBE.format(module=module)],
+                        cwd=cwd,
+                        env=env,
+                        capture_output=True,
+                        text=True,
+                    )
+                    self.assertEqual(done.returncode, 0, done.stderr)
+                    self.assertEqual(done.stdout, "")
+                    elapsed, loaded = done.stderr.split()
+                    self.assertEqual(loaded, "False")
+                    self.assertLess(float(elapsed), budget)
+
+    def test_catalog(self):
+        self.assertEqual(len(STONES), len(CATALOG))
+        with tempfile.TemporaryDirectory() as directory:
+            target = os.path.join(directory, "catalog.py")
+            compile_catalog(os.path.join(ROOT, "stones.json"), target)
+            with open(target, encoding="utf-8") as f:
+                compiled = f.read()
+        with open(os.path.join(ROOT, "catalog.py"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), compiled)
@@ -0,0 +1,73 @@
+import unittest
+
+from telegram import Chat, User
+
+import config
+from game_manager import GameManager
+from sweeper import Sweeper, TimerWheel
+
+
+class Test(unittest.TestCase):
+    def test_wheel(self):
+        wheel = TimerWheel(tick=10, size=4, now=0)
+        wheel.schedule("a", 5)
+        wheel.schedule("b", 25)
+        # More than a turn of the wheel ahead
+        wheel.schedule("c", 95)
+
+        self.assertEqual(wheel.advance(9), [])
+        self.assertEqual(wheel.advance(10), ["a"])
+        self.assertEqual(wheel.advance(50), ["b"])
+        self.assertEqual(len(wheel), 1)
+        self.assertEqual(wheel.advance(94), [])
+        self.assertEqual(wheel.advance(100), ["c"])
+
+        # Deadlines in the past come due on the next tick
+        wheel.schedule("d", 0)
+        self.assertEqual(wheel.advance(110), ["d"])
+
+        # Rescheduling moves an item, cancelling drops it
+        wheel.schedule("e", 125)
+        wheel.schedule("e", 135)
+        wheel.schedule("f", 125)
+        wheel.cancel("f")
+        self.assertEqual(len(wheel), 1)
+        self.assertEqual(wheel.advance(130), [])
+        self.assertEqual(wheel.advance(140), ["e"])
+        self.assertFalse(wheel.slots)
+
+    def test_expire(self):
+        gm = GameManager()
+        chats = [Chat(-1, "group"), Chat(-2, "group")]
+        users = [User(i, f"user{i}", False) for i in range(1, 4)]
+        lobby = gm.new_game(chats[0])
+        gm.join_game(users[0], chats[0])
+        game = gm.new_game(chats[1])
+        for user in users:
+            gm.join_game(user, chats[1])
+        game.start()
+
+        expired = []
+        sweeper = Sweeper(gm, expired.append)
+        now = lobby.active
+        self.assertEqual(sweeper.sweep(now + config.LOBBY_TTL / 2), 0)
+        sweeper.sweep(now + config.LOBBY_TTL + gm.wheel.tick)
+        self.assertEqual(expired, [lobby])
+
+        self.assertTrue(gm.expire_game(lobby, now + config.LOBBY_TTL + 1))
+        self.assertNotIn(lobby, gm.wheel.slots)
+        self.assertIsNone(gm.active_game(-1))
+        self.assertNotIn((users[0].id, -1), gm.userchat_player)
+        self.assertIs(gm.userid_current[users[0].id].game, game)
+        self.assertFalse(gm.expire_game(lobby, now + config.LOBBY_TTL + 1))
+
+        # A started game was touched meanwhile and is watched again
+        game.active = now + config.GAME_TTL
+        sweeper.sweep(now + config.GAME_TTL + gm.wheel.tick)
+        self.assertEqual(expired, [lobby])
+        sweeper.sweep(now + 2 * config.GAME_TTL + gm.wheel.tick)
+        self.assertEqual(expired, [lobby, game])
+        self.assertTrue(gm.expire_game(game, now + 2 * config.GAME_TTL + 1))
+        self.assertFalse(gm.chatid_games)
+        self.assertFalse(gm.userid_players)
+        self.assertFalse(gm.userid_current)
@@ -0,0 +1,40 @@
+import random
+import unittest
+
+import ai
+from tournament import STRATEGIES, Record, play_game, tournament
+
+
+class Test(unittest.TestCase):
+    def test_strategies(self):
+        rng = random.Random(3)
+        for name in STRATEGIES:
+            with self.subTest(name):
+                scores = play_game([name, "random", "likely"], rng)
+                self.assertIn(ai.WINNING_SCORE, scores)
+                self.assertTrue(all(0 <= score <= 8 for score in scores))
+
+    def test_tournament(self):
+        names = ["likely", "greedy", "random"]
+        one = tournament(names, 60, workers=1, seed=5, batch_size=20)
+        two = tournament(names, 60, workers=2, seed=5, batch_size=20)
+        self.assertEqual(one, two)
+        self.assertEqual(one.games, 60)
+        for name in names:
+            record = one.records[name]
+            self.assertEqual(record.games, 60)
+            low, high = record.win_interval()
+            self.assertLessEqual(low, record.win_rate)
+            self.assertLessEqual(record.win_rate, high)
+
+        with self.assertRaises(ValueError):
+            tournament(["likely", "nobody"], 10)
+
+    def test_intervals(self):
+        record = Record()
+        for score in (8, 3, 8, 5):
+            record.add(score)
+        self.assertEqual(record.win_rate, 0.5)
+        low, high = record.score_interval()
+        self.assertAlmostEqual((low + high) / 2, 6.0)
+        self.assertLess(high - low, 6)
@@ -0,0 +1,50 @@
+import json
+import unittest
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from webhook import WebhookServer
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.updates = []
+        self.server = WebhookServer(None, self.updates.append, port=0, path="/hook")
+        self.server.start()
+        self.url = "http://127.0.0.1:%d" % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def post(self, path, body):
+        return urlopen(self.url + path, data=body, timeout=5)
+
+    def test_update(self):
+        update = {
+            "update_id": 7,
+            "inline_query": {
+                "id": "q",
+                "from": {"id": 1, "is_bot": False, "first_name": "user1"},
+                "query": "",
+                "offset": "",
+            },
+        }
+        self.assertEqual(self.post("/hook", json.dumps(update).encode()).status, 200)
+        self.assertEqual(len(self.updates), 1)
+        self.assertEqual(self.updates[0].update_id, 7)
+        self.assertEqual(self.updates[0].inline_query.from_user.id, 1)
+
+    def test_rejected(self):
+        with self.assertRaises(HTTPError) as e:
+            self.post("/other", b"{}")
+        self.assertEqual(e.exception.code, 404)
+        for body in (b"not json", b"null", b"[]", b"{}"):
+            with self.assertRaises(HTTPError) as e:
+                self.post("/hook", body)
+            self.assertEqual(e.exception.code, 400)
+        self.server.max_body = 16
+        with self.assertRaises(HTTPError) as e:
+            self.post("/hook", b'{"update_id": 123456789}')
+        self.assertEqual(e.exception.code, 413)
+        self.assertFalse(self.updates)
@@ -0,0 +1,239 @@
+"""
+Strategy tournaments.
+
+Seats strategies around real :class:`Game` objects and plays whole games
+through ``engine``, so every rule the bot enforces applies. Batches of games
+run in a process pool; batch ``i`` draws from ``Stream(seed).spawn(i)``, so
+the standings depend on the seed and the batch size but not on the number of
+workers. Seats rotate from game to game to cancel the advantage of moving
+first.
+
+    python tournament.py --games 1000000 --workers 8 likely greedy once random
+"""
+from __future__ import annotations
+
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from math import sqrt
+from multiprocessing import get_context
+from random import Random
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import ai
+import engine
+from card import STONES, TOTAL
+from game import Game
+from player import Player
+from rng import Stream
+
+# Two-sided 95% normal quantile
+Z = 1.96
+
+Strategy = Callable[[ai.View, Random], int]
+
+
+def unseen(view: ai.View) -> List[int]:
+    """Copies of every rank the player has not seen anywhere"""
+    counts = [t - u - s for t, u, s in zip(TOTAL, view.used, view.secret)]
+    for hand in view.hands[1:]:
+        counts = [n - h for n, h in zip(counts, hand)]
+    return counts
+
+
+def can_pass(view: ai.View) -> bool:
+    return view.sizes[0] < ai.HAND_SIZE
+
+
+def random_strategy(view: ai.View, rng: Random) -> int:
+    """Cast a uniformly random legal stone, pass half the time"""
+    if view.last and can_pass(view) and rng.random() < 0.5:
+        return ai.PASS
+    return rng.randint(max(view.last, 1), 8)
+
+
+def once_strategy(view: ai.View, rng: Random) -> int:
+    """Cast the stone with most unseen copies, pass after one success"""
+    if view.last and can_pass(view):
+        return ai.PASS
+    counts = unseen(view)
+    return max(range(max(view.last, 1), 9), key=lambda rank: counts[rank - 1])
+
+
+def greedy_strategy(view: ai.View, rng: Random) -> int:
+    """Cast the highest legal stone that may be in hand"""
+    counts = unseen(view)
+    for rank in range(8, max(view.last, 1) - 1, -1):
+        if counts[rank - 1]:
+            return rank
+    return ai.PASS if can_pass(view) else 8
+
+
+def likely_strategy(view: ai.View, rng: Random) -> int:
+    """:func:`ai.fallback`, weighing the odds of holding a stone"""
+    return ai.fallback(view)
+
+
+def search_strategy(view: ai.View, rng: Random, iterations: int = 200) -> int:
+    """:func:`ai.search` with a fixed number of iterations"""
+    return ai.search(view, budget=60, seed=rng.getrandbits(64), iterations=iterations)
+
+
+STRATEGIES: Dict[str, Strategy] = {
+    "random": random_strategy,
+    "once": once_strategy,
+    "greedy": greedy_strategy,
+    "likely": likely_strategy,
+    "search": search_strategy,
+}
+
+
+def play_game(
+    names: Sequence[str], rng: Random, max_moves: int = 100_000
+) -> Tuple[int, ...]:
+    """Play one game with the strategies ``names`` in seat order, the scores"""
+    game = Game(None, rng.getrandbits(64))
+    seats = [Player(game, ai.make_user(0, seat)) for seat in range(1, len(names) + 1)]
+    strategies = {player: STRATEGIES[name] for player, name in zip(seats, names)}
+    game.start()
+    for _ in range(max_moves):
+        player = game.current_player
+        move = strategies[player](ai.observe(game, player), rng)
+        if move == ai.PASS:
+            events = engine.pass_turn(game, player)
+        else:
+            events = engine.cast(game, player, STONES[move - 1])
+        if isinstance(events[0], (engine.WeakerCard, engine.CannotPass)):
+            raise ValueError(f"{names[seats.index(player)]} made an illegal move")
+        if game.pending is not None:
+            events = engine.roll(game, rng.randint(1, 6))
+        if isinstance(events[-1], engine.GameWon):
+            return tuple(player.score for player in seats)
+    raise RuntimeError("Game did not finish within max_moves")
+
+
+@dataclass
+class Record:
+    """Results of one strategy, per seat it took"""
+
+    games: int = 0
+    wins: int = 0
+    score: int = 0
+    squares: int = 0
+
+    def add(self, score: int):
+        self.games += 1
+        self.wins += score == ai.WINNING_SCORE
+        self.score += score
+        self.squares += score * score
+
+    def merge(self, other: Record):
+        self.games += other.games
+        self.wins += other.wins
+        self.score += other.score
+        self.squares += other.squares
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.games
+
+    @property
+    def mean_score(self) -> float:
+        return self.score / self.games
+
+    def win_interval(self) -> Tuple[float, float]:
+        """Wilson 95% interval of the win rate, ties count for every winner"""
+        n, p = self.games, self.win_rate
+        centre = (p + Z * Z / (2 * n)) / (1 + Z * Z / n)
+        spread = Z * sqrt(p * (1 - p) / n + Z * Z / (4 * n * n)) / (1 + Z * Z / n)
+        return centre - spread, centre + spread
+
+    def score_interval(self) -> Tuple[float, float]:
+        """Normal 95% interval of the mean score"""
+        n, mean = self.games, self.mean_score
+        variance = max(self.squares / n - mean * mean, 0.0) * n / max(n - 1, 1)
+        spread = Z * sqrt(variance / n)
+        return mean - spread, mean + spread
+
+
+@dataclass
+class Standings:
+    games: int = 0
+    records: Dict[str, Record] = field(default_factory=dict)
+
+    def merge(self, other: Standings):
+        self.games += other.games
+        for name, record in other.records.items():
+            self.records.setdefault(name, Record()).merge(record)
+
+
+def play_batch(names: Sequence[str], seed: int, index: int, games: int) -> Standings:
+    """Play the ``index``-th batch of a tournament"""
+    rng = Stream(seed).spawn(index)
+    standings = Standings(games)
+    for i in range(games):
+        # Rotate the seats so every strategy moves first as often
+        shift = (index * games + i) % len(names)
+        order = list(names[shift:]) + list(names[:shift])
+        for name, score in zip(order, play_game(order, rng)):
+            standings.records.setdefault(name, Record()).add(score)
+    return standings
+
+
+def tournament(
+    names: Sequence[str],
+    games: int,
+    workers: int = 1,
+    seed: Optional[int] = None,
+    batch_size: int = 1000,
+) -> Standings:
+    """Play ``games`` games between ``names``, a seat each"""
+    if not 2 <= len(names) <= 5:
+        raise ValueError("Abracada What needs 2 to 5 players")
+    for name in names:
+        if name not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {name}")
+    if seed is None:
+        seed = Stream().getrandbits(64)
+    sizes = [min(batch_size, games - start) for start in range(0, games, batch_size)]
+    batch = partial(play_batch, tuple(names), seed)
+
+    standings = Standings()
+    if workers <= 1:
+        for index, size in enumerate(sizes):
+            standings.merge(batch(index, size))
+        return standings
+    # Forked workers would inherit whatever threads the caller runs
+    with ProcessPoolExecutor(workers, mp_context=get_context("spawn")) as pool:
+        for result in pool.map(batch, range(len(sizes)), sizes):
+            standings.merge(result)
+    return standings
+
+
+def main():
+    parser = ArgumentParser(description="Abracada What strategy tournament")
+    parser.add_argument("strategies", nargs="+", choices=sorted(STRATEGIES))
+    parser.add_argument("--games", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    standings = tournament(
+        args.strategies, args.games, args.workers, args.seed, args.batch_size
+    )
+    print(f"games: {standings.games}  (95% intervals)")
+    for name, record in sorted(
+        standings.records.items(), key=lambda item: -item[1].win_rate
+    ):
+        low, high = record.win_interval()
+        score_low, score_high = record.score_interval()
+        print(
+            f"{name:8} win {record.win_rate:7.2%} [{low:.2%}, {high:.2%}]"
+            f"  score {record.mean_score:.3f} [{score_low:.3f}, {score_high:.3f}]"
+        )
+
+
+if __name__ == "__main__":
+    main()
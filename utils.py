@@ -1,4 +1,4 @@
-from card import Card
+from card import STONES
 
 HEADER = "－－－《{text}》－－－\n"
 
@@ -66,8 +66,23 @@ def make_room_info(game) -> str:
 def make_used_cards(game) -> str:
     text = HEADER.format(text="場上")
     text += f"剩餘 {len(game.deck.cards)} 個魔法石！\n"
-    for i in range(1, 9):
-        text += str(Card.from_id(str(i))) + "\n"
-        used = game.used_cards[str(i)]
-        text += f"{'◼' * used}{(i-used) * '◻'}\n"
+    for card, used in zip(STONES, game.used_cards.counts):
+        text += str(card) + "\n"
+        text += f"{'◼' * used}{(card.rank-used) * '◻'}\n"
     return text
+
+
+def make_odds(player, odds) -> str:
+    text = HEADER.format(text="機率")
+    text += f"{display_name(player.user)} 手上 {len(player.cards)} 個魔法石\n"
+    for card, hold, mean in zip(STONES, odds.hold, odds.mean):
+        text += f"{card}：{hold:.0%}（平均 {mean:.1f} 個）\n"
+    return text.rstrip()
+
+
+def make_board(game) -> str:
+    text = HEADER.format(text="戰況")
+    for p in game.players:
+        mark = "👉 " if p is game.current_player else ""
+        text += f"{mark}{display_name(p.user)}（{p.hp} 血，{p.score} 分）\n"
+    return text + "\n" + make_used_cards(game).rstrip()
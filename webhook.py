@@ -0,0 +1,100 @@
+"""
+Webhook ingestion.
+
+A small embedded HTTP server that parses every POSTed update and hands it
+straight to a sink, the dispatcher in the threaded runtime or the event loop
+in the asyncio runtime. Recorded updates can be replayed locally with
+
+    curl -d @update.json http://127.0.0.1:8443/<path>
+"""
+from __future__ import annotations
+
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging import getLogger
+from threading import Thread
+from typing import TYPE_CHECKING, Callable, Optional
+
+from telegram import Update
+
+if TYPE_CHECKING:
+    from telegram import Bot
+
+logger = getLogger(__name__)
+
+# Telegram updates are a few kilobytes at most
+MAX_BODY = 1 << 20
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    server: WebhookServer
+
+    def do_POST(self):
+        if self.path != self.server.path:
+            self.send_error(404)
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.send_error(400)
+            return
+        if length > self.server.max_body:
+            # The body is left unread, so the connection cannot be reused
+            self.close_connection = True
+            self.send_error(413)
+            return
+        try:
+            data = json.loads(self.rfile.read(length))
+            if not isinstance(data, dict):
+                raise TypeError("The update is not an object")
+            update = Update.de_json(data, self.server.bot)
+            if update is None:
+                raise ValueError("The update is empty")
+        except (ValueError, TypeError, KeyError):
+            self.send_error(400)
+            return
+        try:
+            self.server.sink(update)
+        except Exception:
+            logger.exception(f"Failed to handle update {data.get('update_id')}")
+        # Always acknowledge, otherwise Telegram delivers the update again
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class WebhookServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        bot: Bot,
+        sink: Optional[Callable[[Update], None]] = None,
+        listen: str = "127.0.0.1",
+        port: int = 8443,
+        path: str = "/",
+        max_body: int = MAX_BODY,
+    ):
+        super().__init__((listen, port), WebhookHandler)
+        self.bot = bot
+        self.sink = sink
+        self.path = path
+        self.max_body = max_body
+
+    def start(self) -> Thread:
+        """Serve on a daemon thread"""
+        thread = Thread(target=self.serve_forever, name="webhook", daemon=True)
+        thread.start()
+        return thread